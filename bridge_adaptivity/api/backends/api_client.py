@@ -21,7 +21,7 @@ def api_client_factory(content_source: LtiContentSource) -> BaseApiClient:
         LtiContentSource.DART: DartApiClient,
         LtiContentSource.BASE_SOURCE: BaseApiClient,
     }
-    return api_clients[content_source.source_type](content_source)
+    return api_clients[content_source.source_type](content_source).observe_requests()
 
 
 def get_active_content_sources(request, source_ids=None, not_allow_empty_source_id=True):
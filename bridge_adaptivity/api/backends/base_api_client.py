@@ -2,6 +2,8 @@ from django.utils.translation import ugettext as _
 from requests.exceptions import ConnectionError
 import slumber
 
+from common import metrics
+
 
 class BaseApiClient(slumber.API):
     """
@@ -16,6 +18,20 @@ class BaseApiClient(slumber.API):
     def url(self):
         return f'{self.content_source.host_url}/api/v1/'
 
+    def observe_requests(self):
+        """
+        Record duration of the content source API requests to the metrics, see `common.metrics`.
+        """
+        self._store['session'].hooks['response'].append(self._observe_response)
+        return self
+
+    def _observe_response(self, response, *args, **kwargs):
+        duration = response.elapsed.total_seconds()
+        metrics.CONTENT_SOURCE_REQUEST_SECONDS.labels(
+            source=self.content_source.source_type, status=response.status_code
+        ).observe(duration)
+        metrics.add_request_timing('api', duration)
+
     def get_course_blocks(self, course_id):
         """
         Return list of the blocks for given course.
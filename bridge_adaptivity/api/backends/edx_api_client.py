@@ -1,7 +1,7 @@
 from datetime import datetime
 import logging
 
-from django.core.cache import cache
+from django.core.cache import caches
 from django.core.exceptions import ObjectDoesNotExist
 from edx_rest_api_client.client import EdxRestApiClient
 from requests import RequestException
@@ -24,6 +24,7 @@ class OpenEdxApiClient(BaseApiClient, EdxRestApiClient):
 
         token_cache_key = f'api:{self.content_source.o_auth_client.client_id}:token'
 
+        cache = caches['tiered']
         access_token = cache.get(token_cache_key)
         if not access_token:
             access_token, expires_at = self.get_oauth_access_token()
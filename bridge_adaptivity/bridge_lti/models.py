@@ -1,11 +1,13 @@
 import logging
 
+from django.conf import settings
 from django.contrib.auth import login
 from django.contrib.auth.models import AbstractUser, Group
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models import fields
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 
@@ -23,6 +25,9 @@ class LtiLmsPlatform(models.Model):
     Automatically generates key and secret for consumers.
     """
 
+    CACHE_KEY = 'lti_lms_platform:{}'
+    CACHE_ID_KEY = 'lti_lms_platform_id:{}'
+
     consumer_name = models.CharField(max_length=255, unique=True)
     consumer_key = models.CharField(max_length=32, unique=True, default=short_token, db_index=True)
     consumer_secret = models.CharField(max_length=32, unique=True, default=short_token)
@@ -36,6 +41,65 @@ class LtiLmsPlatform(models.Model):
     def __str__(self):
         return '<LtiLmsPlatform: {}>'.format(self.consumer_name)
 
+    @staticmethod
+    def _cache():
+        return caches['tiered']
+
+    def _put_to_cache(self):
+        self._cache().set_many(
+            {self.CACHE_KEY.format(self.consumer_key): self, self.CACHE_ID_KEY.format(self.id): self},
+            settings.LTI_LMS_PLATFORM_CACHE_TIMEOUT,
+        )
+
+    @classmethod
+    def get_cached(cls, consumer_key):
+        """
+        Return LMS platform by the consumer key, platform is read through the cache.
+
+        :param consumer_key: LTI consumer key
+        :return: LtiLmsPlatform instance
+        :raise LtiLmsPlatform.DoesNotExist: if there is no platform with the consumer key
+        """
+        lti_lms_platform = cls._cache().get(cls.CACHE_KEY.format(consumer_key))
+        if lti_lms_platform is None:
+            lti_lms_platform = cls.objects.get(consumer_key=consumer_key)
+            lti_lms_platform._put_to_cache()
+        return lti_lms_platform
+
+    @classmethod
+    def get_cached_by_id(cls, platform_id):
+        """
+        Return LMS platform by its id, platform is read through the cache.
+
+        :param platform_id: id of the LtiLmsPlatform
+        :return: LtiLmsPlatform instance
+        :raise LtiLmsPlatform.DoesNotExist: if there is no platform with the id
+        """
+        lti_lms_platform = cls._cache().get(cls.CACHE_ID_KEY.format(platform_id))
+        if lti_lms_platform is None:
+            lti_lms_platform = cls.objects.get(id=platform_id)
+            lti_lms_platform._put_to_cache()
+        return lti_lms_platform
+
+    def invalidate_cache(self):
+        """
+        Drop cached platform, the platform cached with the previous consumer key is found by the id key.
+        """
+        cache = self._cache()
+        keys = {self.CACHE_KEY.format(self.consumer_key), self.CACHE_ID_KEY.format(self.id)}
+        cached = cache.get(self.CACHE_ID_KEY.format(self.id))
+        if cached is not None:
+            keys.add(self.CACHE_KEY.format(cached.consumer_key))
+        cache.delete_many(keys)
+
+
+@receiver([post_save, post_delete], sender=LtiLmsPlatform)
+def invalidate_lti_lms_platform_cache(sender, instance, **kwargs):
+    """
+    Drop the changed or deleted LMS platform from the cache.
+    """
+    instance.invalidate_cache()
+
 
 class LtiContentSource(models.Model):
     """
@@ -0,0 +1,90 @@
+"""
+Replay protection store for the OAuth nonces of the LTI requests.
+"""
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+log = logging.getLogger(__name__)
+
+
+class NonceStore(object):
+    """
+    Store of the used nonces with the single atomic check-and-insert operation.
+
+    Nonces are grouped into the time buckets by the request's timestamp, all nonces of the bucket expire at the same
+    moment when the bucket leaves the validity window. Recently seen nonces are kept in the bounded in-process LRU
+    filter, so the replay sent to the same process is rejected without the cache round-trip.
+    """
+
+    KEY = 'lti_nonce:{bucket}:{client_key}:{nonce}'
+
+    def __init__(self, lifetime=None, bucket_size=None, front_size=None):
+        """
+        Initialize nonce store.
+
+        :param lifetime: lifetime in seconds of the used nonce, default is `LTI_NONCE_LIFETIME` setting
+        :param bucket_size: length in seconds of the time bucket, default is `LTI_NONCE_BUCKET_SIZE` setting
+        :param front_size: max number of nonces in the in-process filter, default is `LTI_NONCE_FRONT_SIZE` setting
+        """
+        self.lifetime = lifetime or settings.LTI_NONCE_LIFETIME
+        self.bucket_size = bucket_size or settings.LTI_NONCE_BUCKET_SIZE
+        self.front_size = front_size or settings.LTI_NONCE_FRONT_SIZE
+        self._front = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _seen_recently(self, key, now):
+        with self._lock:
+            expires_at = self._front.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= now:
+                del self._front[key]
+                return False
+            self._front.move_to_end(key)
+            return True
+
+    def _remember(self, key, expires_at):
+        with self._lock:
+            self._front[key] = expires_at
+            self._front.move_to_end(key)
+            while len(self._front) > self.front_size:
+                self._front.popitem(last=False)
+
+    def add(self, client_key, nonce, timestamp=None):
+        """
+        Atomically check the nonce is not used and mark it as used.
+
+        :param client_key: OAuth consumer key
+        :param nonce: OAuth nonce
+        :param timestamp: OAuth timestamp of the request, default is the current time
+        :return: True if nonce is not used before, False for the replayed nonce
+        """
+        now = time.time()
+        key = (client_key, nonce)
+        if self._seen_recently(key, now):
+            log.debug("Nonce {} is rejected by the in-process filter.".format(nonce))
+            return False
+        # NOTE(idegtiarov) bucket is defined by the signed timestamp, so the replayed request always gets the same key
+        bucket = int(timestamp or now) // self.bucket_size
+        # NOTE(idegtiarov) keys of the bucket expire together at the end of the bucket's validity window, but the nonce
+        # is never stored for less than its lifetime
+        expires_at = (bucket + 1) * self.bucket_size + self.lifetime
+        timeout = max(int(expires_at - now), self.lifetime)
+        added = cache.add(self.KEY.format(bucket=bucket, client_key=client_key, nonce=nonce), 1, timeout)
+        self._remember(key, now + timeout)
+        return added
+
+    def clear(self):
+        """
+        Clear the in-process filter.
+        """
+        with self._lock:
+            self._front.clear()
+
+
+nonce_store = NonceStore()
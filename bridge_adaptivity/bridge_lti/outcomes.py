@@ -1,19 +1,40 @@
 import logging
+import time
 
 from lti import OutcomeRequest
 
+from bridge_lti.models import LtiLmsPlatform
+from common import metrics
+
 log = logging.getLogger(__name__)
 
 
-def update_lms_grades(request=None, sequence=None):
-    """Send grade update to LMS (LTI Tool)."""
+def _observe_lms_request(started, status):
+    duration = time.perf_counter() - started
+    metrics.LMS_GRADE_REQUEST_SECONDS.labels(status=status).observe(duration)
+    metrics.add_request_timing('lms', duration)
+
+
+def update_lms_grades(request=None, sequence=None, score=None, use_ledger=True, lms_platform=None):
+    """
+    Send grade update to LMS (LTI Tool).
+
+    With the `use_ledger` flag the last sent grade is consulted, grade equal to the accepted one is not sent.
+
+    :param request: request with the outcome request parameters, optional
+    :param sequence: Sequence instance which grade is sent
+    :param score: grade to send, default is the grade calculated by the sequence's grading policy
+    :param use_ledger: boolean flag to consult and update the sequence's GradePassback, default is True
+    :param lms_platform: LtiLmsPlatform of the sequence's outcome service, it is read through the cache if not given
+    :return: LMS outcome response or None if the grade is not sent
+    """
     outcome_request = OutcomeRequest().from_post_request(request) if request else OutcomeRequest()
 
     outcome_service = sequence.outcome_service
     if outcome_service is None:
         log.info(f"Sequence: {sequence} doesn't contain an outcome service, grade is not sent.")
         return
-    consumer = outcome_service.lms_lti_connection
+    consumer = lms_platform or LtiLmsPlatform.get_cached_by_id(outcome_service.lms_lti_connection_id)
 
     outcome_request.consumer_key = consumer.consumer_key
     outcome_request.consumer_secret = consumer.consumer_secret
@@ -24,9 +45,30 @@ def update_lms_grades(request=None, sequence=None):
         sequence, sequence.completed, sequence.collection_order.grading_policy
     ))
 
-    score = sequence.collection_order.grading_policy.calculate_grade(sequence)
-    outcome_request.post_replace_result(score)
+    if score is None:
+        score = sequence.collection_order.grading_policy.calculate_grade(sequence)
+    if use_ledger:
+        from module.models import GradePassback
+        passback = GradePassback.objects.filter(sequence=sequence).first()
+        if passback and passback.is_accepted(score):
+            log.debug(f"Grade {score} of the {sequence} is already accepted by LMS, grade is not sent.")
+            return
+    started = time.perf_counter()
+    try:
+        outcome_request.post_replace_result(score)
+    except Exception:
+        _observe_lms_request(started, 'error')
+        raise
     lms_response = outcome_request.outcome_response
+    _observe_lms_request(started, lms_response.code_major or 'unknown')
+    if use_ledger:
+        GradePassback.record(
+            sequence,
+            score,
+            sent=lms_response.is_success(),
+            error='' if lms_response.is_success() else lms_response.description or '',
+            lms_status=lms_response.code_major or '',
+        )
     user_id = sequence.lti_user
     if lms_response.is_success():
         log.info("Successfully sent updated grade to LMS. Student:{}, grade:{}, comment: success".format(
@@ -44,3 +86,4 @@ def update_lms_grades(request=None, sequence=None):
         log.error("Grade update request failed. Student:{}, grade:{}, comment:{}".format(
             user_id, score, lms_response.code_major
         ))
+    return lms_response
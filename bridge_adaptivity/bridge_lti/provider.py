@@ -56,7 +56,7 @@ def lti_launch(request, collection_order_slug=None, unique_marker=''):
     if not tool_provider:
         raise Http404('LTI request is not valid')
     request.session['Lti_session'] = request_post['oauth_nonce']
-    lti_lms_platform = LtiLmsPlatform.objects.get(consumer_key=request_post['oauth_consumer_key'])
+    lti_lms_platform = LtiLmsPlatform.get_cached(request_post['oauth_consumer_key'])
     roles = request_post.get('roles')
     # NOTE(wowkalucky): LTI roles `Instructor`, `Administrator` are considered as BridgeInstructor
     if roles and set(roles.split(",")).intersection(['Instructor', 'Administrator']):
@@ -138,7 +138,7 @@ def learner_flow(request, lti_lms_platform, tool_provider, collection_order_slug
     )
     log.debug("LTI user {}: user_id='{}'".format('created' if created else 'picked', lti_user.user_id))
 
-    sequence, created = Sequence.objects.get_or_create(
+    sequence, created = Sequence.objects.select_related('collection_order__engine').get_or_create(
         lti_user=lti_user,
         collection_order=collection_order,
         suffix=unique_marker,
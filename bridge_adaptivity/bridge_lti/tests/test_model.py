@@ -1,8 +1,10 @@
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
+from django.test import TestCase
 import pytest
 
 from api.models import OAuthClient
-from bridge_lti.models import LtiContentSource
+from bridge_lti.models import LtiContentSource, LtiLmsPlatform
 from module.tests.test_views import BridgeTestCase
 
 
@@ -37,3 +39,37 @@ class BridgeLtiModelTest(BridgeTestCase):
             **base_args,
             source_type=LtiContentSource.BASE_SOURCE,
         ).clean()
+
+
+class TestLtiLmsPlatformCache(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        caches['tiered'].clear()
+        self.lti_lms_platform = LtiLmsPlatform.objects.create(
+            consumer_name='test_consumer', consumer_key='test_consumer_key', consumer_secret='test_consumer_secret'
+        )
+
+    def test_platform_is_read_through_cache(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(LtiLmsPlatform.get_cached('test_consumer_key'), self.lti_lms_platform)
+        with self.assertNumQueries(0):
+            self.assertEqual(LtiLmsPlatform.get_cached('test_consumer_key'), self.lti_lms_platform)
+            self.assertEqual(LtiLmsPlatform.get_cached_by_id(self.lti_lms_platform.id), self.lti_lms_platform)
+
+    def test_cache_is_invalidated_on_save(self):
+        LtiLmsPlatform.get_cached('test_consumer_key')
+        self.lti_lms_platform.consumer_key = 'new_consumer_key'
+        self.lti_lms_platform.consumer_secret = 'new_consumer_secret'
+        self.lti_lms_platform.save()
+        with self.assertRaises(LtiLmsPlatform.DoesNotExist):
+            LtiLmsPlatform.get_cached('test_consumer_key')
+        self.assertEqual(LtiLmsPlatform.get_cached('new_consumer_key').consumer_secret, 'new_consumer_secret')
+
+    def test_cache_is_invalidated_on_delete(self):
+        LtiLmsPlatform.get_cached('test_consumer_key')
+        platform_id = self.lti_lms_platform.id
+        self.lti_lms_platform.delete()
+        with self.assertRaises(LtiLmsPlatform.DoesNotExist):
+            LtiLmsPlatform.get_cached('test_consumer_key')
+        with self.assertRaises(LtiLmsPlatform.DoesNotExist):
+            LtiLmsPlatform.get_cached_by_id(platform_id)
@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.test import TestCase
+import mock
+
+from bridge_lti.nonce_store import NonceStore
+from bridge_lti.validator import SignatureValidator
+
+
+class TestNonceValidation(TestCase):
+    def setUp(self):
+        self.validator = SignatureValidator()
+        self.validator.cache.clear()
+        self.validator.nonce_store.clear()
+
+    def test_nonce_is_used_once(self):
+        self.assertTrue(self.validator.validate_timestamp_and_nonce('client_key', '1500000000', 'nonce', None))
+        self.assertFalse(self.validator.validate_timestamp_and_nonce('client_key', '1500000000', 'nonce', None))
+        self.assertTrue(self.validator.validate_timestamp_and_nonce('client_key', '1500000000', 'new_nonce', None))
+
+    def test_nonce_is_used_once_by_other_process(self):
+        self.assertTrue(self.validator.validate_timestamp_and_nonce('client_key', '1500000000', 'nonce', None))
+        # NOTE(idegtiarov) the in-process filter of the other process doesn't know the nonce, the cache rejects it
+        self.validator.nonce_store.clear()
+        self.assertFalse(self.validator.validate_timestamp_and_nonce('client_key', '1500000000', 'nonce', None))
+
+    def test_outdated_timestamp(self):
+        self.assertTrue(self.validator.validate_timestamp_and_nonce('client_key', '1500000010', 'nonce', None))
+        self.assertFalse(self.validator.validate_timestamp_and_nonce('client_key', '1500000000', 'new_nonce', None))
+
+
+class TestNonceStore(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @mock.patch('bridge_lti.nonce_store.cache')
+    def test_replay_is_rejected_without_cache(self, mock_cache):
+        mock_cache.add.return_value = True
+        store = NonceStore(lifetime=10, bucket_size=5, front_size=10)
+        self.assertTrue(store.add('client_key', 'nonce', 1500000000))
+        self.assertFalse(store.add('client_key', 'nonce', 1500000000))
+        mock_cache.add.assert_called_once()
+
+    @mock.patch('bridge_lti.nonce_store.time.time', return_value=1500000001)
+    @mock.patch('bridge_lti.nonce_store.cache')
+    def test_nonces_of_bucket_expire_together(self, mock_cache, mock_time):
+        store = NonceStore(lifetime=10, bucket_size=5, front_size=10)
+        store.add('client_key', 'nonce', 1500000001)
+        store.add('client_key', 'other_nonce', 1500000004)
+        mock_cache.add.assert_has_calls([
+            mock.call('lti_nonce:300000000:client_key:nonce', 1, 14),
+            mock.call('lti_nonce:300000000:client_key:other_nonce', 1, 14),
+        ])
+
+    def test_front_filter_is_bounded(self):
+        store = NonceStore(lifetime=10, bucket_size=5, front_size=2)
+        for nonce in ('first', 'second', 'third'):
+            self.assertTrue(store.add('client_key', nonce, 1500000000))
+        self.assertEqual(len(store._front), 2)
+        self.assertNotIn(('client_key', 'first'), store._front)
+        # NOTE(idegtiarov) nonce evicted from the in-process filter is still rejected by the cache
+        self.assertFalse(store.add('client_key', 'first', 1500000000))
@@ -11,6 +11,7 @@ from oauthlib.oauth1 import RequestValidator
 from oauthlib.oauth1 import SignatureOnlyEndpoint
 
 from bridge_lti.models import LtiLmsPlatform
+from bridge_lti.nonce_store import nonce_store
 
 log = logging.getLogger(__name__)
 
@@ -32,6 +33,7 @@ class SignatureValidator(RequestValidator):
         self.endpoint = SignatureOnlyEndpoint(self)
         self.lti_content_source = None
         self.cache = cache
+        self.nonce_store = nonce_store
 
     # The OAuth signature uses the endpoint URL as part of the request to be
     # hashed. By default, the oauthlib library rejects any URLs that do not
@@ -63,19 +65,22 @@ class SignatureValidator(RequestValidator):
         log.debug('Timestamp validating is started.')
         ts = int(timestamp)
         ts_key = '{}_ts'.format(client_key)
-        cache_ts = self.cache.get(ts_key, ts)
-        if cache_ts > ts:
+        cache_ts = self.cache.get(ts_key)
+        if cache_ts is not None and cache_ts > ts:
             log.debug(msg.format('timestamp'))
             return False
-        # NOTE(idegtiarov) cache data with timestamp and nonce lives for 10 seconds
-        self.cache.set(ts_key, ts, 10)
+        if cache_ts != ts:
+            # NOTE(idegtiarov) timestamp is cached for the nonce lifetime, it is not rewritten by the requests with the
+            # same timestamp to avoid the cache writes on the launch storm
+            self.cache.set(ts_key, ts, settings.LTI_NONCE_LIFETIME)
         log.debug('Timestamp is valid.')
 
         log.debug('Nonce validating is started.')
-        if self.cache.get(nonce):
+        # NOTE(idegtiarov) check-and-insert is atomic, only the first of the concurrent requests with the same nonce is
+        # valid
+        if not self.nonce_store.add(client_key, nonce, ts):
             log.debug(msg.format('nonce'))
             return False
-        self.cache.set(nonce, 1, 10)
         log.debug('Nonce is valid.')
         return True
 
@@ -86,7 +91,7 @@ class SignatureValidator(RequestValidator):
         :return: True if the key is valid, False if it is not.
         """
         try:
-            self.lti_content_source = LtiLmsPlatform.objects.get(consumer_key=client_key)
+            self.lti_content_source = LtiLmsPlatform.get_cached(client_key)
         except LtiLmsPlatform.DoesNotExist:
             log.exception('Consumer with the key {} is not found.'.format(client_key))
             return False
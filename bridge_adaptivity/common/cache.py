@@ -0,0 +1,90 @@
+"""
+Two level cache backend: the process local L1 cache in front of the shared L2 cache.
+
+Configuration example::
+
+    CACHES['tiered'] = {
+        'BACKEND': 'common.cache.TieredCache',
+        'OPTIONS': {
+            'L1': 'local',  # alias of the process local cache
+            'L2': 'default',  # alias of the shared cache
+            'L1_TIMEOUT': 5,  # lifetime in seconds of the values in the L1 cache
+        },
+    }
+
+Tiered cache is intended for the read-mostly keys: value changed or deleted on the other host could be read from the L1
+cache until the L1 timeout is expired.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l1_alias = options.get('L1', 'local')
+        self._l2_alias = options.get('L2', 'default')
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+
+    @property
+    def l1(self):
+        return caches[self._l1_alias]
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _get_l1_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout, version)
+        if added:
+            self.l1.set(key, value, self._get_l1_timeout(timeout), version)
+        return added
+
+    def get(self, key, default=None, version=None):
+        value = self.l1.get(key, _MISSING, version)
+        if value is _MISSING:
+            value = self.l2.get(key, _MISSING, version)
+            if value is _MISSING:
+                return default
+            self.l1.set(key, value, self.l1_timeout, version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version)
+        self.l1.set(key, value, self._get_l1_timeout(timeout), version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.l1.delete(key, version)
+        self.l2.delete(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        self.l1.delete(key, version)
+        return self.l2.incr(key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        self.l1.delete(key, version)
+        return self.l2.decr(key, delta, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version) is not _MISSING
+
+    def clear(self):
+        """
+        Clear the process local L1 cache only.
+
+        L2 is the shared cache with the other keys (e.g. nonces, leases, sessions) of all the processes, it should be
+        cleared explicitly with its own alias.
+        """
+        self.l1.clear()
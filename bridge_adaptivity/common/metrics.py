@@ -0,0 +1,145 @@
+"""
+Metrics of the hot paths exposed in the Prometheus text format on the `/metrics/` page.
+
+Metrics are collected with the `prometheus_client`. If the `PROMETHEUS_MULTIPROC_DIR` environment variable is set,
+every process writes its values to the files in this directory and the page exposes values summed up over all the
+processes, otherwise the page exposes values of the current process only. Every service (web, celery worker) writes to
+its own subdirectory of the shared metrics directory, e.g. `/metrics/web` and `/metrics/celery`, so processes of the
+different containers with the same pid don't share the files, and the page collects all the subdirectories.
+
+Usage example::
+
+    with metrics.timed(metrics.ENGINE_REQUEST_SECONDS, timing='engine', engine='engine_vpal', method='get_grade'):
+        ...
+
+Durations recorded with the `timing` name are also summed up for the current request and sent in the `Server-Timing`
+header by the `module.middleware.ServerTimingMiddleware`.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+import functools
+import glob
+import os
+import threading
+import time
+
+from prometheus_client import CollectorRegistry, Counter, generate_latest, Histogram, multiprocess, REGISTRY
+
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, float('inf'))
+
+_request_timings = threading.local()
+
+VIEW_SECONDS = Histogram(
+    'bridge_view_duration_seconds', 'Duration of the view response.', ('view', 'method')
+)
+VIEW_DB_QUERIES = Histogram(
+    'bridge_view_db_queries', 'Number of the DB queries executed by the view.', ('view', 'method'),
+    buckets=QUERIES_BUCKETS,
+)
+VIEW_DB_SECONDS = Histogram(
+    'bridge_view_db_duration_seconds', 'Duration of the DB queries executed by the view.', ('view', 'method')
+)
+ENGINE_REQUEST_SECONDS = Histogram(
+    'bridge_engine_request_duration_seconds', 'Duration of the engine driver calls.', ('engine', 'method')
+)
+ENGINE_REQUEST_ERRORS = Counter(
+    'bridge_engine_request_errors', 'Number of the engine driver calls raised an error.', ('engine', 'method')
+)
+LMS_GRADE_REQUEST_SECONDS = Histogram(
+    'bridge_lms_grade_request_duration_seconds', 'Duration of the grade passback requests to LMS.', ('status',)
+)
+CONTENT_SOURCE_REQUEST_SECONDS = Histogram(
+    'bridge_content_source_request_duration_seconds', 'Duration of the content source API requests.',
+    ('source', 'status'),
+)
+
+
+class SharedDirCollector(object):
+    """
+    Collector of the metrics written by the processes of all the services to the subdirectories of the shared directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def collect(self):
+        files = glob.glob(os.path.join(self.path, '*', '*.db'))
+        return multiprocess.MultiProcessCollector.merge(files, accumulate=True)
+
+
+def render():
+    """
+    Return metrics in the Prometheus text format, values of all the processes are collected in the multiprocess mode.
+    """
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    registry.register(SharedDirCollector(os.path.dirname(os.path.normpath(path))))
+    return generate_latest(registry)
+
+
+def clear_multiprocess_dir():
+    """
+    Remove values of the previous processes of the service, it is called before the service's workers are started.
+    """
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for filename in glob.glob(os.path.join(path, '*.db')):
+        os.remove(filename)
+
+
+def start_request_timings():
+    """
+    Start collecting durations of the current request for the `Server-Timing` header.
+    """
+    _request_timings.values = defaultdict(float)
+
+
+def add_request_timing(name, duration):
+    values = getattr(_request_timings, 'values', None)
+    if values is not None:
+        values[name] += duration
+
+
+def pop_request_timings():
+    """
+    Stop collecting durations of the current request.
+
+    :return: dict of the durations in seconds summed up by the timing name
+    """
+    values = getattr(_request_timings, 'values', None)
+    _request_timings.values = None
+    return dict(values or {})
+
+
+@contextmanager
+def timed(histogram, timing=None, **labels):
+    """
+    Observe duration of the block in the histogram and add it to the request timing if the name is given.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        histogram.labels(**labels).observe(duration)
+        if timing:
+            add_request_timing(timing, duration)
+
+
+def instrument_engine_method(method, engine):
+    """
+    Decorate engine driver method to record its duration and errors.
+    """
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with timed(ENGINE_REQUEST_SECONDS, timing='engine', engine=engine, method=method.__name__):
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                ENGINE_REQUEST_ERRORS.labels(engine=engine, method=method.__name__).inc()
+                raise
+    return wrapper
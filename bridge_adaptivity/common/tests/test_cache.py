@@ -0,0 +1,35 @@
+from django.core.cache import caches
+from django.test import TestCase
+
+
+class TestTieredCache(TestCase):
+    def setUp(self):
+        self.cache = caches['tiered']
+        caches['default'].clear()
+        self.cache.clear()
+
+    def test_value_is_read_from_l1(self):
+        self.cache.set('key', 'value')
+        caches['default'].delete('key')
+        self.assertEqual(self.cache.get('key'), 'value')
+        caches['local'].delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_l1_is_filled_from_l2(self):
+        caches['default'].set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(caches['local'].get('key'), 'value')
+
+    def test_add_and_delete(self):
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.incr('key'), 2)
+        self.assertEqual(self.cache.get('key'), 2)
+        self.cache.delete('key')
+        self.assertNotIn('key', self.cache)
+
+    def test_clear_keeps_l2(self):
+        self.cache.set('key', 'value')
+        self.cache.clear()
+        self.assertIsNone(caches['local'].get('key'))
+        self.assertEqual(self.cache.get('key'), 'value')
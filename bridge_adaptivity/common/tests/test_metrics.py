@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+import mock
+from prometheus_client import Histogram, REGISTRY, values
+
+from common import metrics
+
+
+class TestMetrics(TestCase):
+    def get_timed(self, **labels):
+        return REGISTRY.get_sample_value('bridge_view_duration_seconds_count', labels) or 0
+
+    def test_timed_adds_request_timing(self):
+        labels = {'view': 'test', 'method': 'GET'}
+        observed = self.get_timed(**labels)
+        with metrics.timed(metrics.VIEW_SECONDS, **labels):
+            pass
+        self.assertEqual(metrics.pop_request_timings(), {})
+        metrics.start_request_timings()
+        with metrics.timed(metrics.VIEW_SECONDS, timing='engine', **labels):
+            pass
+        with metrics.timed(metrics.VIEW_SECONDS, timing='engine', **labels):
+            pass
+        self.assertEqual(list(metrics.pop_request_timings()), ['engine'])
+        self.assertEqual(self.get_timed(**labels), observed + 3)
+
+    def test_instrument_engine_method(self):
+        def select_activity(sequence):
+            if sequence is None:
+                raise ValueError
+            return sequence
+
+        instrumented = metrics.instrument_engine_method(select_activity, 'engine_test')
+        labels = {'engine': 'engine_test', 'method': 'select_activity'}
+        calls = REGISTRY.get_sample_value('bridge_engine_request_duration_seconds_count', labels) or 0
+        errors = REGISTRY.get_sample_value('bridge_engine_request_errors_total', labels) or 0
+        self.assertEqual(instrumented('sequence'), 'sequence')
+        with self.assertRaises(ValueError):
+            instrumented(None)
+        self.assertEqual(REGISTRY.get_sample_value('bridge_engine_request_duration_seconds_count', labels), calls + 2)
+        self.assertEqual(REGISTRY.get_sample_value('bridge_engine_request_errors_total', labels), errors + 1)
+
+    def test_render_collects_services_processes(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        for service in ('web', 'celery'):
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': os.path.join(path, service)}):
+                metrics.clear_multiprocess_dir()
+        for service, pid, duration in (('web', 1, 0.05), ('web', 2, 0.5), ('celery', 1, 5)):
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': os.path.join(path, service)}):
+                # NOTE(idegtiarov) processes are imitated by the values written with the given pid
+                with mock.patch('prometheus_client.metrics.values.ValueClass', values.MultiProcessValue(lambda: pid)):
+                    histogram = Histogram('test_duration_seconds', 'Test duration.', registry=None, buckets=(0.1, 1))
+                    histogram.observe(duration)
+        with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': os.path.join(path, 'web')}):
+            rendered = metrics.render().decode()
+            self.assertIn('test_duration_seconds_bucket{le="0.1"} 1.0', rendered)
+            self.assertIn('test_duration_seconds_bucket{le="1.0"} 2.0', rendered)
+            self.assertIn('test_duration_seconds_count 3.0', rendered)
+            metrics.clear_multiprocess_dir()
+            self.assertIn('test_duration_seconds_count 1.0', metrics.render().decode())
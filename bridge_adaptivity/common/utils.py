@@ -16,7 +16,7 @@ def get_engine_and_collection_order(collection_order_slug):
     Return engine and CollectionOrder by CollectionOrder slug.
     """
     # NOTE(AnadreyLikhoman): Using CollectionOrder to find engine
-    collection_order = CollectionOrder.objects.filter(slug=collection_order_slug).first()
+    collection_order = CollectionOrder.objects.select_related('engine').filter(slug=collection_order_slug).first()
     if not collection_order:
         log.error(
             f"Collection_Order with the slug: {collection_order_slug} does not exist. Please check lti launch url."
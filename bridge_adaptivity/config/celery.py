@@ -1,4 +1,15 @@
+import logging
+
 from celery import Celery
+from celery.signals import worker_init
+
+log = logging.getLogger(__name__)
+
+# Cache backends which are not shared between the web and celery worker processes
+PROCESS_CACHE_BACKENDS = (
+    'django.core.cache.backends.filebased.FileBasedCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
 
 celery_app = Celery('bridge')
 
@@ -10,3 +21,26 @@ celery_app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Load task modules from all registered Django celery_app configs.
 celery_app.autodiscover_tasks()
+
+
+@worker_init.connect
+def check_shared_cache(**kwargs):
+    """
+    Warn that the worker's leases, nonces and breakers' state are not seen by the web processes.
+    """
+    from django.conf import settings
+    backend = settings.CACHES['default']['BACKEND']
+    if backend in PROCESS_CACHE_BACKENDS:
+        log.warning(
+            "Default cache %s isn't shared with the web processes, scheduled syncs, score submissions and grade "
+            "updates could be lost. Configure Redis cache with the `REDIS_CACHE_LOCATION` setting.", backend
+        )
+
+
+@worker_init.connect
+def clear_metrics(**kwargs):
+    """
+    Remove metrics of the previous worker processes, see `common.metrics`.
+    """
+    from common.metrics import clear_multiprocess_dir
+    clear_multiprocess_dir()
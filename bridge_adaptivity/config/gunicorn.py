@@ -0,0 +1,11 @@
+"""
+Gunicorn settings, usage: `gunicorn -c config/gunicorn.py config.wsgi:application`.
+"""
+
+
+def on_starting(server):
+    """
+    Remove metrics of the previous web worker processes, see `common.metrics`.
+    """
+    from common.metrics import clear_multiprocess_dir
+    clear_multiprocess_dir()
@@ -74,6 +74,7 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE = [
+    'module.middleware.ServerTimingMiddleware',
     'module.middleware.BridgeSameSiteMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -144,17 +145,53 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'module:group-list'
 
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': '/var/tmp/django_cache',
-        'TIMEOUT': 86400,  # 1 day
+# Default cache keeps the nonces, leases and circuit breakers' state shared by the web and celery worker processes, so
+# it is the same Redis which is required by the channel layer. File based cache is the explicit opt-out with the
+# `CACHE_BACKEND = 'file'` secure setting, it isn't shared between the containers and its `add` isn't atomic.
+CACHE_BACKEND = getattr(secure, 'CACHE_BACKEND', 'redis')
+REDIS_CACHE_LOCATION = getattr(secure, 'REDIS_CACHE_LOCATION', 'redis://redis:6379/1')
+
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/var/tmp/django_cache',
+            'TIMEOUT': 86400,  # 1 day
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_CACHE_LOCATION,
+            'TIMEOUT': 86400,  # 1 day
+            'KEY_PREFIX': 'bridge',
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        },
+    }
+
+# Process local cache, it is used as the L1 level of the tiered cache
+CACHES['local'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'bridge-local',
+    'TIMEOUT': 60,
+}
+
+# Tiered cache for the read-mostly keys, see `common.cache.TieredCache`
+CACHES['tiered'] = {
+    'BACKEND': 'common.cache.TieredCache',
+    'OPTIONS': {
+        'L1': 'local',
+        'L2': 'default',
+        'L1_TIMEOUT': 5,
     },
 }
 
 # Celery settings
 
-# Timespan for running sync task in seconds
+# Timespan for running sync task in seconds, sync is postponed until the collection is not changed for this time
 CELERY_DELAY_SYNC_TASK = 5 * 60  # default value is equal to 5 minutes
 CELERY_RESULT_TIMEOUT = 30  # default value is equal 0.5 minute
 
@@ -166,6 +203,80 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_RESULT_BACKEND = 'amqp'
 CELERY_TASK_RESULT_EXPIRES = 300  # 5 minutes
 
+# Adaptive engine score submission queue settings
+# Pending scores are coalesced and sent to the engine once per batch window (in milliseconds) by batches of batch size
+ENGINE_SUBMISSION_BATCH_SIZE = 100
+ENGINE_SUBMISSION_BATCH_WINDOW = 500
+ENGINE_SUBMISSION_FLUSH_LOCK_TIMEOUT = 5 * 60
+# Delay in seconds before the second attempt of the failed submission, it is doubled with every next attempt
+ENGINE_SUBMISSION_RETRY_DELAY = 10
+ENGINE_SUBMISSION_MAX_ATTEMPTS = 8
+# Interval in seconds of the sweep of the pending scores which flush is lost
+ENGINE_SUBMISSION_SWEEP_INTERVAL = 60
+
+# Periodic tasks, they are run by the celery beat embedded into the worker (`-B` option)
+CELERY_BEAT_SCHEDULE = {
+    'sweep-engine-submissions': {
+        'task': 'module.tasks.sweep_engine_submissions',
+        'schedule': ENGINE_SUBMISSION_SWEEP_INTERVAL,
+    },
+}
+
+# Students' grades update settings
+# Sequences are sent to the LMS by chunks of chunk size, every chunk is sent by the pool of concurrency size
+GRADE_PASSBACK_CHUNK_SIZE = 100
+GRADE_PASSBACK_CONCURRENCY = 8
+GRADE_PASSBACK_PROGRESS_TIMEOUT = 24 * 60 * 60
+# Grade is sent to the LMS by the celery task in this window in seconds after the latest grade change
+GRADE_PASSBACK_DEBOUNCE_WINDOW = 5
+# Delay in seconds before the second attempt of the not accepted grade, it is doubled with every next attempt
+GRADE_PASSBACK_RETRY_DELAY = 30
+GRADE_PASSBACK_MAX_ATTEMPTS = 6
+
+# Engines circuit breaker settings
+# Breaker is opened when the share of failed or slower than slow call (in seconds) engine calls reaches the failure rate
+# within the window (in seconds), but not before the min number of calls is made
+ENGINE_BREAKER_FAILURE_RATE = 0.5
+ENGINE_BREAKER_MIN_CALLS = 10
+ENGINE_BREAKER_WINDOW = 60
+ENGINE_BREAKER_SLOW_CALL = 5
+# Engine is not called for reset timeout in seconds after the breaker is opened, then one probe call is allowed
+ENGINE_BREAKER_RESET_TIMEOUT = 30
+# Driver selecting activities while the engine is unavailable, set None to disable the fallback
+ENGINE_FALLBACK_DRIVER = 'module.engines.engine_mock.EngineMock'
+# Lifetime in seconds of the mock engine's index of the activities available for the sequence
+ENGINE_MOCK_AVAILABILITY_TIMEOUT = 60 * 60
+# Lifetime in seconds of the learner's ability estimate cached by the IRT engine
+ENGINE_IRT_ABILITY_TIMEOUT = 60 * 60
+# Bayesian Knowledge Tracing engine settings: probabilities of the initial mastery of the skill, learning the skill
+# with one answer, wrong answer on the mastered skill and right guess on the not mastered one. Skill with the mastery
+# above the threshold is considered as mastered
+ENGINE_BKT_PARAMS = {
+    'P_INIT': 0.2,
+    'P_TRANSIT': 0.15,
+    'P_SLIP': 0.1,
+    'P_GUESS': 0.2,
+    'MASTERY_THRESHOLD': 0.95,
+}
+# Lifetime in seconds of the collection's skills index of the BKT engine
+ENGINE_BKT_SKILLS_TIMEOUT = 24 * 60 * 60
+
+# Lifetime in seconds of the speculatively computed recommendation (CollectionOrder.speculative_recommendation)
+SPECULATIVE_RECOMMENDATION_TIMEOUT = 60 * 60
+
+# LTI nonce replay protection settings
+# Used nonce is stored for the lifetime in seconds, nonces are expired together by the time buckets of bucket size
+LTI_NONCE_LIFETIME = 10
+LTI_NONCE_BUCKET_SIZE = 5
+# Max number of the recently used nonces kept in the process memory in front of the cache
+LTI_NONCE_FRONT_SIZE = 10000
+# Lifetime in seconds of the LMS platform in the tiered cache, cached platform is dropped when it is changed
+LTI_LMS_PLATFORM_CACHE_TIMEOUT = 60 * 60
+
+# Metrics settings
+# Token expected in the `Authorization: Bearer <token>` header of the `/metrics/` requests, it is required unless DEBUG
+METRICS_TOKEN = getattr(secure, 'METRICS_TOKEN', None)
+
 # This settings are related to module/egines and declare gradable problems
 PROBLEM_ACTIVITY_TYPES = (
     'problem',
@@ -31,3 +31,11 @@ DATABASES = {
 # Celery settings
 AMQP_USER = 'bridge_celery_user'
 AMQP_PASS = 'bridge_celery_password'
+
+# Redis cache location, default is the `redis` service of the docker-compose
+# REDIS_CACHE_LOCATION = 'redis://redis:6379/1'
+# Set to 'file' to use FileBasedCache instead of Redis, only if web and celery worker run on the same host
+# CACHE_BACKEND = 'redis'
+
+# Token of the `/metrics/` page, page is forbidden without the token unless DEBUG
+# METRICS_TOKEN = 'change-me'
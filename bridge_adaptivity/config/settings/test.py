@@ -19,6 +19,12 @@ DATABASES['default'].update(UPDATE_DATABASE)
 
 SECRET_KEY = 'KEY'
 
+# Tests run in one process, cache doesn't need to be shared
+CACHES['default'] = {  # noqa: F405
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'bridge-test',
+}
+
 DEBUG = False
 
 # Disable versions of the static file for the tests
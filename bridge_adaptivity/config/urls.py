@@ -16,6 +16,7 @@ urlpatterns = [
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('admin/', admin.site.urls),
     path('health/', views.health),
+    path('metrics/', views.metrics),
 
     path('', login_required(RedirectView.as_view(pattern_name='module:group-list')), name='index'),
     path('lti/', include(lti)),
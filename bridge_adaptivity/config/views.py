@@ -1,7 +1,11 @@
 from logging import getLogger
 
+from django.conf import settings
 from django.contrib.auth.views import LoginView
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from common.metrics import render
 
 log = getLogger(__name__)
 
@@ -10,6 +14,21 @@ def health(request):
     return HttpResponse()
 
 
+def metrics(request):
+    """
+    Expose metrics in the Prometheus text format, see `common.metrics`.
+
+    Page is available without the `METRICS_TOKEN` in the DEBUG mode only.
+    """
+    if not settings.METRICS_TOKEN:
+        if not settings.DEBUG:
+            log.warning('Metrics page is forbidden, METRICS_TOKEN setting is not configured.')
+            return HttpResponseForbidden()
+    elif request.META.get('HTTP_AUTHORIZATION') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type=CONTENT_TYPE_LATEST)
+
+
 class BridgeLoginView(LoginView):
     """
     OverLoad Login Class view to make available read-only mode.
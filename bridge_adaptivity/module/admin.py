@@ -4,8 +4,8 @@ from django.contrib.admin.widgets import FilteredSelectMultiple
 from ordered_model.admin import OrderedTabularInline
 
 from .models import (
-    Activity, Collection, CollectionOrder, ContributorPermission, Engine, GradingPolicy, Log, ModuleGroup, Sequence,
-    SequenceItem
+    Activity, Collection, CollectionOrder, ContributorPermission, Engine, EngineSubmission, GradeDeadLetter,
+    GradePassback, GradingPolicy, Log, ModuleGroup, Sequence, SequenceItem
 )
 
 
@@ -97,6 +97,29 @@ class LogAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(EngineSubmission)
+class EngineSubmissionAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'sequence', 'sequence_item', 'engine', 'score', 'status', 'attempts', 'created_at', 'next_attempt_at',
+        'sent_at',
+    )
+    list_filter = ('status', 'engine')
+    readonly_fields = ('sequence', 'sequence_item')
+
+
+@admin.register(GradePassback)
+class GradePassbackAdmin(admin.ModelAdmin):
+    list_display = ('id', 'sequence', 'grade', 'status', 'lms_status', 'error', 'sent_at', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('sequence',)
+
+
+@admin.register(GradeDeadLetter)
+class GradeDeadLetterAdmin(admin.ModelAdmin):
+    list_display = ('id', 'sequence', 'grade', 'attempts', 'lms_status', 'error', 'created_at')
+    readonly_fields = ('sequence',)
+
+
 class ModuleGroupStackedInline(admin.StackedInline):
     model = ModuleGroup
     extra = 0
@@ -0,0 +1,154 @@
+"""
+Circuit breaker of the adaptive engines.
+
+Breaker counts engine calls and failures (errors, empty responses and calls slower than the slow call threshold)
+within the time window. When the share of failures reaches the failure rate the breaker is opened and the engine is not
+called until the reset timeout is expired, selection falls back to the local strategy instead. After the reset timeout
+one probe call is allowed (half-open state), it closes the breaker on success or opens it again on failure.
+
+State of the breaker is stored in the cache, so it is shared by all the web and celery workers.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+log = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreakerOpen(Exception):
+    """
+    Engine is not called because its breaker is open.
+    """
+
+
+class CircuitBreaker(object):
+    KEY = 'engine:{}:breaker'
+
+    def __init__(self, engine_id):
+        self.engine_id = engine_id
+        self.key = self.KEY.format(engine_id)
+        self.failure_rate = settings.ENGINE_BREAKER_FAILURE_RATE
+        self.min_calls = settings.ENGINE_BREAKER_MIN_CALLS
+        self.window = settings.ENGINE_BREAKER_WINDOW
+        self.slow_call = settings.ENGINE_BREAKER_SLOW_CALL
+        self.reset_timeout = settings.ENGINE_BREAKER_RESET_TIMEOUT
+
+    def _counter_key(self, name, now):
+        return '{}:{}:{}'.format(self.key, int(now // self.window), name)
+
+    def _incr(self, name, now):
+        key = self._counter_key(name, now)
+        cache.add(key, 0, self.window * 2)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # NOTE(idegtiarov) counter is expired between `add` and `incr`
+            cache.set(key, 1, self.window * 2)
+            return 1
+
+    @property
+    def opened_at(self):
+        return cache.get('{}:opened_at'.format(self.key))
+
+    @property
+    def state(self):
+        opened_at = self.opened_at
+        if opened_at is None:
+            return CLOSED
+        return OPEN if time.time() < opened_at + self.reset_timeout else HALF_OPEN
+
+    def allow_request(self):
+        """
+        Check engine could be called, only one probe call is allowed in the half-open state.
+
+        :return: tuple of boolean flags, whether engine could be called and whether the call is the probe one
+        """
+        state = self.state
+        if state == CLOSED:
+            return True, False
+        if state == HALF_OPEN and cache.add('{}:probe'.format(self.key), True, self.reset_timeout):
+            return True, True
+        return False, False
+
+    def open(self):
+        cache.set('{}:opened_at'.format(self.key), time.time(), None)
+        cache.delete('{}:probe'.format(self.key))
+        log.warning("[Engine] Circuit breaker of the engine {} is opened.".format(self.engine_id))
+
+    def close(self):
+        now = time.time()
+        cache.delete_many([
+            '{}:opened_at'.format(self.key),
+            '{}:probe'.format(self.key),
+            self._counter_key('calls', now),
+            self._counter_key('failures', now),
+        ])
+        log.info("[Engine] Circuit breaker of the engine {} is closed.".format(self.engine_id))
+
+    def record(self, success, duration, probe=False):
+        """
+        Record the result of the engine call and open or close the breaker.
+
+        :param success: boolean flag, whether engine call is succeeded
+        :param duration: duration of the call in seconds
+        :param probe: boolean flag, whether the call is the probe call of the half-open breaker
+        """
+        failed = not success or duration > self.slow_call
+        if probe:
+            if failed:
+                self.open()
+            else:
+                self.close()
+            return
+        now = time.time()
+        calls = self._incr('calls', now)
+        if not failed:
+            return
+        failures = self._incr('failures', now)
+        if calls >= self.min_calls and failures / calls >= self.failure_rate and self.state == CLOSED:
+            self.open()
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call engine through the breaker, empty result of the call is considered as failure.
+
+        :raise CircuitBreakerOpen: if the breaker is open
+        """
+        allowed, probe = self.allow_request()
+        if not allowed:
+            raise CircuitBreakerOpen("Circuit breaker of the engine {} is open.".format(self.engine_id))
+        started = time.time()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record(False, time.time() - started, probe)
+            raise
+        self.record(result is not None, time.time() - started, probe)
+        return result
+
+    def get_stats(self):
+        now = time.time()
+        calls, failures = (cache.get(self._counter_key(name, now)) or 0 for name in ('calls', 'failures'))
+        return {
+            'engine_id': self.engine_id,
+            'state': self.state,
+            'opened_at': self.opened_at,
+            'calls': calls,
+            'failures': failures,
+        }
+
+
+def get_fallback_driver():
+    """
+    Return driver of the local selection strategy used while the engine is unavailable or None if it isn't configured.
+    """
+    if not settings.ENGINE_FALLBACK_DRIVER:
+        return None
+    return import_string(settings.ENGINE_FALLBACK_DRIVER)()
@@ -0,0 +1,262 @@
+"""
+In-process adaptive engine based on the Bayesian Knowledge Tracing.
+
+Skills of the activities are parsed from the `Activity.tags` when the collection is synchronized with the engine.
+Learner's mastery of every skill of the collection is stored in the `Sequence.skill_mastery` field as the packed float
+array and is updated with the new scores of the problem activities on the selection and submission. Mastery is traced
+from all the answers again if the traced answer is re-scored. Engine selects the pre-assessment activities
+first, then the generic activity of the weakest not mastered skill and the post-assessment activities last. Generic
+activities without tags are not selected by the engine.
+"""
+from collections import OrderedDict
+import logging
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+import numpy as np
+
+from module.engines.interface import EngineInterface
+
+log = logging.getLogger(__name__)
+
+SKILLS_KEY = 'engine_bkt:collection:{}:skills'
+
+# Mastery is packed as the header with the fingerprint of the collection's skills, the id of the last traced sequence
+# item and the checksum of the traced answers followed by the little-endian float32 values
+HEADER_DTYPE = np.dtype('<u8')
+HEADER_SIZE = 3 * HEADER_DTYPE.itemsize
+MASTERY_DTYPE = np.dtype('<f4')
+
+
+def parse_skills(tags):
+    """
+    Return list of the skills from the comma separated tags.
+    """
+    return list(OrderedDict.fromkeys(tag.strip().lower() for tag in (tags or '').split(',') if tag.strip()))
+
+
+def answers_checksum(answers, checksum=0):
+    """
+    Return checksum of the answers, checksum of the next answers is continued from the checksum of the previous ones.
+
+    :param answers: list of the (sequence item id, activity id, score) tuples ordered by the sequence item id
+    :param checksum: checksum of the previous answers
+    """
+    for item_id, _, score in answers:
+        checksum = zlib.crc32('{}:{!r};'.format(item_id, float(score)).encode('utf-8'), checksum)
+    return checksum
+
+
+class EngineBKT(EngineInterface):
+    """
+    Local adaptive engine selecting activities of the weakest not mastered skill of the learner.
+
+    Engine doesn't need any settings, parameters of the knowledge tracing model are configured with the
+    `ENGINE_BKT_PARAMS` setting.
+    """
+
+    def __init__(self, **kwargs):
+        params = settings.ENGINE_BKT_PARAMS
+        self.p_init = params['P_INIT']
+        self.p_transit = params['P_TRANSIT']
+        self.p_slip = params['P_SLIP']
+        self.p_guess = params['P_GUESS']
+        self.mastery_threshold = params['MASTERY_THRESHOLD']
+
+    @staticmethod
+    def _skills_key(collection_id):
+        return SKILLS_KEY.format(collection_id)
+
+    @staticmethod
+    def build_skills_index(collection):
+        """
+        Build index of the collection's skills with one DB query.
+
+        :param collection: Collection instance
+        :return: dict with the sorted skills, their fingerprint, skill to activities index and activities details
+        """
+        activities = list(collection.activities.values_list('id', 'atype', 'source_launch_url', 'repetition', 'tags'))
+        skills = sorted({skill for *_, tags in activities for skill in parse_skills(tags)})
+        skill_positions = {skill: position for position, skill in enumerate(skills)}
+        index = {
+            'version': collection.updated_at,
+            'skills': skills,
+            'fingerprint': zlib.crc32('\n'.join(skills).encode('utf-8')),
+            'skill_activities': [[] for _ in skills],
+            'activity_skills': {},
+            'urls': {},
+            'repetitions': {},
+            'A': [],
+            'Z': [],
+        }
+        for activity_id, atype, source_launch_url, repetition, tags in activities:
+            index['urls'][activity_id] = source_launch_url
+            index['repetitions'][activity_id] = repetition
+            activity_skills = [skill_positions[skill] for skill in parse_skills(tags)]
+            index['activity_skills'][activity_id] = activity_skills
+            if atype in ('A', 'Z'):
+                index[atype].append(activity_id)
+                continue
+            for position in activity_skills:
+                index['skill_activities'][position].append(activity_id)
+        return index
+
+    def get_skills_index(self, collection):
+        """
+        Return index of the collection's skills, index is rebuilt if it is missed or the collection is changed.
+        """
+        index = cache.get(self._skills_key(collection.id))
+        if index is None or index['version'] != collection.updated_at:
+            index = self.build_skills_index(collection)
+            cache.set(self._skills_key(collection.id), index, settings.ENGINE_BKT_SKILLS_TIMEOUT)
+        return index
+
+    @staticmethod
+    def pack_mastery(index, mastery, last_item_id, checksum):
+        header = np.array([index['fingerprint'], last_item_id, checksum], dtype=HEADER_DTYPE)
+        return header.tobytes() + mastery.astype(MASTERY_DTYPE).tobytes()
+
+    @staticmethod
+    def unpack_mastery(index, packed):
+        """
+        Return tuple of the skills mastery array, the last traced sequence item id and the traced answers checksum.
+
+        (None, 0, 0) is returned if mastery is not stored yet or it is stored for the other skills of the collection.
+        """
+        if not packed:
+            return None, 0, 0
+        packed = bytes(packed)
+        fingerprint, last_item_id, checksum = np.frombuffer(packed[:HEADER_SIZE], dtype=HEADER_DTYPE)
+        if fingerprint != index['fingerprint']:
+            return None, 0, 0
+        return np.frombuffer(packed[HEADER_SIZE:], dtype=MASTERY_DTYPE).copy(), int(last_item_id), int(checksum)
+
+    def trace(self, mastery, skills, score):
+        """
+        Update mastery of the activity's skills with the score of the answer.
+
+        :param mastery: array of the skills mastery
+        :param skills: list of the activity's skills positions
+        :param score: answer's score in range 0.0 - 1.0, fractional score is the probability of the correct answer
+        """
+        for position in skills:
+            learned = float(mastery[position])
+            correct = learned * (1 - self.p_slip) + (1 - learned) * self.p_guess
+            learned_if_correct = learned * (1 - self.p_slip) / correct
+            learned_if_incorrect = learned * self.p_slip / (1 - correct)
+            learned = score * learned_if_correct + (1 - score) * learned_if_incorrect
+            mastery[position] = learned + (1 - learned) * self.p_transit
+        return mastery
+
+    def get_mastery(self, sequence, index, sequence_items=None):
+        """
+        Return array of the learner's skills mastery updated with the answers which aren't traced yet.
+
+        Answers are read from the sequence items, so the answer which is not submitted to the engine yet is traced.
+        Mastery is traced from all the answers again if it is not stored yet, the collection's skills are changed or
+        the traced answers are changed: re-scored, or the earlier item is answered after the later one.
+
+        :param sequence: Sequence instance
+        :param index: skills index of the sequence's collection
+        :param sequence_items: list of the sequence items' (id, activity_id, score, is_problem) tuples, they are read
+            from the DB if not provided
+        """
+        if sequence_items is None:
+            sequence_items = sequence.items.values_list('id', 'activity_id', 'score', 'is_problem')
+        answers = sorted(
+            (item_id, activity_id, score) for item_id, activity_id, score, is_problem in sequence_items
+            if is_problem and score is not None
+        )
+        mastery, last_item_id, checksum = self.unpack_mastery(index, sequence.skill_mastery)
+        traced = [answer for answer in answers if answer[0] <= last_item_id]
+        if mastery is None or answers_checksum(traced) != checksum:
+            mastery, last_item_id, checksum = np.full(len(index['skills']), self.p_init, dtype=MASTERY_DTYPE), 0, 0
+        new_answers = [answer for answer in answers if answer[0] > last_item_id]
+        if new_answers or not sequence.skill_mastery:
+            for _, activity_id, score in new_answers:
+                self.trace(mastery, index['activity_skills'].get(activity_id, []), score)
+            last_item_id = new_answers[-1][0] if new_answers else last_item_id
+            self.save_mastery(sequence, self.pack_mastery(
+                index, mastery, last_item_id, answers_checksum(new_answers, checksum)
+            ))
+        return mastery
+
+    @staticmethod
+    def save_mastery(sequence, packed):
+        # NOTE(idegtiarov) mastery is updated directly, so it isn't overwritten by the concurrent `Sequence.save`
+        sequence.skill_mastery = packed
+        type(sequence).objects.filter(id=sequence.id).update(skill_mastery=packed)
+
+    def select_activity(self, sequence):
+        """
+        Select the activity of the weakest not mastered skill, which is not repeated the allowed number of times.
+
+        :param sequence: Sequence instance
+        :return: selected activity source_launch_url
+        """
+        index = self.get_skills_index(sequence.collection_order.collection)
+        sequence_items = list(sequence.items.values_list('id', 'activity_id', 'score', 'is_problem'))
+        taken = {}
+        for _, activity_id, _, _ in sequence_items:
+            taken[activity_id] = taken.get(activity_id, 0) + 1
+
+        def first_available(activities):
+            for activity_id in activities:
+                if taken.get(activity_id, 0) < index['repetitions'][activity_id]:
+                    return activity_id
+
+        chosen = first_available(index['A'])
+        if chosen is None and index['skills']:
+            mastery = self.get_mastery(sequence, index, sequence_items)
+            for position in np.argsort(mastery, kind='stable'):
+                if mastery[position] >= self.mastery_threshold:
+                    break
+                chosen = first_available(index['skill_activities'][position])
+                if chosen is not None:
+                    break
+        if chosen is None:
+            chosen = first_available(index['Z'])
+        chosen_activity_url = index['urls'].get(chosen)
+        log.debug("[BKT Engine] Chosen activity is: {}".format(chosen_activity_url))
+        return {'source_launch_url': chosen_activity_url} if chosen_activity_url else {'complete': True}
+
+    def sync_collection_activities(self, collection):
+        """
+        Parse skills of the collection's activities and store the skills index.
+        """
+        index = self.build_skills_index(collection)
+        cache.set(self._skills_key(collection.id), index, settings.ENGINE_BKT_SKILLS_TIMEOUT)
+        log.debug("[BKT Engine] The Collection {} was successfully synchronized.".format(collection.name))
+        return True
+
+    def submit_activity_answer(self, sequence_item):
+        return self.submit_activity_answers([sequence_item])[0]
+
+    def submit_activity_answers(self, sequence_items):
+        """
+        Update mastery of the answered activities' skills, mastery of every sequence is read and stored once.
+
+        Answers which are already traced on the selection are skipped, re-scored answers are found by the checksum of
+        the traced answers on the next selection and mastery is traced from all the answers with their latest scores.
+        """
+        sequences = OrderedDict()
+        for sequence_item in sequence_items:
+            if sequence_item.score is not None and sequence_item.is_problem:
+                sequences.setdefault(sequence_item.sequence_id, []).append(sequence_item)
+        for items in sequences.values():
+            sequence = items[0].sequence
+            index = self.get_skills_index(sequence.collection_order.collection)
+            mastery, last_item_id, checksum = self.unpack_mastery(index, sequence.skill_mastery)
+            if mastery is None:
+                # NOTE(idegtiarov) mastery is traced from all the answers on the next selection
+                continue
+            answers = sorted((item.id, item.activity_id, item.score) for item in items if item.id > last_item_id)
+            if not answers:
+                continue
+            for _, activity_id, score in answers:
+                self.trace(mastery, index['activity_skills'].get(activity_id, []), score)
+            self.save_mastery(sequence, self.pack_mastery(
+                index, mastery, answers[-1][0], answers_checksum(answers, checksum)
+            ))
+        return [True] * len(sequence_items)
@@ -0,0 +1,265 @@
+"""
+In-process adaptive engine based on the Item Response Theory.
+
+Activities are described by the two parameter logistic model: probability of the correct answer of the learner with
+ability `theta` is `1 / (1 + exp(-a * (theta - b)))`, where the difficulty `b` is seeded from the `Activity.difficulty`
+and the discrimination `a` is 1. Engine selects the pre-assessment activities first, then the generic activity with the
+maximal Fisher information at the learner's current ability estimate and the post-assessment activities last.
+
+Item parameters of the collection are kept in the NumPy arrays in the process memory, so selection is done with one
+vectorized pass over the collection without any network requests. Learners' ability estimates are shared by the worker
+processes through the cache, they are updated incrementally with the new answers on the selection and submission.
+"""
+import logging
+import math
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+import numpy as np
+
+from module.engines.interface import EngineInterface
+
+log = logging.getLogger(__name__)
+
+ABILITY_KEY = 'engine_irt:sequence:{}:ability'
+
+ATYPES = {'A': 0, 'G': 1, 'Z': 2}
+
+# Difficulty in range 0.0 - 1.0 is clipped before it is converted to the logit scale
+MIN_DIFFICULTY = 0.01
+MAX_DIFFICULTY = 0.99
+
+# Prior of the learner's ability is the standard normal distribution
+PRIOR_ABILITY = 0.0
+PRIOR_INFORMATION = 1.0
+
+
+def difficulty_to_logit(difficulty):
+    difficulty = np.clip(np.asarray(difficulty, dtype=np.float32), MIN_DIFFICULTY, MAX_DIFFICULTY)
+    return np.log(difficulty / (1 - difficulty))
+
+
+class CollectionItems(object):
+    """
+    Item parameters of the collection's activities in the collection order.
+    """
+
+    def __init__(self, version, activities):
+        self.version = version
+        ids, atypes, urls, difficulties, discriminations, repetitions, is_problems = (
+            zip(*activities) if activities else ((),) * 7
+        )
+        self.ids = np.array(ids, dtype=np.int64)
+        self.urls = list(urls)
+        self.atypes = np.array([ATYPES[atype] for atype in atypes], dtype=np.int8)
+        self.difficulties = difficulty_to_logit(difficulties)
+        self.discriminations = np.array(discriminations, dtype=np.float32)
+        self.repetitions = np.array(repetitions, dtype=np.int32)
+        self.is_problems = np.array(is_problems, dtype=bool)
+        # NOTE(idegtiarov) activities ids are sorted to count the taken activities with `searchsorted`
+        self.id_order = np.argsort(self.ids)
+        self.sorted_ids = self.ids[self.id_order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def positions(self, activity_ids):
+        """
+        Return array of the activities' positions in the collection, position of the unknown activity is -1.
+
+        :param activity_ids: list of the activities ids
+        """
+        if not len(self) or not len(activity_ids):
+            return np.full(len(activity_ids), -1, dtype=np.int64)
+        activity_ids = np.asarray(activity_ids, dtype=np.int64)
+        positions = np.searchsorted(self.sorted_ids, activity_ids).clip(0, len(self) - 1)
+        return np.where(self.sorted_ids[positions] == activity_ids, self.id_order[positions], -1)
+
+    def taken_counts(self, activity_ids):
+        """
+        Return array with the number of times every activity of the collection is taken.
+
+        :param activity_ids: list of the taken activities ids, the same id is repeated for the repeated activity
+        """
+        counts = np.zeros(len(self), dtype=np.int32)
+        positions = self.positions(activity_ids)
+        np.add.at(counts, positions[positions >= 0], 1)
+        return counts
+
+    def information(self, theta):
+        """
+        Return array of the Fisher information of the activities at the ability theta.
+        """
+        probability = 1 / (1 + np.exp(-self.discriminations * (theta - self.difficulties)))
+        return np.where(
+            self.is_problems, self.discriminations ** 2 * probability * (1 - probability), 0
+        ).astype(np.float32)
+
+
+class EngineIRT(EngineInterface):
+    """
+    Local adaptive engine selecting the most informative activity for the learner's ability estimate.
+
+    Engine doesn't need any settings, it works with the data stored on the Bridge.
+    """
+
+    def __init__(self, **kwargs):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _ability_key(sequence_id):
+        return ABILITY_KEY.format(sequence_id)
+
+    def get_collection_items(self, collection):
+        """
+        Return item parameters of the collection, parameters are rebuilt when the collection is changed.
+
+        :param collection: Collection instance
+        :return: CollectionItems instance
+        """
+        version = collection.updated_at
+        items = self._collections.get(collection.id)
+        if items is not None and items.version == version:
+            return items
+        activities = list(collection.activities.values_list(
+            'id', 'atype', 'source_launch_url', 'difficulty', 'repetition', 'stype'
+        ))
+        items = CollectionItems(version, [
+            (activity_id, atype, url, difficulty, 1.0, repetition, stype in settings.PROBLEM_ACTIVITY_TYPES)
+            for activity_id, atype, url, difficulty, repetition, stype in activities
+        ])
+        with self._lock:
+            self._collections[collection.id] = items
+        log.debug("[IRT Engine] Item parameters of the {} are built, {} activities.".format(collection, len(items)))
+        return items
+
+    @staticmethod
+    def update_ability(ability, item_id, difficulty, score, discrimination=1.0):
+        """
+        Update the learner's ability estimate with the answer by the Newton-Raphson step of the MAP estimate.
+
+        :param ability: dict with the ability estimate `theta`, its accumulated Fisher `information` and the `scores` of
+            the traced sequence items
+        :param item_id: id of the answered sequence item, answers are traced in the order of the items
+        :param difficulty: activity's difficulty on the logit scale
+        :param score: answer's score in range 0.0 - 1.0
+        :param discrimination: activity's discrimination
+        """
+        probability = 1 / (1 + math.exp(-discrimination * (ability['theta'] - difficulty)))
+        ability['information'] += discrimination ** 2 * probability * (1 - probability)
+        ability['theta'] += discrimination * (score - probability) / ability['information']
+        ability['scores'][item_id] = score
+        return ability
+
+    @staticmethod
+    def initial_ability():
+        return {'theta': PRIOR_ABILITY, 'information': PRIOR_INFORMATION, 'scores': {}}
+
+    def get_ability(self, sequence, items, sequence_items):
+        """
+        Return the learner's ability estimate updated with the answers which aren't traced yet.
+
+        Stored estimate is updated incrementally with the new answers. It is traced from all the answers again if the
+        traced answer is re-scored or the earlier item is answered after the later one.
+
+        :param sequence: Sequence instance
+        :param items: CollectionItems of the sequence's collection
+        :param sequence_items: list of the sequence items' (id, activity_id, score, is_problem) tuples
+        :return: ability dict, see `update_ability`
+        """
+        answers = sorted(
+            (item_id, activity_id, score) for item_id, activity_id, score, is_problem in sequence_items
+            if is_problem and score is not None
+        )
+        scores = {item_id: score for item_id, _, score in answers}
+        key = self._ability_key(sequence.id)
+        ability = cache.get(key)
+        if ability is not None:
+            last_item_id = max(ability['scores'], default=0)
+            if any(scores.get(item_id) != score for item_id, score in ability['scores'].items()) or any(
+                item_id < last_item_id for item_id, _, _ in answers if item_id not in ability['scores']
+            ):
+                ability = None
+        if ability is None:
+            ability = self.initial_ability()
+        new_answers = [answer for answer in answers if answer[0] not in ability['scores']]
+        if not new_answers:
+            return ability
+        positions = items.positions([activity_id for _, activity_id, _ in new_answers])
+        for (item_id, _, score), position in zip(new_answers, positions):
+            # NOTE(idegtiarov) activity removed from the collection is traced with the average difficulty
+            difficulty = float(items.difficulties[position]) if position >= 0 else 0.0
+            self.update_ability(ability, item_id, difficulty, score)
+        cache.set(key, ability, settings.ENGINE_IRT_ABILITY_TIMEOUT)
+        return ability
+
+    def select_activity(self, sequence):
+        """
+        Select the most informative activity for the learner, which is not repeated the allowed number of times.
+
+        Taken activities and the answers are read with one query, so the answer which is not submitted to the engine
+        yet is used for the ability estimate.
+
+        :param sequence: Sequence instance
+        :return: selected activity source_launch_url
+        """
+        items = self.get_collection_items(sequence.collection_order.collection)
+        sequence_items = list(sequence.items.values_list('id', 'activity_id', 'score', 'is_problem'))
+        taken = items.taken_counts([activity_id for _, activity_id, _, _ in sequence_items])
+        available = taken < items.repetitions
+        chosen = None
+        for atype in ('A', 'G', 'Z'):
+            candidates = available & (items.atypes == ATYPES[atype])
+            if not candidates.any():
+                continue
+            if atype == 'G':
+                theta = self.get_ability(sequence, items, sequence_items)['theta']
+                chosen = int(np.argmax(np.where(candidates, items.information(theta), -1)))
+            else:
+                chosen = int(np.argmax(candidates))
+            break
+        chosen_activity_url = items.urls[chosen] if chosen is not None else None
+        log.debug("[IRT Engine] Chosen activity is: {}".format(chosen_activity_url))
+        return {'source_launch_url': chosen_activity_url} if chosen_activity_url else {'complete': True}
+
+    def sync_collection_activities(self, collection):
+        """
+        Drop item parameters of the collection, they are rebuilt on the next selection.
+        """
+        with self._lock:
+            self._collections.pop(collection.id, None)
+        log.debug("[IRT Engine] The Collection {} was successfully synchronized.".format(collection.name))
+        return True
+
+    def submit_activity_answer(self, sequence_item):
+        """
+        Update the learner's ability estimate with the answer.
+
+        Estimate is dropped if the traced answer is re-scored or the earlier item is answered, it is traced from all the
+        answers on the next selection.
+        """
+        if sequence_item.score is None or not sequence_item.is_problem:
+            return True
+        key = self._ability_key(sequence_item.sequence_id)
+        ability = cache.get(key)
+        if ability is None or ability['scores'].get(sequence_item.id) == sequence_item.score:
+            return True
+        if sequence_item.id in ability['scores'] or sequence_item.id < max(ability['scores'], default=0):
+            cache.delete(key)
+        else:
+            difficulty = float(difficulty_to_logit(sequence_item.activity.difficulty))
+            cache.set(
+                key,
+                self.update_ability(ability, sequence_item.id, difficulty, sequence_item.score),
+                settings.ENGINE_IRT_ABILITY_TIMEOUT,
+            )
+        log.debug("[IRT Engine] Answer of the {} is submitted.".format(sequence_item))
+        return True
+
+    def forget_sequence(self, sequence_id):
+        """
+        Drop the learner's ability estimate, it is traced from all the answers on the next selection.
+        """
+        cache.delete(self._ability_key(sequence_id))
@@ -1,60 +1,110 @@
 import logging
 import random
 
-from django.db.models import Count
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
 
 from module.engines.interface import EngineInterface
 
 log = logging.getLogger(__name__)
 
+AVAILABILITY_KEY = 'engine_mock:sequence:{}:availability'
+
 
 class EngineMock(EngineInterface):
     """Mock adaptive engine which is used by default if no other engines were added."""
 
     @staticmethod
-    def _get_s_activities_list(sequence):
+    def _availability_key(sequence_id):
+        return AVAILABILITY_KEY.format(sequence_id)
+
+    @staticmethod
+    def _build_availability(sequence, version):
         """
-        Create list with the activities ids which should be excluded from the selection.
+        Build index of the collection's activities available for the sequence with one DB query.
+
+        Index contains remaining number of repetitions and launch url of the available activities, which ids are
+        bucketed by the activity type in the collection order.
 
         :param sequence: sequence
-        :return: list of ids
+        :param version: version of the collection's activities the index is built for
+        :return: availability index dict
         """
-        s_activities_ids = []
-        s_activities_list = list(
-            sequence.items.values('activity_id', 'activity__repetition').
-            order_by('activity_id').
-            annotate(repeated=Count('activity_id')).
-            values('activity_id', 'repeated', 'activity__repetition')
-        )
-        for i, item in enumerate(s_activities_list):
-            if item['activity__repetition'] > item['repeated']:
+        availability = {'version': version, 'remaining': {}, 'urls': {}, 'A': [], 'G': [], 'Z': []}
+        activities = sequence.collection_order.collection.activities.annotate(
+            repeated=Count('sequenceitem', filter=Q(sequenceitem__sequence=sequence))
+        ).values_list('id', 'atype', 'source_launch_url', 'repetition', 'repeated')
+        for activity_id, atype, source_launch_url, repetition, repeated in activities:
+            if repetition <= repeated:
                 continue
-            s_activities_ids.append(item['activity_id'])
-        return s_activities_ids
+            availability['remaining'][activity_id] = repetition - repeated
+            availability['urls'][activity_id] = source_launch_url
+            availability[atype].append(activity_id)
+        return availability
+
+    def _get_availability(self, sequence):
+        collection = sequence.collection_order.collection
+        version = [collection.id, collection.updated_at]
+        key = self._availability_key(sequence.id)
+        availability = cache.get(key)
+        if availability is None or availability['version'] != version:
+            availability = self._build_availability(sequence, version)
+            # NOTE(idegtiarov) index is kept up to date by the `on_sequence_item_created` and `on_sequence_item_changed`
+            # hooks which are called for the sequence's engine driver only, index of the fallback driver would be stale
+            if sequence.collection_order.engine.engine_driver is self:
+                cache.set(key, availability, settings.ENGINE_MOCK_AVAILABILITY_TIMEOUT)
+        return availability
 
     def select_activity(self, sequence):
         """
         Mock engine provides random choice for the activity from the collection on the Bridge.
 
+        Pre-assessment activities are selected first and post-assessment ones are selected last in the collection
+        order, generic activities are chosen randomly.
+
         :param sequence: sequence
         :return: selected activity source_launch_url
         """
-        s_activities_list = self._get_s_activities_list(sequence)
-
-        available_activities = sequence.collection_order.collection.activities.exclude(id__in=s_activities_list)
-        pre_assesment = available_activities.filter(atype='A')
-        generic = available_activities.filter(atype='G')
-        post_assessment = available_activities.filter(atype='Z')
-        chosen_activity_url = None
-        if pre_assesment:
-            chosen_activity_url = pre_assesment.first().source_launch_url
-        elif generic:
-            chosen_activity_url = random.choice(generic).source_launch_url
-        elif post_assessment:
-            chosen_activity_url = post_assessment.first().source_launch_url
+        availability = self._get_availability(sequence)
+        chosen_activity_id = None
+        if availability['A']:
+            chosen_activity_id = availability['A'][0]
+        elif availability['G']:
+            chosen_activity_id = random.choice(availability['G'])
+        elif availability['Z']:
+            chosen_activity_id = availability['Z'][0]
+        chosen_activity_url = availability['urls'].get(chosen_activity_id)
         log.debug("Chosen activity is: {}".format(chosen_activity_url))
         return {'source_launch_url': chosen_activity_url} if chosen_activity_url else {'complete': True}
 
+    def on_sequence_item_created(self, sequence_item):
+        """
+        Decrease remaining repetitions of the activity in the sequence's availability index.
+        """
+        key = self._availability_key(sequence_item.sequence_id)
+        availability = cache.get(key)
+        activity_id = sequence_item.activity_id
+        if availability is None or activity_id not in availability['remaining']:
+            return
+        availability['remaining'][activity_id] -= 1
+        if not availability['remaining'][activity_id]:
+            del availability['remaining'][activity_id]
+            availability[sequence_item.activity.atype].remove(activity_id)
+        cache.set(key, availability, settings.ENGINE_MOCK_AVAILABILITY_TIMEOUT)
+
+    def on_sequence_item_changed(self, sequence_item):
+        """
+        Drop the sequence's availability index, it is rebuilt on the next activity selection.
+        """
+        cache.delete(self._availability_key(sequence_item.sequence_id))
+
+    def forget_sequence(self, sequence_id):
+        """
+        Drop the sequence's availability index.
+        """
+        cache.delete(self._availability_key(sequence_id))
+
     def sync_collection_activities(self, collection):
         """Mock engine works with data stored on the Bridge and do not need to implement method."""
         log.debug("The Collection {} was successfully synchronized with the Mock Engine.".format(
@@ -68,3 +118,8 @@ class EngineMock(EngineInterface):
             sequence_item.activity.name, sequence_item.score
         ))
         return True
+
+    def submit_activity_answers(self, sequence_items):
+        """Mock engine works with data stored on the Bridge and do not need to implement method."""
+        log.debug("Students have submitted answers for the {} activities.".format(len(sequence_items)))
+        return [True] * len(sequence_items)
@@ -1,35 +1,57 @@
-import copy
 import logging
+import threading
 import urllib.parse
 
+from django.core.cache import cache
 import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 
+from module.engines import manifest, vpal_payload
 from module.engines.interface import EngineInterface
 
 log = logging.getLogger(__name__)
 
 
-ACTIVITY_PARAMS = (
-    'name',
-    'tags',
-    'type',
-    'difficulty',
-    'source_launch_url',
-    'repetition',
-)
+VALID_STATUSES = [200, 201]
 
-SEQUENCE_ITEM_PARAMS = [
-    'activity',
-    'score',
-    'is_problem',
-]
+RETRY_STATUSES = (502, 503, 504)
 
-TYPES = {
-    'A': 'pre-assessment',
-    'Z': 'post-assessment'
-}
+RESYNC_STATUS = 409
 
-VALID_STATUSES = [200, 201]
+MANIFEST_HASH_HEADER = 'X-Manifest-Hash'
+
+# Lifetime in seconds of the cached sequence cursor for the incremental recommend requests
+SEQUENCE_CURSOR_TIMEOUT = 24 * 60 * 60
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(host, pool_size, max_retries, retry_backoff):
+    """
+    Return keep-alive HTTP session for the engine host.
+
+    Sessions are shared by all driver instances with the same connection settings, so the pool of connections
+    survives across requests within the worker process. Non idempotent requests (POST, PATCH) are retried on the
+    connection errors only, they could be already handled by the engine if the response is failed or not read.
+    """
+    key = (host, pool_size, max_retries, retry_backoff)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            retry = Retry(
+                total=max_retries,
+                backoff_factor=retry_backoff,
+                status_forcelist=RETRY_STATUSES,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[key] = session
+    return session
 
 
 class EngineVPAL(EngineInterface):
@@ -47,6 +69,14 @@ class EngineVPAL(EngineInterface):
         ENGINE_SETTINGS = {
             'HOST': 'https://example.com',
             'TOKEN': 'very_secure_token',
+            # Optional HTTP connection settings
+            'POOL_SIZE': 10,
+            'CONNECT_TIMEOUT': 3.05,
+            'READ_TIMEOUT': 10,
+            'MAX_RETRIES': 2,
+            'RETRY_BACKOFF': 0.3,
+            # Send only changed sequence items in the recommend requests
+            'INCREMENTAL_RECOMMEND': False,
         }
     """
 
@@ -57,6 +87,15 @@ class EngineVPAL(EngineInterface):
         self.activity_url = urllib.parse.urljoin(self.base_url, "activity")
         token = kwargs.get('TOKEN')
         self.headers = {'Authorization': 'Token {}'.format(token)} if token else {}
+        self.timeout = (kwargs.get('CONNECT_TIMEOUT', 3.05), kwargs.get('READ_TIMEOUT', 10))
+        self.session = get_session(
+            self.host,
+            pool_size=kwargs.get('POOL_SIZE', 10),
+            max_retries=kwargs.get('MAX_RETRIES', 2),
+            retry_backoff=kwargs.get('RETRY_BACKOFF', 0.3),
+        )
+        self.incremental_recommend = kwargs.get('INCREMENTAL_RECOMMEND', False)
+        self.sync_diffs = kwargs.get('SYNC_DIFFS', False)
 
     @staticmethod
     def check_engine_response(request, action=None, obj=None, name=None, status=VALID_STATUSES):
@@ -70,57 +109,6 @@ class EngineVPAL(EngineInterface):
             log.error("[VPAL Engine] Error response: {}".format(request.text))
             return False
 
-    def fulfill_payload(self, payload=None, instance_to_parse=None, score=None):
-        if payload is None:
-            payload = {}
-        from module.models import Activity, SequenceItem
-        if isinstance(instance_to_parse, Activity):
-            params = ACTIVITY_PARAMS
-        elif isinstance(instance_to_parse, SequenceItem):
-            params = SEQUENCE_ITEM_PARAMS
-            if score:
-                params[-1] = 'learner'  # A hook, while VPAL is interesting in the grades on student's answers
-        else:
-            raise ValueError("Payload for the instance {} cannot be prepared".format(instance_to_parse))
-        for param in params:
-            if param == 'type':
-                atype = TYPES.get(getattr(instance_to_parse, 'atype'), 'generic')
-                payload[param] = atype
-            elif param == 'learner':  # instance_to_parse == SequenceItem
-                self.add_learner_to_payload(instance_to_parse.sequence, payload)
-            elif param == 'activity':
-                payload[param] = getattr(instance_to_parse, param).source_launch_url
-            else:
-                payload[param] = getattr(instance_to_parse, param)
-        return payload
-
-    @staticmethod
-    def add_learner_to_payload(sequence, payload, add_metadata=True):
-        """
-        Update payload with the 'learner' parameter.
-
-        :param sequence: Sequence instance
-        :param payload: payload to update
-        :param add_metadata: boolean flag to add sequence's metadata to the payload, default is True
-        :return: updated payload
-        """
-        metadata = copy.deepcopy(sequence.metadata)
-        tool_consumer_instance_guid = None
-        if metadata:
-            # NOTE(idegtiarov) Check metadata for the `tool_consumer_instance_guid` if it is found pop it to update
-            # `learner` param in the payload in accordance with the documentation
-            tool_consumer_instance_guid = metadata.pop('tool_consumer_instance_guid', None)
-            payload.update(metadata if add_metadata else {})  # payload is updated with the lti parameters
-        payload.update({
-            "learner": {
-                'user_id': sequence.lti_user.user_id,
-                'tool_consumer_instance_guid': (
-                    tool_consumer_instance_guid or sequence.lti_user.lti_lms_platform.consumer_name
-                ),
-            }
-        })
-        return payload
-
     def combine_activity_url(self, activity):
         return urllib.parse.urljoin('{}/'.format(self.activity_url), str(activity.id))
 
@@ -134,16 +122,72 @@ class EngineVPAL(EngineInterface):
         reco_url = urllib.parse.urljoin(
             "{}/".format(self.activity_url), "recommend"
         )
-        payload = {"collection": sequence.collection_order.collection.slug, "sequence": []}
-        self.add_learner_to_payload(sequence, payload)
+        if self.incremental_recommend:
+            payload = vpal_payload.recommend_payload(sequence, sequence_items=[])
+            return self.select_activity_incremental(sequence, reco_url, payload)
 
-        for sequence_item in sequence.items.all():
-            payload["sequence"].append(self.fulfill_payload(payload={}, instance_to_parse=sequence_item))
-        chosen_activity = requests.post(reco_url, headers=self.headers, json=payload)
+        payload = vpal_payload.recommend_payload(sequence)
+        chosen_activity = self.session.post(reco_url, headers=self.headers, json=payload, timeout=self.timeout)
         if self.check_engine_response(chosen_activity, action="chosen", obj='activity'):
             choose = chosen_activity.json()
             return choose
 
+    def _get_sequence_cursor_key(self, sequence_id):
+        return 'vpal:{}:sequence:{}:cursor'.format(self.host, sequence_id)
+
+    def forget_sequence(self, sequence_id):
+        """
+        Drop the sequence's cursor, the full sequence is sent with the next recommend request.
+        """
+        cache.delete(self._get_sequence_cursor_key(sequence_id))
+
+    def select_activity_incremental(self, sequence, reco_url, payload):
+        """
+        Request recommended activity sending only the sequence items changed since the last acknowledged request.
+
+        Engine acknowledges received sequence state with the `sequence_cursor` in the response. Next request contains
+        this cursor and new or updated items only. Full sequence is resent with the `resync` flag if there is no cursor
+        or engine asks for resync with the 409 status or `resync` flag in the response, engine's answer to the full
+        sequence is returned.
+
+        :param sequence: Sequence instance
+        :param reco_url: recommend url
+        :param payload: payload with the collection and learner parameters
+        :return: engine's response with the recommended activity
+        """
+        cursor_key = self._get_sequence_cursor_key(sequence.id)
+        cursor = cache.get(cursor_key)
+        items = {
+            item_id: {'activity': activity_url, 'score': score, 'is_problem': is_problem, 'position': position}
+            for item_id, activity_url, score, is_problem, position in sequence.items.values_list(
+                'id', 'activity__source_launch_url', 'score', 'is_problem', 'position'
+            )
+        }
+        choose = None
+        if cursor:
+            delta_payload = dict(payload, sequence_cursor=cursor['cursor'], sequence=[
+                item for item_id, item in items.items() if cursor['items'].get(item_id) != item
+            ])
+            choose = self._post_recommend(reco_url, delta_payload)
+        if not cursor or (choose and choose.get('resync')):
+            log.debug("[VPAL Engine] Full sequence {} is sent to the engine.".format(sequence.id))
+            choose = self._post_recommend(reco_url, dict(payload, resync=True, sequence=list(items.values())))
+            # NOTE(idegtiarov) resync flag of the answer to the full sequence doesn't ask for one more resync, engine
+            # which rejects the full sequence (409 status) fails the selection
+            choose = {key: value for key, value in (choose or {}).items() if key != 'resync'} or None
+        if choose and choose.get('sequence_cursor'):
+            cache.set(cursor_key, {'cursor': choose['sequence_cursor'], 'items': items}, SEQUENCE_CURSOR_TIMEOUT)
+        else:
+            cache.delete(cursor_key)
+        return choose
+
+    def _post_recommend(self, reco_url, payload):
+        chosen_activity = self.session.post(reco_url, headers=self.headers, json=payload, timeout=self.timeout)
+        if chosen_activity.status_code == RESYNC_STATUS:
+            return {'resync': True}
+        if self.check_engine_response(chosen_activity, action="chosen", obj='activity'):
+            return chosen_activity.json()
+
     def sync_collection_activities(self, collection):
         """
         VPAL engine synchronize Collection's Activities.
@@ -151,14 +195,41 @@ class EngineVPAL(EngineInterface):
         :param collection: Collection instance for synchronization
         """
         sync_url = urllib.parse.urljoin(self.base_url, 'collection/{}/activities'.format(collection.slug))
-        payload = []
-        for activity in collection.activities.all():
-            payload.append(self.fulfill_payload(payload={}, instance_to_parse=activity))
-        sync_collection = requests.post(sync_url, json=payload, headers=self.headers)
+        payload, hashes = manifest.collection_manifest(collection)
+        # NOTE(idegtiarov) engine stores manifest hash of the synchronized collection to check the base of the diffs
+        headers = dict(self.headers, **{MANIFEST_HASH_HEADER: manifest.manifest_hash(hashes)})
+        sync_collection = self.session.post(sync_url, json=payload, headers=headers, timeout=self.timeout)
         return self.check_engine_response(
             sync_collection, action='synchronized', obj='collection', name=collection.name
         )
 
+    def sync_collection_diff(self, collection, activities, removed, base_hash, new_hash):
+        """
+        VPAL engine updates only the changed Collection's Activities.
+
+        Diff is sent only if the engine supports the diffs, see `Engine.sync_diffs`. Engine rejects the diff with the
+        409 status if its manifest hash of the collection differs from the base one.
+
+        :param collection: Collection instance for synchronization
+        :param activities: payloads of the added and changed activities
+        :param removed: source_launch_urls of the removed activities
+        :param base_hash: manifest hash of the previously synchronized collection
+        :param new_hash: manifest hash of the collection after the diff is applied
+        """
+        if not self.sync_diffs:
+            return False
+        sync_url = urllib.parse.urljoin(self.base_url, 'collection/{}/activities'.format(collection.slug))
+        payload = {'base_hash': base_hash, 'hash': new_hash, 'activities': activities, 'removed': removed}
+        sync_diff = self.session.patch(sync_url, json=payload, headers=self.headers, timeout=self.timeout)
+        if sync_diff.status_code == RESYNC_STATUS:
+            log.info("[VPAL Engine] Collection {} diff is rejected, collection should be resynchronized.".format(
+                collection.name
+            ))
+            return False
+        return self.check_engine_response(
+            sync_diff, action='synchronized with the diff', obj='collection', name=collection.name
+        )
+
     def submit_activity_answer(self, sequence_item):
         """
         VPAL engine update student's answer for the activity in the sequence item.
@@ -166,9 +237,10 @@ class EngineVPAL(EngineInterface):
         :param sequence_item: SequenceItem instance
         """
         submit_url = urllib.parse.urljoin(self.base_url, 'score')
-        payload = self.fulfill_payload(instance_to_parse=sequence_item, score=True)
-        self.add_learner_to_payload(sequence_item.sequence, payload, add_metadata=False)
-        submit_activity_score = requests.post(submit_url, json=payload, headers=self.headers)
+        payload, = vpal_payload.score_payload([sequence_item])
+        submit_activity_score = self.session.post(
+            submit_url, json=payload, headers=self.headers, timeout=self.timeout
+        )
         return self.check_engine_response(
             submit_activity_score,
             action='graded',
@@ -176,6 +248,27 @@ class EngineVPAL(EngineInterface):
             name=sequence_item.activity.name,
         )
 
+    def submit_activity_answers(self, sequence_items):
+        """
+        VPAL engine update students' answers for the activities in the list of the sequence items in one request.
+
+        :param sequence_items: list of the SequenceItem instances
+        :return: list of boolean flags, equal for all items because engine accepts or rejects the whole batch
+        """
+        if not sequence_items:
+            return []
+        submit_url = urllib.parse.urljoin(self.base_url, 'score')
+        payload = vpal_payload.score_payload(sequence_items)
+        submit_activity_scores = self.session.post(
+            submit_url, json=payload, headers=self.headers, timeout=self.timeout
+        )
+        submitted = self.check_engine_response(
+            submit_activity_scores,
+            action='graded',
+            obj='batch of {} sequence items'.format(len(sequence_items)),
+        )
+        return [submitted] * len(sequence_items)
+
     def get_grade(self, sequence):
         """
         Get grade from the VPAL engine for particular collection.
@@ -186,7 +279,9 @@ class EngineVPAL(EngineInterface):
         url = urllib.parse.urljoin(self.base_url, 'collection/{collection_slug}/grade'.format(
             collection_slug=sequence.collection_order.collection.slug)
         )
-        response = requests.post(url, json=self.add_learner_to_payload(sequence, {}), headers=self.headers)
+        response = self.session.post(
+            url, json=vpal_payload.grade_payload(sequence), headers=self.headers, timeout=self.timeout
+        )
         if self.check_engine_response(response, action='grade', obj='sequence'):
             grade = response.json().get('grade')
             if 0 <= grade <= 1:
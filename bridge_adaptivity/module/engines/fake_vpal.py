@@ -0,0 +1,310 @@
+"""
+Fake VPAL engine server for the offline performance testing of the Bridge side of the VPAL integration.
+
+Server implements `api/v2` endpoints used by the `EngineVPAL` driver: `activity/recommend`, `score`,
+`collection/<slug>/activities` (full collection and diff) and `collection/<slug>/grade`. Latency, error rate and
+throughput ceiling of the server are configurable, so the connection pooling, batching and retries could be benchmarked
+without live VPAL.
+
+Usage example::
+
+    server = FakeVPALServer(latency=0.05, error_rate=0.01, max_rps=200).start()
+    engine = EngineVPAL(HOST=server.url)
+    ...
+    server.stop()
+
+Server could be run as a standalone process with the `run_fake_vpal` management command.
+"""
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import logging
+import random
+import re
+import socketserver
+import threading
+import time
+import uuid
+
+log = logging.getLogger(__name__)
+
+API_URL = '/api/v2/'
+
+# Status of the response to the request rejected because of the throughput ceiling
+THROTTLED_STATUS = 429
+
+
+class FakeVPALState(object):
+    """
+    Thread safe storage of the synchronized collections, learners' scores and sequences.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.activities = {}
+        self.manifest_hashes = {}
+        self.scores = defaultdict(dict)
+        self.sequences = {}
+        self.requests = Counter()
+
+    @staticmethod
+    def learner_key(payload):
+        learner = payload.get('learner') or {}
+        return learner.get('user_id'), learner.get('tool_consumer_instance_guid')
+
+    def sync(self, collection_slug, activities, manifest_hash=None):
+        with self.lock:
+            self.activities[collection_slug] = activities
+            self.manifest_hashes[collection_slug] = manifest_hash
+
+    def apply_diff(self, collection_slug, diff):
+        """
+        Update changed activities of the collection, new activities are added to the end of the collection.
+
+        :return: boolean flag, whether the diff is applied, diff is rejected if the collection's hash isn't the base one
+        """
+        with self.lock:
+            activities = self.activities.get(collection_slug)
+            base_hash = diff.get('base_hash')
+            if activities is None or not base_hash or self.manifest_hashes.get(collection_slug) != base_hash:
+                return False
+            changed = {activity['source_launch_url']: activity for activity in diff.get('activities', [])}
+            removed = set(diff.get('removed', []))
+            activities = [
+                changed.pop(activity['source_launch_url'], activity) for activity in activities
+                if activity['source_launch_url'] not in removed
+            ]
+            self.activities[collection_slug] = activities + list(changed.values())
+            self.manifest_hashes[collection_slug] = diff.get('hash')
+            return True
+
+    def add_scores(self, scores):
+        with self.lock:
+            for score in scores:
+                self.scores[self.learner_key(score)][score.get('activity')] = score.get('score')
+
+    def update_sequence(self, payload):
+        """
+        Return full sequence of the recommend request, sequence of the incremental request is merged by the cursor.
+
+        :return: tuple of the sequence items list and the new cursor or (None, None) if cursor is unknown
+        """
+        with self.lock:
+            if payload.get('resync') or 'sequence_cursor' not in payload:
+                items = {}
+            else:
+                items = self.sequences.pop(payload['sequence_cursor'], None)
+                if items is None:
+                    return None, None
+            for item in payload.get('sequence', []):
+                items[item.get('position', len(items) + 1)] = item
+            cursor = uuid.uuid4().hex
+            self.sequences[cursor] = items
+            return list(items.values()), cursor
+
+    def recommend(self, collection_slug, sequence):
+        """
+        Return the first activity of the collection which is not repeated in the sequence the allowed number of times.
+        """
+        attempts = Counter(item.get('activity') for item in sequence)
+        with self.lock:
+            activities = self.activities.get(collection_slug)
+        if activities is None:
+            return None
+        for activity in activities:
+            if attempts[activity['source_launch_url']] < activity.get('repetition', 1):
+                return {'source_launch_url': activity['source_launch_url'], 'complete': False}
+        return {'complete': True}
+
+    def grade(self, collection_slug, payload):
+        with self.lock:
+            activities = self.activities.get(collection_slug) or []
+            scores = self.scores.get(self.learner_key(payload), {})
+            earned = [scores[activity['source_launch_url']] or 0 for activity in activities
+                      if activity['source_launch_url'] in scores]
+        return round(sum(earned) / len(activities), 4) if activities else 0
+
+
+class FakeVPALRequestHandler(BaseHTTPRequestHandler):
+    routes = (
+        (re.compile(r'^activity/recommend/?$'), 'recommend'),
+        (re.compile(r'^score/?$'), 'score'),
+        (re.compile(r'^collection/(?P<slug>[\w-]+)/activities/?$'), 'activities'),
+        (re.compile(r'^collection/(?P<slug>[\w-]+)/grade/?$'), 'grade'),
+    )
+
+    def log_message(self, format, *args):
+        log.debug("[Fake VPAL] " + format, *args)
+
+    def send_json(self, status, data=None):
+        body = json.dumps(data if data is not None else {}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == API_URL + 'stats':
+            return self.send_json(200, self.server.fake_vpal.stats())
+        self.send_json(404)
+
+    def do_POST(self):
+        self.dispatch('handle')
+
+    def do_PATCH(self):
+        self.dispatch('patch')
+
+    def dispatch(self, prefix):
+        fake_vpal = self.server.fake_vpal
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        if not self.path.startswith(API_URL):
+            return self.send_json(404)
+        for route, name in self.routes:
+            match = route.match(self.path[len(API_URL):])
+            if match:
+                break
+        else:
+            return self.send_json(404)
+        handler = getattr(self, '{}_{}'.format(prefix, name), None)
+        if handler is None:
+            return self.send_json(405)
+        status = fake_vpal.check_request(name, self.headers.get('Authorization'))
+        if status:
+            return self.send_json(status)
+        self.send_json(*handler(payload, **match.groupdict()))
+
+    def handle_recommend(self, payload):
+        state = self.server.fake_vpal.state
+        sequence = payload.get('sequence', [])
+        cursor = None
+        if payload.get('resync') or 'sequence_cursor' in payload:
+            sequence, cursor = state.update_sequence(payload)
+            if sequence is None:
+                return 409, {'resync': True}
+        recommendation = state.recommend(payload.get('collection'), sequence)
+        if recommendation is None:
+            return 404, {'detail': 'Collection is not found.'}
+        if cursor:
+            recommendation['sequence_cursor'] = cursor
+        return 200, recommendation
+
+    def handle_score(self, payload):
+        self.server.fake_vpal.state.add_scores(payload if isinstance(payload, list) else [payload])
+        return 201, {}
+
+    def handle_activities(self, payload, slug):
+        self.server.fake_vpal.state.sync(slug, payload, self.headers.get('X-Manifest-Hash'))
+        return 201, {}
+
+    def patch_activities(self, payload, slug):
+        if not self.server.fake_vpal.state.apply_diff(slug, payload):
+            return 409, {'resync': True}
+        return 200, {}
+
+    def handle_grade(self, payload, slug):
+        return 200, {'grade': self.server.fake_vpal.state.grade(slug, payload)}
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeVPALServer(object):
+    """
+    Fake VPAL engine server.
+
+    :param host: interface to listen on, default is localhost
+    :param port: port to listen on, default is 0 - any free port
+    :param latency: delay in seconds added to every response
+    :param jitter: max random delay in seconds added to the latency
+    :param error_rate: share of the requests answered with the error status, float in range 0.0 - 1.0
+    :param error_status: status of the failed responses, default is 503 which is retried by the `EngineVPAL` driver
+    :param max_rps: max number of the requests per second, exceeding requests are answered with the 429 status
+    :param token: token expected in the Authorization header, it is not checked if None
+    :param seed: seed of the random errors and jitter
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, jitter=0, error_rate=0, error_status=503, max_rps=None,
+                 token=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_rps = max_rps
+        self.token = token
+        self.random = random.Random(seed)
+        self.state = FakeVPALState()
+        self._throttle_lock = threading.Lock()
+        self._window = (0, 0)
+        self.httpd = _ThreadingHTTPServer((host, port), FakeVPALRequestHandler)
+        self.httpd.fake_vpal = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+    def _throttled(self):
+        """
+        Count request in the current one second window and check the throughput ceiling is reached.
+        """
+        if not self.max_rps:
+            return False
+        with self._throttle_lock:
+            second, count = self._window
+            now = int(time.time())
+            if now != second:
+                second, count = now, 0
+            self._window = second, count + 1
+            return count >= self.max_rps
+
+    def check_request(self, endpoint, authorization):
+        """
+        Apply latency, authorization, throughput ceiling and random errors to the request.
+
+        :return: error status of the response or None if the request should be handled
+        """
+        with self.state.lock:
+            self.state.requests[endpoint] += 1
+        if self._throttled():
+            self._count('throttled')
+            return THROTTLED_STATUS
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if self.token and authorization != 'Token {}'.format(self.token):
+            self._count('unauthorized')
+            return 401
+        if self.error_rate and self.random.random() < self.error_rate:
+            self._count('errors')
+            return self.error_status
+
+    def _count(self, name):
+        with self.state.lock:
+            self.state.requests[name] += 1
+
+    def stats(self):
+        with self.state.lock:
+            return dict(self.state.requests)
+
+    def start(self):
+        """
+        Start serving in the background daemon thread.
+        """
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-vpal', daemon=True)
+        self._thread.start()
+        log.info("[Fake VPAL] Server is started on {}".format(self.url))
+        return self
+
+    def serve_forever(self):
+        log.info("[Fake VPAL] Server is started on {}".format(self.url))
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
@@ -1,7 +1,22 @@
 from abc import ABCMeta, abstractmethod
 
+from common.metrics import instrument_engine_method
+
+# Driver methods which duration and errors are recorded to the metrics, see `common.metrics`
+INSTRUMENTED_METHODS = (
+    'get_grade', 'select_activity', 'submit_activity_answer', 'submit_activity_answers', 'sync_collection_activities',
+    'sync_collection_diff',
+)
+
 
 class EngineInterface(object, metaclass=ABCMeta):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        engine = cls.__module__.rsplit('.', 1)[-1]
+        for name in INSTRUMENTED_METHODS:
+            if name in cls.__dict__:
+                setattr(cls, name, instrument_engine_method(cls.__dict__[name], engine))
+
     @abstractmethod
     def select_activity(self, sequence):
         """
@@ -29,3 +44,64 @@ class EngineInterface(object, metaclass=ABCMeta):
         :param sequence_item: SequenceItem instance
         """
         raise NotImplementedError("Adaptive Engine driver must implement this method.")
+
+    def submit_activity_answers(self, sequence_items):
+        """
+        Send students' answers to the adaptive engine in one batch.
+
+        Drivers which engine supports batch submission should override this method, by default answers are sent one
+        by one. Answers of the sequence which follow its rejected answer are not sent to keep their order.
+
+        :param sequence_items: list of the SequenceItem instances
+        :return: list of boolean flags, whether engine accepted the answer of the correspondent SequenceItem
+        """
+        results = []
+        failed_sequences = set()
+        for sequence_item in sequence_items:
+            submitted = (
+                sequence_item.sequence_id not in failed_sequences and self.submit_activity_answer(sequence_item)
+            )
+            if not submitted:
+                failed_sequences.add(sequence_item.sequence_id)
+            results.append(submitted)
+        return results
+
+    def sync_collection_diff(self, collection, activities, removed, base_hash, new_hash):
+        """
+        Send only the changed Collection's Activities to the engine.
+
+        Drivers which engine supports incremental synchronization should override this method, by default the diff is
+        rejected and the whole collection is synchronized with `sync_collection_activities`.
+
+        :param collection: Collection instance to sync with the engine
+        :param activities: list of the payloads of the added and changed activities, see `vpal_payload.sync_payload`
+        :param removed: list of the removed activities' source_launch_urls
+        :param base_hash: manifest hash of the collection synchronized with the engine before
+        :param new_hash: manifest hash of the collection after the diff is applied
+        :return: boolean flag, whether engine applied the diff
+        """
+        return False
+
+    def on_sequence_item_created(self, sequence_item):
+        """
+        Handle creation of the SequenceItem, drivers could update their local state of the sequence.
+
+        :param sequence_item: SequenceItem instance
+        """
+
+    def on_sequence_item_changed(self, sequence_item):
+        """
+        Handle change of the SequenceItem's activity or its deletion, drivers could drop their state of the sequence.
+
+        :param sequence_item: SequenceItem instance
+        """
+
+    def forget_sequence(self, sequence_id):
+        """
+        Drop the driver's local state of the sequence, e.g. when the sequence is rolled back.
+
+        Drivers which keep the sequence's state in the cache should override this method, otherwise the state would be
+        inherited by the sequence which reuses the id.
+
+        :param sequence_id: id of the Sequence
+        """
@@ -0,0 +1,39 @@
+"""
+Content hashes of the collection's activities synchronized with the engines.
+
+Every activity is hashed by its sync payload, so the activity is considered changed when any field sent to the engine
+is changed. Manifest hash is the hash of all the activities' hashes and identifies the whole synchronized collection.
+"""
+import hashlib
+import json
+
+from module.engines import vpal_payload
+
+
+def _sha1(data):
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def activity_hash(activity):
+    """
+    Return content hash of the activity's sync payload.
+    """
+    return _sha1(activity)
+
+
+def manifest_hash(hashes):
+    """
+    Return hash of the manifest, manifest is a dict of the activities' source_launch_urls to their content hashes.
+    """
+    return _sha1(sorted(hashes.items()))
+
+
+def collection_manifest(collection):
+    """
+    Prepare sync payloads of the collection's activities and their manifest, activities are fetched in one query.
+
+    :param collection: Collection instance
+    :return: tuple of the activities' payloads list and the manifest dict
+    """
+    activities = vpal_payload.sync_payload(collection)
+    return activities, {activity['source_launch_url']: activity_hash(activity) for activity in activities}
@@ -0,0 +1,50 @@
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class EngineDriverRegistry(object):
+    """
+    Process-wide registry of the engine driver instances.
+
+    Drivers are keyed by Engine id and the hash of its configuration, so they are shared by all Engine instances
+    fetched from the DB within the process (web requests, celery tasks and channels worker) and are rebuilt when
+    Engine's configuration is changed.
+    """
+
+    def __init__(self):
+        self._drivers = {}
+        self._lock = threading.Lock()
+
+    def get(self, engine):
+        """
+        Return driver for the engine, driver is built if it is not registered yet or configuration is changed.
+
+        :param engine: Engine instance
+        :return: engine driver instance
+        """
+        if engine.id is None:
+            return engine.build_driver()
+        config_hash = engine.config_hash
+        registered = self._drivers.get(engine.id)
+        if registered and registered[0] == config_hash:
+            return registered[1]
+        with self._lock:
+            registered = self._drivers.get(engine.id)
+            if not registered or registered[0] != config_hash:
+                log.debug("Engine driver for the {} is built.".format(engine))
+                registered = (config_hash, engine.build_driver())
+                self._drivers[engine.id] = registered
+        return registered[1]
+
+    def invalidate(self, engine_id):
+        with self._lock:
+            self._drivers.pop(engine_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._drivers.clear()
+
+
+engine_drivers = EngineDriverRegistry()
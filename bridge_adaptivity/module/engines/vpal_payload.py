@@ -0,0 +1,121 @@
+"""
+Payload builders for the VPAL engine requests.
+
+Builders expect related objects to be fetched beforehand, so the whole payload is prepared in a constant number of
+queries independent of the number of activities or sequence items in it.
+"""
+
+ACTIVITY_FIELDS = (
+    'name',
+    'tags',
+    'atype',
+    'difficulty',
+    'source_launch_url',
+    'repetition',
+)
+
+TYPES = {
+    'A': 'pre-assessment',
+    'Z': 'post-assessment'
+}
+
+# Relations should be selected with the sequence items passed to the builders
+SEQUENCE_ITEM_RELATED = ('activity', 'sequence__lti_user__lti_lms_platform')
+
+SEQUENCE_RELATED = ('collection_order__collection', 'lti_user__lti_lms_platform')
+
+
+def activity_type(atype):
+    return TYPES.get(atype, 'generic')
+
+
+def learner_payload(sequence, add_metadata=True):
+    """
+    Prepare the 'learner' parameter with the sequence's lti parameters.
+
+    :param sequence: Sequence instance with the selected `lti_user__lti_lms_platform`
+    :param add_metadata: boolean flag to add sequence's metadata to the payload, default is True
+    :return: dict with the lti parameters and the 'learner' parameter
+    """
+    metadata = sequence.metadata or {}
+    # NOTE(idegtiarov) `tool_consumer_instance_guid` from the metadata is moved into the `learner` param in accordance
+    # with the documentation
+    tool_consumer_instance_guid = metadata.get('tool_consumer_instance_guid')
+    payload = {
+        key: value for key, value in metadata.items() if key != 'tool_consumer_instance_guid'
+    } if add_metadata else {}
+    payload['learner'] = {
+        'user_id': sequence.lti_user.user_id,
+        'tool_consumer_instance_guid': (
+            tool_consumer_instance_guid or sequence.lti_user.lti_lms_platform.consumer_name
+        ),
+    }
+    return payload
+
+
+def sequence_item_payload(sequence_item):
+    return {
+        'activity': sequence_item.activity.source_launch_url,
+        'score': sequence_item.score,
+        'is_problem': sequence_item.is_problem,
+    }
+
+
+def recommend_payload(sequence, sequence_items=None):
+    """
+    Prepare payload for the recommend request.
+
+    :param sequence: Sequence instance, preferably fetched with the `SEQUENCE_RELATED` relations
+    :param sequence_items: sequence items with the selected activities, default is all items of the sequence
+    :return: payload dict
+    """
+    if sequence_items is None:
+        sequence_items = sequence.items.select_related('activity')
+    payload = learner_payload(sequence)
+    payload['collection'] = sequence.collection_order.collection.slug
+    payload['sequence'] = [sequence_item_payload(sequence_item) for sequence_item in sequence_items]
+    return payload
+
+
+def sync_payload(collection):
+    """
+    Prepare payload with the collection's activities, activities are fetched in one query.
+
+    :param collection: Collection instance
+    :return: list of the activities' payloads
+    """
+    payload = []
+    for activity in collection.activities.values(*ACTIVITY_FIELDS):
+        activity['type'] = activity_type(activity.pop('atype'))
+        payload.append(activity)
+    return payload
+
+
+def score_payload(sequence_items):
+    """
+    Prepare payload with the scores of the sequence items.
+
+    :param sequence_items: sequence items fetched with the `SEQUENCE_ITEM_RELATED` relations
+    :return: list of the scores' payloads
+    """
+    learners = {}
+    payload = []
+    for sequence_item in sequence_items:
+        # NOTE(idegtiarov) Sequence items of the same sequence share the learner, it is prepared once per sequence.
+        learner = learners.get(sequence_item.sequence_id)
+        if learner is None:
+            learner = learners[sequence_item.sequence_id] = learner_payload(sequence_item.sequence)
+        item_payload = dict(learner)
+        item_payload.update({'activity': sequence_item.activity.source_launch_url, 'score': sequence_item.score})
+        payload.append(item_payload)
+    return payload
+
+
+def grade_payload(sequence):
+    """
+    Prepare payload for the grade request.
+
+    :param sequence: Sequence instance with the selected `lti_user__lti_lms_platform`
+    :return: payload dict
+    """
+    return learner_payload(sequence)
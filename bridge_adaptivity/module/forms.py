@@ -156,6 +156,7 @@ class CollectionOrderForm(ModelForm):
             'ui_option',
             'ui_next',
             'congratulation_message',
+            'speculative_recommendation',
         )
         labels = {
             'ui_option': _('UI Option'),
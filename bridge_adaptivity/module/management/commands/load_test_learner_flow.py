@@ -0,0 +1,213 @@
+from collections import defaultdict
+import random
+import time
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from lti import OutcomeRequest, ToolConsumer
+from oauthlib import oauth1
+
+from bridge_lti.models import BridgeUser, LtiLmsPlatform
+from module.models import Activity, Collection, CollectionOrder, Engine, GradingPolicy, ModuleGroup, SequenceItem
+from module.policies.policy_points_earned import PointsEarnedGradingPolicy
+
+STEPS = ('launch', 'item', 'callback', 'next')
+
+LOAD_TEST_NAME = 'load_test'
+
+
+def percentile(values, percent):
+    """
+    Return percentile of the values by the nearest-rank method.
+
+    :param values: sorted list of the values
+    :param percent: percentile in range 0-100
+    """
+    if not values:
+        return 0
+    return values[min(len(values) - 1, max(0, int(round(percent / 100 * len(values))) - 1))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile the learner flow for the synthetic learners: signed LTI launch, sequence item page, signed grade "
+        "callback and next sequence item. Learners are run one by one in the single rolled back transaction, so the "
+        "on-commit work (engine sync and submissions, grades passback) isn't measured, use tests/load/locustfile.py "
+        "to load the deployed instance with the concurrent learners."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--collection-order', help='Slug of the collection order to launch, default is the temporary one',
+        )
+        parser.add_argument(
+            '--consumer-key', help='Consumer key of the LMS platform to sign requests, default is the temporary one',
+        )
+        parser.add_argument('--learners', type=int, default=20, help='Number of the synthetic learners')
+        parser.add_argument('--answers', type=int, default=5, help='Number of the answers submitted by every learner')
+        parser.add_argument(
+            '--activities', type=int, default=20, help='Number of the activities in the temporary collection',
+        )
+        parser.add_argument('--seed', type=int, default=None, help='Seed of the random scores')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.stats = defaultdict(list)
+        self.scheme = 'https' if getattr(settings, 'LTI_SSL', True) else 'http'
+        started = time.perf_counter()
+        # NOTE(idegtiarov) the run is rolled back, so on-commit hooks (engine sync, grades passback) are not fired and
+        # the profiling is safe to run against a shared database, but the locks are held until the end of the run
+        with transaction.atomic():
+            collection_order = self.get_collection_order(options)
+            lti_lms_platform = self.get_lti_lms_platform(options['consumer_key'])
+            for number in range(options['learners']):
+                self.run_learner(collection_order, lti_lms_platform, 'load_test_learner_{}'.format(number), options)
+            transaction.set_rollback(True)
+        duration = time.perf_counter() - started
+        # NOTE(idegtiarov) the temporary platform could be cached by the launches, cache is dropped after the rollback
+        lti_lms_platform.invalidate_cache()
+        self.report(duration)
+
+    def get_collection_order(self, options):
+        if options['collection_order']:
+            try:
+                return CollectionOrder.objects.get(slug=options['collection_order'])
+            except CollectionOrder.DoesNotExist:
+                raise CommandError('Collection order {} is not found.'.format(options['collection_order']))
+        owner, _ = BridgeUser.objects.get_or_create(username=LOAD_TEST_NAME)
+        # NOTE(idegtiarov) `bulk_create` skips `Collection.save`, the engines sync of the temporary collection is not
+        # scheduled
+        collection, = Collection.objects.bulk_create([Collection(name=LOAD_TEST_NAME, owner=owner)])
+        Activity.objects.bulk_create([
+            Activity(
+                name='{} activity {}'.format(LOAD_TEST_NAME, number),
+                collection=collection,
+                source_launch_url='http://{}/{}/activity/{}'.format(settings.BRIDGE_HOST, LOAD_TEST_NAME, number),
+                stype='problem',
+                order=number,
+            ) for number in range(options['activities'])
+        ])
+        return CollectionOrder.objects.create(
+            group=ModuleGroup.objects.create(name=LOAD_TEST_NAME, owner=owner),
+            collection=collection,
+            engine=Engine.objects.create(engine='engine_mock', engine_name=LOAD_TEST_NAME),
+            grading_policy=GradingPolicy.objects.create(
+                name='points_earned', public_name=LOAD_TEST_NAME, params=PointsEarnedGradingPolicy.require['params'],
+            ),
+        )
+
+    def get_lti_lms_platform(self, consumer_key):
+        if consumer_key:
+            try:
+                return LtiLmsPlatform.objects.get(consumer_key=consumer_key)
+            except LtiLmsPlatform.DoesNotExist:
+                raise CommandError('LMS platform with the consumer key {} is not found.'.format(consumer_key))
+        return LtiLmsPlatform.objects.create(consumer_name=LOAD_TEST_NAME)
+
+    def url(self, path):
+        return '{}://{}{}'.format(self.scheme, settings.BRIDGE_HOST, path)
+
+    def request(self, step, method, path, **kwargs):
+        """
+        Send request with the test client and collect its duration and the number of the executed queries.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = method(path, HTTP_HOST=settings.BRIDGE_HOST, secure=self.scheme == 'https', **kwargs)
+            duration = time.perf_counter() - started
+        self.stats[step].append((duration, len(queries)))
+        return response
+
+    def launch(self, client, collection_order, lti_lms_platform, user_id):
+        path = reverse(
+            'lti:launch', kwargs={'collection_order_slug': collection_order.slug, 'unique_marker': LOAD_TEST_NAME}
+        )
+        consumer = ToolConsumer(
+            consumer_key=lti_lms_platform.consumer_key,
+            consumer_secret=lti_lms_platform.consumer_secret,
+            launch_url=self.url(path),
+            params={
+                'lti_message_type': 'basic-lti-launch-request',
+                'lti_version': 'LTI-1p0',
+                'resource_link_id': collection_order.slug,
+                'user_id': user_id,
+                'roles': 'Learner',
+                'context_id': LOAD_TEST_NAME,
+                'lis_outcome_service_url': self.url('/{}/outcomes/'.format(LOAD_TEST_NAME)),
+                'lis_result_sourcedid': '{}:{}'.format(collection_order.slug, user_id),
+            },
+        )
+        return self.request('launch', client.post, path, data=consumer.generate_launch_data())
+
+    def submit_answer(self, client, lti_lms_platform, sequence_item_id, user_id):
+        path = reverse('module:sequence-item-grade')
+        activity_id = SequenceItem.objects.filter(id=sequence_item_id).values_list('activity_id', flat=True).first()
+        xml = OutcomeRequest({
+            'operation': 'replaceResult',
+            'score': self.random.choice([0, 1]),
+            'message_identifier': '{}_{}'.format(LOAD_TEST_NAME, sequence_item_id),
+            'lis_result_sourcedid': '{}:{}:{}:'.format(sequence_item_id, user_id, activity_id),
+        }).generate_request_xml()
+        _, headers, _ = oauth1.Client(
+            lti_lms_platform.consumer_key,
+            client_secret=lti_lms_platform.consumer_secret,
+            signature_type=oauth1.SIGNATURE_TYPE_AUTH_HEADER,
+        ).sign(self.url(path), 'POST', body=xml, headers={'Content-Type': 'application/xml'})
+        return self.request(
+            'callback', client.post, path, data=xml, content_type='application/xml',
+            HTTP_AUTHORIZATION=headers['Authorization'],
+        )
+
+    @staticmethod
+    def get_sequence_item_id(response):
+        """
+        Return id of the sequence item the response is redirected to or None for the other responses.
+        """
+        if response.status_code != 302:
+            return
+        match = resolve(urlparse(response.url).path)
+        if match.url_name == 'sequence-item':
+            return int(match.kwargs['pk'])
+
+    def run_learner(self, collection_order, lti_lms_platform, user_id, options):
+        client = Client()
+        response = self.launch(client, collection_order, lti_lms_platform, user_id)
+        sequence_item_id = self.get_sequence_item_id(response)
+        for _ in range(options['answers']):
+            if sequence_item_id is None:
+                break
+            self.request('item', client.get, reverse('module:sequence-item', kwargs={'pk': sequence_item_id}))
+            self.submit_answer(client, lti_lms_platform, sequence_item_id, user_id)
+            response = self.request(
+                'next', client.get, reverse('module:sequence-item-next', kwargs={'pk': sequence_item_id})
+            )
+            sequence_item_id = self.get_sequence_item_id(response)
+
+    def report(self, duration):
+        requests_count = sum(len(self.stats[step]) for step in STEPS)
+        self.stdout.write('{:<10}{:>10}{:>10}{:>10}{:>10}{:>14}{:>14}'.format(
+            'step', 'requests', 'p50 ms', 'p95 ms', 'p99 ms', 'queries avg', 'queries max'
+        ))
+        for step in STEPS:
+            stats = self.stats[step]
+            if not stats:
+                continue
+            durations = sorted(duration * 1000 for duration, _ in stats)
+            queries = [queries for _, queries in stats]
+            self.stdout.write('{:<10}{:>10}{:>10.1f}{:>10.1f}{:>10.1f}{:>14.1f}{:>14}'.format(
+                step,
+                len(stats),
+                percentile(durations, 50),
+                percentile(durations, 95),
+                percentile(durations, 99),
+                sum(queries) / len(queries),
+                max(queries),
+            ))
+        self.stdout.write(self.style.SUCCESS('{} requests are sent in {:.1f} s, {:.1f} requests per second.'.format(
+            requests_count, duration, requests_count / duration if duration else 0
+        )))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from module.models import Sequence
+
+
+class Command(BaseCommand):
+    help = "Recalculate the sequences' score aggregates from their sequence items."
+
+    def add_arguments(self, parser):
+        parser.add_argument('sequence_ids', nargs='*', type=int, help='Ids of the sequences to rebuild, default is all')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of the sequences updated at once')
+
+    def handle(self, *args, **options):
+        sequences = Sequence.objects.order_by('id')
+        if options['sequence_ids']:
+            sequences = sequences.filter(id__in=options['sequence_ids'])
+        ids = list(sequences.values_list('id', flat=True))
+        batch_size = options['batch_size']
+        updated = 0
+        for start in range(0, len(ids), batch_size):
+            updated += Sequence.rebuild_aggregates(Sequence.objects.filter(id__in=ids[start:start + batch_size]))
+        self.stdout.write(self.style.SUCCESS('Score aggregates of {} sequences are rebuilt.'.format(updated)))
@@ -0,0 +1,240 @@
+from collections import defaultdict
+import functools
+from multiprocessing import Pool
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import F, Min
+from django.utils.dateparse import parse_datetime
+
+from module.engines.registry import engine_drivers
+from module.management.commands.load_test_learner_flow import percentile
+from module.models import CollectionOrder, Engine, ENGINES, Sequence, SequenceItem
+
+OPERATIONS = ('select', 'submit')
+
+REPLAY_NAME = 'replay'
+
+
+def replay_chunk(sequence_ids, engine_id=None, engine_module=None, host=None):
+    """
+    Replay the historical sequences against the engine, all the data created by the replay is rolled back.
+
+    Every historical sequence is replayed with the shadow sequence: engine is asked to select the activity before every
+    historical sequence item and then the item with the historical score is added to the shadow sequence and is
+    submitted to the engine. Sequences are replayed in the order of the given ids. Engine's cached state of the shadow
+    sequences is dropped, so it isn't inherited by the sequences which reuse the rolled back ids.
+
+    :param sequence_ids: ids of the historical sequences
+    :param engine_id: id of the Engine to replay against
+    :param engine_module: name of the engine module to replay against if engine id is not provided
+    :param host: host which replaces the host of the configured Engine, e.g. the fake VPAL server's url
+    :return: dict with the durations of the engine calls and the outcome counters
+    """
+    stats = {'durations': defaultdict(list), 'outcomes': defaultdict(int)}
+    items = defaultdict(list)
+    for item in SequenceItem.objects.filter(sequence_id__in=sequence_ids).order_by('sequence_id', 'position').values(
+        'sequence_id', 'activity_id', 'position', 'score', 'is_problem'
+    ):
+        items[item['sequence_id']].append(item)
+    sequences = Sequence.objects.filter(id__in=sequence_ids).values('id', 'lti_user_id', 'collection_order_id')
+    order = {sequence_id: position for position, sequence_id in enumerate(sequence_ids)}
+    sequences = sorted(sequences, key=lambda sequence: order[sequence['id']])
+    collection_orders = {}
+    activities = {}
+    shadow_ids = []
+    with transaction.atomic():
+        if engine_id is None:
+            # NOTE(idegtiarov) engine name is unique, workers' temporary engines are named by the process
+            engine = Engine.objects.create(
+                engine=engine_module, engine_name='{} {} {}'.format(REPLAY_NAME, engine_module, os.getpid())
+            )
+        else:
+            engine = Engine.objects.get(id=engine_id)
+        if host:
+            # NOTE(idegtiarov) driver of the replaced host isn't registered, so it isn't shared with the real engine
+            engine.host = host
+            driver = engine.build_driver()
+        else:
+            driver = engine.engine_driver
+        try:
+            for sequence in sequences:
+                collection_order_id = sequence['collection_order_id']
+                if collection_order_id not in collection_orders:
+                    collection_order = CollectionOrder.objects.select_related('collection').get(id=collection_order_id)
+                    # NOTE(idegtiarov) engine is replaced in memory only, shadow sequences are selected by the replayed
+                    # one
+                    collection_order.engine = engine
+                    collection_orders[collection_order_id] = collection_order
+                    activities.update(
+                        (activity.id, activity) for activity in collection_order.collection.activities.all()
+                    )
+                shadow = Sequence.objects.create(
+                    lti_user_id=sequence['lti_user_id'],
+                    collection_order_id=collection_order_id,
+                    suffix='{}{}'.format(REPLAY_NAME[0], sequence['id']),
+                )
+                shadow_ids.append(shadow.id)
+                shadow.collection_order = collection_orders[collection_order_id]
+                replay_sequence(driver, shadow, items[sequence['id']], activities, stats)
+        finally:
+            for shadow_id in shadow_ids:
+                driver.forget_sequence(shadow_id)
+        transaction.set_rollback(True)
+    if engine_id is None:
+        engine_drivers.invalidate(engine.id)
+    return stats
+
+
+def _call(driver_method, argument, operation, stats):
+    started = time.perf_counter()
+    try:
+        return driver_method(argument)
+    except Exception:
+        stats['outcomes']['errors'] += 1
+    finally:
+        stats['durations'][operation].append(time.perf_counter() - started)
+
+
+def replay_sequence(driver, shadow, items, activities, stats):
+    outcomes = stats['outcomes']
+    outcomes['sequences'] += 1
+    for item in items:
+        activity = activities.get(item['activity_id'])
+        if activity is None:
+            outcomes['skipped'] += 1
+            continue
+        engine_choose = _call(driver.select_activity, shadow, 'select', stats) or {}
+        outcomes['steps'] += 1
+        if engine_choose.get('complete'):
+            outcomes['completed_early'] += 1
+        elif engine_choose.get('source_launch_url') == activity.source_launch_url:
+            outcomes['matched'] += 1
+        # NOTE(idegtiarov) `bulk_create` skips `SequenceItem.save`, so the replayed item isn't queued to the sequence's
+        # engine and the engine under replay is notified directly
+        sequence_item, = SequenceItem.objects.bulk_create([SequenceItem(
+            sequence=shadow,
+            activity=activity,
+            position=item['position'],
+            score=item['score'],
+            is_problem=item['is_problem'],
+        )])
+        driver.on_sequence_item_created(sequence_item)
+        if item['score'] is not None:
+            _call(driver.submit_activity_answer, sequence_item, 'submit', stats)
+            outcomes['answers'] += 1
+            outcomes['points'] += item['score']
+    final_choose = _call(driver.select_activity, shadow, 'select', stats) or {}
+    if final_choose.get('complete'):
+        outcomes['completed'] += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the historical sequences in the chronological order against the engine and report latency of the "
+        "engine calls, throughput and the outcome metrics. All the data created by the replay is rolled back, "
+        "chunks of the sequences are replayed concurrently if several processes are used."
+    )
+
+    def add_arguments(self, parser):
+        engine = parser.add_mutually_exclusive_group()
+        engine.add_argument('--engine-id', type=int, help='Id of the configured Engine to replay against')
+        engine.add_argument(
+            '--engine', choices=[name for name, _ in ENGINES], default='engine_mock',
+            help='Engine module to replay against, engine is created with the default settings',
+        )
+        parser.add_argument(
+            '--host', help='Host which replaces the host of the configured Engine with API, e.g. run_fake_vpal url',
+        )
+        parser.add_argument('--collection-order', help='Slug of the collection order which sequences are replayed')
+        parser.add_argument('--since', help='Replay sequences started since the datetime, e.g. 2020-01-31T00:00')
+        parser.add_argument('--limit', type=int, help='Max number of the replayed sequences')
+        parser.add_argument('--processes', type=int, default=1, help='Number of the worker processes')
+        parser.add_argument('--chunk-size', type=int, default=100, help='Number of the sequences replayed at once')
+
+    def get_sequence_ids(self, options):
+        sequences = Sequence.objects.filter(items__isnull=False).annotate(
+            started=Min('items__log__timestamp')
+        ).order_by(F('started').asc(nulls_last=True), 'id')
+        if options['collection_order']:
+            sequences = sequences.filter(collection_order__slug=options['collection_order'])
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError('Datetime {} has wrong format.'.format(options['since']))
+            sequences = sequences.filter(started__gte=since)
+        ids = sequences.values_list('id', flat=True)
+        if options['limit']:
+            ids = ids[:options['limit']]
+        return list(ids)
+
+    def handle(self, *args, **options):
+        if options['engine_id']:
+            engine = Engine.objects.filter(id=options['engine_id']).first()
+            if engine is None:
+                raise CommandError('Engine {} is not found.'.format(options['engine_id']))
+            # NOTE(idegtiarov) replay sends the historical answers to the engine, so the production engine isn't used
+            if engine.driver_settings.get('HOST') and not options['host']:
+                raise CommandError(
+                    'Engine {} sends requests to {}, replay it against the stand-in engine with the --host option, '
+                    'e.g. the run_fake_vpal server.'.format(options['engine_id'], engine.host)
+                )
+        sequence_ids = self.get_sequence_ids(options)
+        chunk_size = options['chunk_size']
+        chunks = (sequence_ids[start:start + chunk_size] for start in range(0, len(sequence_ids), chunk_size))
+        engine_kwargs = {'engine_id': options['engine_id'], 'engine_module': options['engine'], 'host': options['host']}
+        started = time.perf_counter()
+        if options['processes'] > 1:
+            # NOTE(idegtiarov) DB connections are not shared with the forked workers, every worker opens its own one
+            connections.close_all()
+            with Pool(options['processes']) as pool:
+                # NOTE(idegtiarov) chunks are dispatched in the chronological order, but they are replayed concurrently
+                results = list(pool.imap(functools.partial(replay_chunk, **engine_kwargs), chunks))
+        else:
+            results = [replay_chunk(chunk, **engine_kwargs) for chunk in chunks]
+        duration = time.perf_counter() - started
+        stats = {'durations': defaultdict(list), 'outcomes': defaultdict(int)}
+        for result in results:
+            for operation, durations in result['durations'].items():
+                stats['durations'][operation].extend(durations)
+            for name, value in result['outcomes'].items():
+                stats['outcomes'][name] += value
+        self.report(stats, duration)
+
+    def report(self, stats, duration):
+        self.stdout.write('{:<10}{:>10}{:>10}{:>10}{:>10}'.format('call', 'count', 'p50 ms', 'p95 ms', 'p99 ms'))
+        for operation in OPERATIONS:
+            durations = sorted(duration * 1000 for duration in stats['durations'][operation])
+            if not durations:
+                continue
+            self.stdout.write('{:<10}{:>10}{:>10.1f}{:>10.1f}{:>10.1f}'.format(
+                operation,
+                len(durations),
+                percentile(durations, 50),
+                percentile(durations, 95),
+                percentile(durations, 99),
+            ))
+        outcomes = stats['outcomes']
+        steps = outcomes['steps']
+        self.stdout.write('Sequences: {}, steps: {}, skipped items: {}, engine errors: {}.'.format(
+            outcomes['sequences'], steps, outcomes['skipped'], outcomes['errors']
+        ))
+        self.stdout.write(
+            'Engine matched the historical activity in {:.1%} of steps, completed the sequence before its end in '
+            '{:.1%} of steps and after its end in {:.1%} of sequences.'.format(
+                outcomes['matched'] / steps if steps else 0,
+                outcomes['completed_early'] / steps if steps else 0,
+                outcomes['completed'] / outcomes['sequences'] if outcomes['sequences'] else 0,
+            )
+        )
+        self.stdout.write('Average historical score: {:.3f}.'.format(
+            outcomes['points'] / outcomes['answers'] if outcomes['answers'] else 0
+        ))
+        selections = len(stats['durations']['select'])
+        self.stdout.write(self.style.SUCCESS(
+            '{} sequences are replayed in {:.1f} s, {:.1f} selections per second.'.format(
+                outcomes['sequences'], duration, selections / duration if duration else 0
+            )
+        ))
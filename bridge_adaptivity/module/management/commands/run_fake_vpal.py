@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from module.engines.fake_vpal import FakeVPALServer
+
+
+class Command(BaseCommand):
+    help = "Run the fake VPAL engine server for the offline performance testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+        parser.add_argument('--port', type=int, default=8009, help='Port to listen on')
+        parser.add_argument('--latency', type=float, default=0, help='Delay in seconds added to every response')
+        parser.add_argument('--jitter', type=float, default=0, help='Max random delay in seconds added to the latency')
+        parser.add_argument(
+            '--error-rate', type=float, default=0, help='Share of the requests answered with the error status',
+        )
+        parser.add_argument('--error-status', type=int, default=503, help='Status of the failed responses')
+        parser.add_argument('--max-rps', type=int, default=None, help='Max number of the requests per second')
+        parser.add_argument('--token', default=None, help='Token expected in the Authorization header')
+        parser.add_argument('--seed', type=int, default=None, help='Seed of the random errors and jitter')
+
+    def handle(self, *args, **options):
+        server = FakeVPALServer(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            error_status=options['error_status'],
+            max_rps=options['max_rps'],
+            token=options['token'],
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS('Fake VPAL server is listening on {}'.format(server.url)))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.httpd.server_close()
+            self.stdout.write('Requests statistics: {}'.format(server.stats()))
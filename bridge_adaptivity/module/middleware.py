@@ -1,4 +1,9 @@
+import time
+
 from django.contrib.sites.shortcuts import get_current_site
+from django.db import connection
+
+from common import metrics
 
 
 class BridgeSameSiteMiddleware:
@@ -47,4 +52,59 @@ class BridgeSameSiteMiddleware:
         return response
 
 
+class QueriesObserver:
+    """
+    Database execute wrapper counting the number and the duration of the executed queries.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class ServerTimingMiddleware:
+    """
+    Middleware to record duration and DB queries of the views to the metrics, see `common.metrics`.
+
+    Durations of the DB queries, engine, LMS and content source API requests made by the view are sent in the
+    `Server-Timing` header, so they are shown in the browser's developer tools. Middleware should be the first one
+    in the `settings.MIDDLEWARE` to cover the other middlewares.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueriesObserver()
+        metrics.start_request_timings()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(queries):
+                response = self.get_response(request)
+        finally:
+            timings = metrics.pop_request_timings()
+        duration = time.perf_counter() - started
+
+        view = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+        metrics.VIEW_SECONDS.labels(view=view, method=request.method).observe(duration)
+        metrics.VIEW_DB_QUERIES.labels(view=view, method=request.method).observe(queries.count)
+        metrics.VIEW_DB_SECONDS.labels(view=view, method=request.method).observe(queries.duration)
+
+        server_timing = ['db;dur={:.1f};desc="{} queries"'.format(queries.duration * 1000, queries.count)]
+        server_timing.extend(
+            '{};dur={:.1f}'.format(name, timing * 1000) for name, timing in sorted(timings.items())
+        )
+        server_timing.append('total;dur={:.1f}'.format(duration * 1000))
+        response['Server-Timing'] = ', '.join(server_timing)
+        return response
+
+
 import_path = "module.middleware.BridgeSameSiteMiddleware"
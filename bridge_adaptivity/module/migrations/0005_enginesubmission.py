@@ -0,0 +1,30 @@
+# Generated by Django 2.2.18 on 2026-10-18 14:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('module', '0004_auto_20191002_1355'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EngineSubmission',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('P', 'Pending'), ('S', 'Sent'), ('F', 'Failed')], db_index=True, default='P', max_length=1)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('sequence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='engine_submissions', to='module.Sequence')),
+                ('sequence_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='engine_submissions', to='module.SequenceItem')),
+            ],
+            options={
+                'ordering': ['sequence', 'id'],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.18 on 2026-10-18 14:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('module', '0005_enginesubmission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enginesubmission',
+            name='engine',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='module.Engine'),
+        ),
+        migrations.AddField(
+            model_name='enginesubmission',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
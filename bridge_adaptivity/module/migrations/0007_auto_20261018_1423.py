@@ -0,0 +1,38 @@
+# Generated by Django 2.2.18 on 2026-10-18 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('module', '0006_auto_20261018_1420'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='engine',
+            name='connect_timeout',
+            field=models.FloatField(default=3.05, help_text='Connection timeout in seconds.'),
+        ),
+        migrations.AddField(
+            model_name='engine',
+            name='max_retries',
+            field=models.PositiveIntegerField(default=2, help_text='Number of retries for the failed connections and 502, 503, 504 responses.'),
+        ),
+        migrations.AddField(
+            model_name='engine',
+            name='pool_size',
+            field=models.PositiveIntegerField(default=10, help_text='Maximum number of the keep-alive connections to the engine host per worker process.'),
+        ),
+        migrations.AddField(
+            model_name='engine',
+            name='read_timeout',
+            field=models.FloatField(default=10, help_text='Read timeout in seconds.'),
+        ),
+        migrations.AddField(
+            model_name='engine',
+            name='retry_backoff',
+            field=models.FloatField(default=0.3, help_text='Backoff factor in seconds for the delay between the retries.'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.18 on 2026-10-18 14:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('module', '0007_auto_20261018_1423'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collectionorder',
+            name='speculative_recommendation',
+            field=models.BooleanField(default=False, help_text="Request the next activity from the engine in background when student's answer is received."),
+        ),
+    ]
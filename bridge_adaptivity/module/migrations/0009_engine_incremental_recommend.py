@@ -0,0 +1,18 @@
+# Generated by Django 2.2.18 on 2026-10-18 14:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('module', '0008_collectionorder_speculative_recommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='engine',
+            name='incremental_recommend',
+            field=models.BooleanField(default=False, help_text='Send only changed sequence items in the recommend requests, engine should support the cursor.'),
+        ),
+    ]
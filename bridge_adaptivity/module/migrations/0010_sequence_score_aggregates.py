@@ -0,0 +1,68 @@
+# Generated by Django 2.2.18 on 2026-10-18 14:39
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def rebuild_sequence_aggregates(apps, schema_editor):
+    Sequence = apps.get_model('module', 'Sequence')
+    SequenceItem = apps.get_model('module', 'SequenceItem')
+    items = SequenceItem.objects.filter(sequence=OuterRef('pk'), score__isnull=False).order_by().values('sequence')
+
+    def items_aggregate(aggregate, output_field, **filters):
+        return Coalesce(
+            Subquery(items.filter(**filters).annotate(value=aggregate).values('value'), output_field=output_field),
+            0,
+            output_field=output_field,
+        )
+
+    Sequence.objects.update(
+        points_earned=items_aggregate(Sum('score'), models.FloatField()),
+        trials_count=items_aggregate(Count('score'), models.IntegerField()),
+        problem_points_earned=items_aggregate(Sum('score'), models.FloatField(), is_problem=True),
+        problem_trials_count=items_aggregate(Count('score'), models.IntegerField(), is_problem=True),
+        correct_count=items_aggregate(Count('score'), models.IntegerField(), score__gt=0),
+        incorrect_count=items_aggregate(Count('score'), models.IntegerField(), score=0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('module', '0009_engine_incremental_recommend'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sequence',
+            name='correct_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sequence',
+            name='incorrect_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sequence',
+            name='points_earned',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sequence',
+            name='problem_points_earned',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sequence',
+            name='problem_trials_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sequence',
+            name='trials_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(rebuild_sequence_aggregates, migrations.RunPython.noop),
+    ]
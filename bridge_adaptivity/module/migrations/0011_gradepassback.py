@@ -0,0 +1,26 @@
+# Generated by Django 2.2.18 on 2026-10-18 14:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('module', '0010_sequence_score_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradePassback',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grade', models.FloatField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('S', 'Sent'), ('F', 'Failed')], db_index=True, max_length=1)),
+                ('error', models.TextField(blank=True, default='')),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sequence', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='grade_passback', to='module.Sequence')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.18 on 2026-10-18 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('module', '0011_gradepassback'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gradepassback',
+            name='lms_status',
+            field=models.CharField(blank=True, default='', help_text="LMS response's code major.", max_length=20),
+        ),
+    ]
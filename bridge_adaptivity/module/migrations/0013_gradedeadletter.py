@@ -0,0 +1,26 @@
+# Generated by Django 2.2.18 on 2026-10-18 14:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('module', '0012_gradepassback_lms_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeDeadLetter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grade', models.FloatField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('lms_status', models.CharField(blank=True, default='', help_text="LMS response's code major.", max_length=20)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sequence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grade_dead_letters', to='module.Sequence')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.18 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('module', '0013_gradedeadletter'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='engine',
+            name='engine',
+            field=models.CharField(choices=[('engine_irt', 'irt'), ('engine_vpal', 'vpal'), ('engine_mock', 'mock')], default='engine_mock', max_length=100),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.18 on 2026-10-18 15:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('module', '0014_engine_irt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sequence',
+            name='skill_mastery',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.AlterField(
+            model_name='engine',
+            name='engine',
+            field=models.CharField(choices=[('engine_irt', 'irt'), ('engine_vpal', 'vpal'), ('engine_bkt', 'bkt'), ('engine_mock', 'mock')], default='engine_mock', max_length=100),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.18 on 2026-10-18 15:43
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('module', '0015_engine_bkt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EngineCollectionManifest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hashes', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict)),
+                ('manifest_hash', models.CharField(max_length=40)),
+                ('config_hash', models.CharField(max_length=40)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+                ('collection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='engine_manifests', to='module.Collection')),
+                ('engine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='collection_manifests', to='module.Engine')),
+            ],
+            options={
+                'unique_together': {('engine', 'collection')},
+            },
+        ),
+    ]
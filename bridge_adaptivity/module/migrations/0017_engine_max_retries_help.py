@@ -0,0 +1,18 @@
+# Generated by Django 2.2.18 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('module', '0016_engine_collection_manifest'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='engine',
+            name='max_retries',
+            field=models.PositiveIntegerField(default=2, help_text='Number of retries for the failed connections, idempotent requests are also retried on the read errors and 502, 503, 504 responses.'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.18 on 2026-10-18 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('module', '0017_engine_max_retries_help'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='engine',
+            name='sync_diffs',
+            field=models.BooleanField(default=False, help_text='Send only changed activities in the collection synchronization, engine should support the diffs.'),
+        ),
+    ]
@@ -1,17 +1,28 @@
+import datetime
+import functools
 import hashlib
 import importlib
 import inspect
+import json
 import logging
 import math
 import os
+import threading
+import time
 import uuid
 
 from django.conf import settings
 from django.contrib.postgres.fields import JSONField
+from django.core.cache import cache
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models import fields
+from django.db import models, transaction
+from django.db.models import F, fields, Func, OuterRef, Subquery
+from django.db.models.aggregates import Count, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from multiselectfield import MultiSelectField
 from ordered_model.models import OrderedModel
@@ -21,6 +32,10 @@ from slugger import AutoSlugField
 from bridge_lti.models import BridgeUser, LtiContentSource, LtiUser, OutcomeService
 from common.mixins.models import HasLinkedSequenceMixin, ModelFieldIsDefaultMixin
 from module import tasks
+from module.engines import manifest
+from module.engines.circuit_breaker import CircuitBreaker
+from module.engines.registry import engine_drivers
+from module.policies.memoization import invalidate_grade, memoize_grade
 
 log = logging.getLogger(__name__)
 
@@ -45,7 +60,8 @@ def _load_cls_from_applicable_module(module_path, mod_name, class_startswith=Non
     except ImportError:
         log.error("Could not load module_path={}, mod_name={}".format(module_path, mod_name))
         raise
-    for attr in inspect.getmembers(cls_module):
+    # NOTE(idegtiarov) abstract base classes imported to the module (e.g. `EngineInterface`) are skipped
+    for attr in inspect.getmembers(cls_module, lambda member: not inspect.isabstract(member)):
         if class_endswith and attr[0].endswith(class_endswith):
             module = attr[1]
         elif class_startswith and attr[0].startswith(class_startswith):
@@ -53,6 +69,14 @@ def _load_cls_from_applicable_module(module_path, mod_name, class_startswith=Non
     return module
 
 
+@functools.lru_cache(maxsize=None)
+def _load_engine_driver_cls(engine_module):
+    """
+    Load engine driver class from the engine module, loaded classes are cached for the process lifetime.
+    """
+    return _load_cls_from_applicable_module('module.engines', engine_module, class_startswith='Engine')
+
+
 ENGINES = _discover_applicable_modules(folder_name='engines', file_startswith='engine_')
 
 GRADING_POLICY_MODULES = _discover_applicable_modules(folder_name='policies', file_startswith='policy_')
@@ -70,6 +94,9 @@ variables are used to show popover message with description about each policy (b
 """
 GRADING_POLICY_CHOICES = ((k, v) for k, v in GRADING_POLICY_NAME_TO_CLS.items())
 
+# Cache key of the speculatively computed engine's recommendation for the sequence, see `module.utils`
+RECOMMENDATION_STASH_KEY = 'sequence:{}:recommendation'
+
 
 class Sequence(models.Model):
     """
@@ -87,12 +114,78 @@ class Sequence(models.Model):
     # NOTE(yura.braiko) suffix is a hash to make unique user_id for the collection repetition feature.
     suffix = models.CharField(max_length=15, default='')
 
+    # Running totals of the sequence items' scores, they are updated atomically with the SequenceItem changes
+    points_earned = models.FloatField(default=0)
+    trials_count = models.PositiveIntegerField(default=0)
+    problem_points_earned = models.FloatField(default=0)
+    problem_trials_count = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
+    incorrect_count = models.PositiveIntegerField(default=0)
+
+    # Packed skills mastery of the learner traced by the BKT engine, see `module.engines.engine_bkt`
+    skill_mastery = models.BinaryField(default=b'', blank=True)
+
+    AGGREGATE_FIELDS = (
+        'points_earned',
+        'trials_count',
+        'problem_points_earned',
+        'problem_trials_count',
+        'correct_count',
+        'incorrect_count',
+    )
+    # Float aggregates are rounded to the precision of the scores, so the running totals don't accumulate float errors
+    FLOAT_AGGREGATE_FIELDS = ('points_earned', 'problem_points_earned')
+    AGGREGATE_PRECISION = 6
+
     class Meta:
         unique_together = ('lti_user', 'collection_order', 'suffix')
 
     def __str__(self):
         return '<Sequence[{}]: {}>'.format(self.id, self.lti_user)
 
+    def save(self, *args, **kwargs):
+        """
+        Extension which prevents overwriting of the score aggregates with the stale values.
+
+        Aggregates of the existing sequence are changed only with the atomic updates, see `SequenceItem.save`. Skills
+        mastery is changed only by the engine.
+        """
+        if not self._state.adding and not args and not kwargs.get('update_fields') and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.AGGREGATE_FIELDS + ('skill_mastery',)
+            ]
+        super().save(*args, **kwargs)
+        invalidate_grade(self.id)
+
+    @classmethod
+    def rebuild_aggregates(cls, sequences=None):
+        """
+        Recalculate the score aggregates from the sequence items.
+
+        :param sequences: Sequence queryset to rebuild, default is all sequences
+        :return: number of the updated sequences
+        """
+        if sequences is None:
+            sequences = cls.objects.all()
+        items = SequenceItem.objects.filter(sequence=OuterRef('pk'), score__isnull=False).order_by().values('sequence')
+
+        def items_aggregate(aggregate, output_field, **filters):
+            return Coalesce(
+                Subquery(items.filter(**filters).annotate(value=aggregate).values('value'), output_field=output_field),
+                0,
+                output_field=output_field,
+            )
+
+        return sequences.update(
+            points_earned=items_aggregate(Sum('score'), models.FloatField()),
+            trials_count=items_aggregate(Count('score'), models.IntegerField()),
+            problem_points_earned=items_aggregate(Sum('score'), models.FloatField(), is_problem=True),
+            problem_trials_count=items_aggregate(Count('score'), models.IntegerField(), is_problem=True),
+            correct_count=items_aggregate(Count('score'), models.IntegerField(), score__gt=0),
+            incorrect_count=items_aggregate(Count('score'), models.IntegerField(), score=0),
+        )
+
     def fulfil_sequence_metadata(self, lti_params, launch_params):
         """
         Automate fulfilling sequence metadata field with launch_params equal to lti_params.
@@ -132,10 +225,7 @@ class Sequence(models.Model):
                 grade = round(grade * 100, 1)
                 details = f"{CollectionOrder.OPTIONS[1][1]}: {grade}%"
             else:
-                details = (
-                    f"{CollectionOrder.OPTIONS[2][1]}: "
-                    f"{self.items.filter(score__gt=0).count()}/{self.items.filter(score=0).count()}"
-                )
+                details = f"{CollectionOrder.OPTIONS[2][1]}: {self.correct_count}/{self.incorrect_count}"
             details_list.append(details)
 
         return details_list
@@ -155,10 +245,14 @@ class SequenceItem(models.Model):
 
     is_problem = models.BooleanField(default=True)
     __origin_score = None
+    __origin_is_problem = None
+    __origin_activity_id = None
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.__origin_score = self.score
+        self.__origin_is_problem = self.is_problem
+        self.__origin_activity_id = self.activity_id
 
     class Meta:
         verbose_name = "Sequence Item"
@@ -178,24 +272,425 @@ class SequenceItem(models.Model):
 
     def save(self, *args, **kwargs):
         """
-        Extension sending notification to the Adaptive engine that score is changed.
+        Extension queueing notification to the Adaptive engine that score is changed.
+
+        Score is stored in the EngineSubmission queue in the same transaction with the SequenceItem and is sent to the
+        engine by the celery worker after the transaction is committed.
         """
-        if self.score != self.__origin_score:
-            engine = self.sequence.collection_order.engine.engine_driver
-            engine.submit_activity_answer(self)
-            log.debug("Adaptive engine is updated with the grade for the {} activity in the SequenceItem {}".format(
-                self.activity.name, self.id
-            ))
+        adding = self._state.adding
         if self.activity.repetition > 1:
             self._add_suffix()
         self.is_problem = self.activity.is_problem
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            stored = None if adding else SequenceItem.objects.select_for_update().filter(id=self.id).values_list(
+                'score', 'is_problem'
+            ).first()
+            # NOTE(idegtiarov) contribution of the stored score is read under the row lock, so the concurrent saves of
+            # the item shift the aggregates one after another by the difference from the score stored by the other
+            origin_score, origin_is_problem = stored or (None, None)
+            score_changed = self.score != origin_score
+            super().save(*args, **kwargs)
+            self.update_sequence_aggregates(
+                self.get_score_aggregates(origin_score, origin_is_problem),
+                self.get_score_aggregates(self.score, self.is_problem),
+            )
+            if score_changed:
+                EngineSubmission.enqueue(self)
+        invalidate_grade(self.sequence_id)
+        if adding:
+            self.notify_engine('on_sequence_item_created')
+        elif self.activity_id != self.__origin_activity_id:
+            self.notify_engine('on_sequence_item_changed')
+        if score_changed:
+            # NOTE(idegtiarov) speculative recommendation is computed for the previous state of the sequence.
+            cache.delete(RECOMMENDATION_STASH_KEY.format(self.sequence_id))
+        self.__origin_score = self.score
+        self.__origin_is_problem = self.is_problem
+        self.__origin_activity_id = self.activity_id
+
+    def notify_engine(self, hook):
+        """
+        Call the sequence engine driver's hook on the SequenceItem change, see `EngineInterface`.
+
+        Hook is called when the transaction is committed, callers are expected to load the sequence with
+        `select_related('collection_order__engine')`, so the driver is picked without extra queries.
+
+        :param hook: name of the driver's hook, `on_sequence_item_created` or `on_sequence_item_changed`
+        """
+        collection_order = self.sequence.collection_order if self.sequence_id else None
+        if collection_order and collection_order.engine_id:
+            driver_hook = getattr(collection_order.engine.engine_driver, hook)
+            transaction.on_commit(lambda: driver_hook(self))
+
+    @property
+    def origin_score_aggregates(self):
+        """
+        Contribution of the item's stored score into the sequence's score aggregates.
+        """
+        return self.get_score_aggregates(self.__origin_score, self.__origin_is_problem)
+
+    @staticmethod
+    def get_score_aggregates(score, is_problem):
+        """
+        Get contribution of the score into the sequence's score aggregates.
+
+        :param score: sequence item's score
+        :param is_problem: boolean flag shows if the sequence item is a problem
+        :return: dict with the Sequence aggregate fields and values
+        """
+        if score is None:
+            return {}
+        aggregates = {
+            'points_earned': score,
+            'trials_count': 1,
+            'correct_count': int(score > 0),
+            'incorrect_count': int(score == 0),
+        }
+        if is_problem:
+            aggregates.update({'problem_points_earned': score, 'problem_trials_count': 1})
+        return aggregates
+
+    def update_sequence_aggregates(self, origin, current):
+        """
+        Atomically shift the sequence's score aggregates by the difference between item's contributions.
+
+        Float aggregates are rounded to the `Sequence.AGGREGATE_PRECISION`. Loaded sequence instance is updated in
+        place to avoid refreshing it from the database.
+
+        :param origin: previous contribution of the item, see `get_score_aggregates`
+        :param current: current contribution of the item
+        """
+        deltas = {}
+        for field in Sequence.AGGREGATE_FIELDS:
+            delta = current.get(field, 0) - origin.get(field, 0)
+            if delta:
+                deltas[field] = delta
+        if not deltas or not self.sequence_id:
+            return
+        precision = Sequence.AGGREGATE_PRECISION
+        Sequence.objects.filter(id=self.sequence_id).update(**{
+            field: Func(
+                F(field) + delta,
+                template='ROUND(CAST(%(expressions)s AS numeric), {})'.format(precision),
+                output_field=models.FloatField(),
+            ) if field in Sequence.FLOAT_AGGREGATE_FIELDS else F(field) + delta
+            for field, delta in deltas.items()
+        })
+        if SequenceItem.sequence.is_cached(self):
+            for field, delta in deltas.items():
+                value = getattr(self.sequence, field) + delta
+                if field in Sequence.FLOAT_AGGREGATE_FIELDS:
+                    value = round(value, precision)
+                setattr(self.sequence, field, value)
 
     @property
     def user_id_for_consumer(self):
         return f'{self.sequence.lti_user.user_id}{self.sequence.suffix}{self.suffix}'
 
 
+# Ids of the sequences which are being deleted by the current thread
+_deleted_sequences = threading.local()
+
+
+@receiver(pre_delete, sender=Sequence)
+def mark_sequence_deleted(sender, instance, **kwargs):
+    """
+    Pre delete signal handler for Sequence model.
+
+    Sequence's items are deleted with it, so their scores are not excluded from the deleted sequence's aggregates.
+    Sequence is marked until its post delete signal.
+    """
+    if not hasattr(_deleted_sequences, 'ids'):
+        _deleted_sequences.ids = set()
+    _deleted_sequences.ids.add(instance.id)
+
+
+@receiver(post_delete, sender=Sequence)
+def unmark_sequence_deleted(sender, instance, **kwargs):
+    """
+    Post delete signal handler for Sequence model.
+    """
+    getattr(_deleted_sequences, 'ids', set()).discard(instance.id)
+
+
+@receiver(pre_delete, sender=SequenceItem)
+def mark_sequence_item_deleted_with_sequence(sender, instance, **kwargs):
+    """
+    Pre delete signal handler for SequenceItem model.
+
+    NOTE(idegtiarov) pre delete signals of all the collected objects are sent before the post delete ones, the item is
+    marked here because the sequence could be unmarked before the item's post delete signal.
+    """
+    if instance.sequence_id in getattr(_deleted_sequences, 'ids', ()):
+        instance._sequence_deleted = True
+
+
+@receiver(post_delete, sender=SequenceItem)
+def exclude_sequence_item_from_aggregates(sender, instance, **kwargs):
+    """
+    Post delete signal handler for SequenceItem model.
+
+    Subtract the deleted item's score from the sequence's score aggregates and notify the sequence's engine, skipped if
+    the sequence is deleted too.
+    """
+    if getattr(instance, '_sequence_deleted', False) or instance.sequence_id in getattr(_deleted_sequences, 'ids', ()):
+        return
+    instance.update_sequence_aggregates(instance.origin_score_aggregates, {})
+    invalidate_grade(instance.sequence_id)
+    instance.notify_engine('on_sequence_item_changed')
+
+
+class EngineSubmission(models.Model):
+    """
+    Outbound queue of the SequenceItem's scores which should be sent to the Adaptive engine.
+
+    Pending submissions are coalesced into batches by the celery worker, scores of every Sequence are sent in the order
+    they were received.
+    """
+
+    PENDING = 'P'
+    SENT = 'S'
+    FAILED = 'F'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    FLUSH_SCHEDULED_KEY = 'engine_submission:{}:flush_scheduled'
+
+    sequence = models.ForeignKey('Sequence', related_name='engine_submissions', on_delete=models.CASCADE)
+    sequence_item = models.ForeignKey('SequenceItem', related_name='engine_submissions', on_delete=models.CASCADE)
+    engine = models.ForeignKey('Engine', null=True, on_delete=models.CASCADE)
+    score = models.FloatField(null=True, blank=True)
+    status = fields.CharField(choices=STATUSES, default=PENDING, max_length=1, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['sequence', 'id']
+
+    def __str__(self):
+        return '<EngineSubmission[{}]: {}={} ({})>'.format(
+            self.id, self.sequence_item_id, self.score, self.get_status_display()
+        )
+
+    @classmethod
+    def enqueue(cls, sequence_item):
+        """
+        Record the SequenceItem's score and schedule engine queue flushing when transaction is committed.
+
+        Score isn't recorded if the sequence's collection order has no engine.
+
+        :param sequence_item: SequenceItem instance with the changed score
+        :return: created EngineSubmission instance or None
+        """
+        engine_id = sequence_item.sequence.collection_order.engine_id
+        if engine_id is None:
+            log.debug("Collection order of the {} has no engine, score isn't submitted.".format(sequence_item))
+            return None
+        submission = cls.objects.create(
+            sequence_id=sequence_item.sequence_id,
+            sequence_item=sequence_item,
+            engine_id=engine_id,
+            score=sequence_item.score,
+        )
+        transaction.on_commit(lambda: cls.schedule_flush(submission.engine_id))
+        return submission
+
+    @classmethod
+    def schedule_flush(cls, engine_id, countdown=None):
+        """
+        Schedule flushing of the engine's queue, only one flush is scheduled per batch window.
+
+        :param engine_id: id of the Engine which queue should be flushed
+        :param countdown: delay in seconds, default is the batch window
+        """
+        if countdown is None:
+            countdown = settings.ENGINE_SUBMISSION_BATCH_WINDOW / 1000
+        if cache.add(cls.FLUSH_SCHEDULED_KEY.format(engine_id), True, countdown + settings.CELERY_RESULT_TIMEOUT):
+            tasks.flush_engine_submissions.apply_async(kwargs={'engine_id': engine_id}, countdown=countdown)
+
+    @classmethod
+    def flush_sequence(cls, sequence):
+        """
+        Send the sequence's pending scores to its engine synchronously.
+
+        It is used before the engine is asked for the sequence's grade, so the grade accounts the latest scores. Scores
+        aren't sent if the sequence has the postponed failed score, they are resent in order by the queue flushing.
+
+        :param sequence: Sequence instance
+        :return: number of the accepted submissions
+        """
+        submissions = list(cls.objects.filter(sequence=sequence, status=cls.PENDING).select_related(
+            'sequence_item__activity', 'sequence_item__sequence__lti_user__lti_lms_platform',
+        ).order_by('id'))
+        now = timezone.now()
+        if not submissions or any(submission.next_attempt_at > now for submission in submissions):
+            return 0
+        return cls.submit_batch(sequence.collection_order.engine.engine_driver, submissions)
+
+    @classmethod
+    def submit_batch(cls, engine_driver, submissions, blocked_sequences=None):
+        """
+        Send the batch of the recorded scores to the engine.
+
+        Failed submission is postponed with the exponential backoff, submissions of the same sequence which follow it
+        stay pending to be resent after it. After the last attempt submission is marked as failed.
+
+        :param engine_driver: engine driver instance the scores are sent to
+        :param submissions: list of the EngineSubmission instances ordered by creation
+        :param blocked_sequences: set of the sequences' ids with the failed submission, it is shared by the batches of
+            the flush and is updated with the sequences failed in this batch
+        :return: number of the accepted submissions
+        """
+        if blocked_sequences is None:
+            blocked_sequences = set()
+        # NOTE(idegtiarov) scores of the sequence failed in the previous batch aren't sent before the failed one
+        submissions = [submission for submission in submissions if submission.sequence_id not in blocked_sequences]
+        sequence_items = []
+        for submission in submissions:
+            # NOTE(idegtiarov) Score could be updated after the submission was queued, engine should receive scores in
+            # the order they were received by the Bridge.
+            submission.sequence_item.score = submission.score
+            sequence_items.append(submission.sequence_item)
+        if not sequence_items:
+            return 0
+        try:
+            results = engine_driver.submit_activity_answers(sequence_items)
+        except Exception:
+            log.exception("[Engine] Cannot submit batch of {} scores".format(len(submissions)))
+            results = [False] * len(submissions)
+
+        now = timezone.now()
+        accepted = 0
+        for submission, submitted in zip(submissions, results):
+            if not submitted and submission.sequence_id in blocked_sequences:
+                # Score isn't sent after the failed score of the sequence, it is resent after the failed one
+                continue
+            submission.attempts += 1
+            if submitted:
+                # NOTE(idegtiarov) score accepted by the engine is never resent even if the earlier score of the
+                # sequence failed in the same batch, to not duplicate it on the engine
+                submission.status = cls.SENT
+                submission.sent_at = now
+                accepted += 1
+            elif submission.attempts >= settings.ENGINE_SUBMISSION_MAX_ATTEMPTS:
+                submission.status = cls.FAILED
+                log.error("Score submission {} is failed after {} attempts.".format(submission, submission.attempts))
+            else:
+                blocked_sequences.add(submission.sequence_id)
+                submission.next_attempt_at = now + datetime.timedelta(
+                    seconds=settings.ENGINE_SUBMISSION_RETRY_DELAY * 2 ** (submission.attempts - 1)
+                )
+            submission.save(update_fields=['status', 'attempts', 'next_attempt_at', 'sent_at'])
+        log.debug("Adaptive engine accepted {} of {} scores.".format(accepted, len(submissions)))
+        return accepted
+
+
+class GradePassback(models.Model):
+    """
+    The last grade of the Sequence sent to the LMS and the result of the sending.
+    """
+
+    SENT = 'S'
+    FAILED = 'F'
+    STATUSES = (
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    DEFERRED_KEY = 'sequence:{}:grade_passback_deferred'
+
+    sequence = models.OneToOneField('Sequence', related_name='grade_passback', on_delete=models.CASCADE)
+    grade = models.FloatField(null=True, blank=True)
+    status = fields.CharField(choices=STATUSES, max_length=1, db_index=True)
+    lms_status = fields.CharField(max_length=20, blank=True, default='', help_text="LMS response's code major.")
+    error = models.TextField(blank=True, default='')
+    sent_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return '<GradePassback[{}]: {}={} ({})>'.format(
+            self.id, self.sequence_id, self.grade, self.get_status_display()
+        )
+
+    @staticmethod
+    def is_sent(sequence, grade):
+        """
+        Check the grade is already accepted by the LMS.
+
+        :param sequence: Sequence instance, preferably with the selected `grade_passback`
+        :param grade: grade to check
+        """
+        try:
+            passback = sequence.grade_passback
+        except GradePassback.DoesNotExist:
+            return False
+        return passback.is_accepted(grade)
+
+    def is_accepted(self, grade):
+        return self.status == self.SENT and self.grade == grade
+
+    @classmethod
+    def defer(cls, sequence_id, countdown=None, attempt=1):
+        """
+        Schedule sending of the sequence's grade to the LMS, only one sending is scheduled per sequence.
+
+        Grade is calculated when the task is executed, so the latest grade is sent. Sending is scheduled when the
+        transaction is committed, nothing is scheduled if it is rolled back.
+
+        :param sequence_id: id of the Sequence
+        :param countdown: delay in seconds, default is the debounce window
+        :param attempt: number of the sending attempt
+        """
+        if countdown is None:
+            countdown = settings.GRADE_PASSBACK_DEBOUNCE_WINDOW
+
+        def schedule():
+            if cache.add(cls.DEFERRED_KEY.format(sequence_id), True, countdown + settings.CELERY_RESULT_TIMEOUT):
+                tasks.send_sequence_grade.apply_async(
+                    kwargs={'sequence_id': sequence_id, 'attempt': attempt}, countdown=countdown
+                )
+        transaction.on_commit(schedule)
+
+    @classmethod
+    def record(cls, sequence, grade, sent, error='', lms_status=''):
+        """
+        Record the result of sending the grade to the LMS.
+
+        :param sequence: Sequence instance
+        :param grade: sent grade
+        :param sent: boolean flag shows the grade is accepted by the LMS
+        :param error: error description if grade is not accepted
+        :param lms_status: code major of the LMS response
+        :return: GradePassback instance
+        """
+        defaults = {'status': cls.SENT if sent else cls.FAILED, 'error': error, 'lms_status': lms_status}
+        if sent:
+            defaults.update({'grade': grade, 'sent_at': timezone.now()})
+        passback, _ = cls.objects.update_or_create(sequence=sequence, defaults=defaults)
+        return passback
+
+
+class GradeDeadLetter(models.Model):
+    """
+    Grade which was not accepted by the LMS after all sending attempts.
+    """
+
+    sequence = models.ForeignKey('Sequence', related_name='grade_dead_letters', on_delete=models.CASCADE)
+    grade = models.FloatField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    lms_status = fields.CharField(max_length=20, blank=True, default='', help_text="LMS response's code major.")
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return '<GradeDeadLetter[{}]: {}={}>'.format(self.id, self.sequence_id, self.grade)
+
+
 class GradingPolicy(ModelFieldIsDefaultMixin, models.Model):
     """
     Predefined set of Grading policy objects. Define how to grade collections.
@@ -217,8 +712,13 @@ class GradingPolicy(ModelFieldIsDefaultMixin, models.Model):
         return self.policy_cls(policy=self, **kwargs)
 
     def calculate_grade(self, sequence):
-        policy = self.policy_cls(policy=self, sequence=sequence)
-        return math.floor(policy.grade * 1000) / 1000
+        """
+        Calculate grade of the sequence, grade is memoized within the `grade_memoization` context.
+        """
+        def calculate():
+            policy = self.policy_cls(policy=self, sequence=sequence)
+            return math.floor(policy.grade * 1000) / 1000
+        return memoize_grade(sequence.id, self.id, calculate)
 
     def __str__(self):
         return "{}, public_name: {} params: {}{}".format(
@@ -230,6 +730,10 @@ class GradingPolicy(ModelFieldIsDefaultMixin, models.Model):
 class Collection(models.Model):
     """Set of Activities (problems) for a module."""
 
+    # Pending sync lease and the deadline of the sync, see `Collection.schedule_sync`
+    SYNC_SCHEDULED_KEY = 'collection:{}:sync_scheduled'
+    SYNC_DEADLINE_KEY = 'collection:{}:sync_deadline'
+
     name = fields.CharField(max_length=255)
     slug = AutoSlugField(
         populate_from='name',
@@ -252,10 +756,7 @@ class Collection(models.Model):
         """Extension cover method with logging."""
         initial_id = self.id
         super().save(*args, **kwargs)
-        tasks.sync_collection_engines.apply_async(
-            kwargs={'collection_slug': self.slug, 'created_at': self.updated_at},
-            countdown=settings.CELERY_DELAY_SYNC_TASK,
-        )
+        self.schedule_sync()
 
         if initial_id:
             Log.objects.create(
@@ -271,12 +772,56 @@ class Collection(models.Model):
     def get_absolute_url(self):
         return reverse('module:collection-list')
 
+    def activities_changed(self):
+        """
+        Bump the collection's version and schedule its sync after the change of its activities.
+
+        Only `updated_at` is updated, it versions the engines' indexes of the collection and the immediate sync. Change
+        itself is logged by the activity, so the collection's update isn't logged.
+        """
+        self.updated_at = timezone.now()
+        Collection.objects.filter(id=self.id).update(updated_at=self.updated_at)
+        self.schedule_sync()
+
+    def schedule_sync(self):
+        """
+        Schedule synchronization of the collection with the engines after the sync delay.
+
+        Every change of the collection extends the deadline of the sync, while only one sync task is pending per
+        collection. Task is rescheduled until the collection isn't changed for the sync delay, see `postpone_sync`.
+        """
+        delay = settings.CELERY_DELAY_SYNC_TASK
+        lease_timeout = delay + settings.CELERY_RESULT_TIMEOUT
+        # NOTE(idegtiarov) deadline is set before the lease is checked, so the pending task sees the extended deadline
+        cache.set(self.SYNC_DEADLINE_KEY.format(self.slug), time.time() + delay, lease_timeout)
+        if cache.add(self.SYNC_SCHEDULED_KEY.format(self.slug), True, lease_timeout):
+            tasks.sync_collection_engines.apply_async(kwargs={'collection_slug': self.slug}, countdown=delay)
+
+    @classmethod
+    def postpone_sync(cls, collection_slug):
+        """
+        Reschedule the pending sync task if the deadline of the sync is extended by the collection's changes.
+
+        :param collection_slug: slug of the collection
+        :return: boolean flag, whether the sync is postponed, otherwise the collection should be synchronized now
+        """
+        scheduled_key = cls.SYNC_SCHEDULED_KEY.format(collection_slug)
+        # NOTE(idegtiarov) lease is released before the deadline is checked, the collection's changes made after this
+        # point schedule the new sync task
+        cache.delete(scheduled_key)
+        deadline = cache.get(cls.SYNC_DEADLINE_KEY.format(collection_slug))
+        remaining = deadline - time.time() if deadline else 0
+        if remaining <= 0:
+            return False
+        if cache.add(scheduled_key, True, remaining + settings.CELERY_RESULT_TIMEOUT):
+            tasks.sync_collection_engines.apply_async(kwargs={'collection_slug': collection_slug}, countdown=remaining)
+        return True
+
 
 class Engine(ModelFieldIsDefaultMixin, models.Model):
     """Defines engine settings."""
 
     DEFAULT_ENGINE = 'engine_mock'
-    DRIVER = None
 
     engine = models.CharField(choices=ENGINES, default=DEFAULT_ENGINE, max_length=100)
     engine_name = models.CharField(max_length=255, blank=True, null=True, unique=True)
@@ -288,6 +833,29 @@ class Engine(ModelFieldIsDefaultMixin, models.Model):
         help_text=_("LTI parameters to sent to the engine, use comma separated string")
     )
     is_default = fields.BooleanField(default=False, help_text=_("If checked Engine will be used as the default!"))
+    # HTTP connection settings for the engines with API
+    pool_size = models.PositiveIntegerField(
+        default=10, help_text=_("Maximum number of the keep-alive connections to the engine host per worker process.")
+    )
+    connect_timeout = models.FloatField(default=3.05, help_text=_("Connection timeout in seconds."))
+    read_timeout = models.FloatField(default=10, help_text=_("Read timeout in seconds."))
+    max_retries = models.PositiveIntegerField(
+        default=2, help_text=_(
+            "Number of retries for the failed connections, idempotent requests are also retried on the read errors "
+            "and 502, 503, 504 responses."
+        )
+    )
+    retry_backoff = models.FloatField(
+        default=0.3, help_text=_("Backoff factor in seconds for the delay between the retries.")
+    )
+    incremental_recommend = fields.BooleanField(
+        default=False,
+        help_text=_("Send only changed sequence items in the recommend requests, engine should support the cursor.")
+    )
+    sync_diffs = fields.BooleanField(
+        default=False,
+        help_text=_("Send only changed activities in the collection synchronization, engine should support the diffs.")
+    )
 
     class Meta:
         unique_together = ('host', 'token')
@@ -303,24 +871,138 @@ class Engine(ModelFieldIsDefaultMixin, models.Model):
             is_default=True
         )
 
+    @property
+    def driver_settings(self):
+        """
+        Return dict with the initial params for the engine driver initialization.
+        """
+        # NOTE(idegtiarov) Currently, statement coves existent engines modules. Improve in case new engine will be
+        # added to the engines package.
+        if self.engine.endswith(('mock', 'irt', 'bkt')):
+            return {}
+        return {
+            'HOST': self.host,
+            'TOKEN': self.token,
+            'POOL_SIZE': int(self.pool_size),
+            'CONNECT_TIMEOUT': float(self.connect_timeout),
+            'READ_TIMEOUT': float(self.read_timeout),
+            'MAX_RETRIES': int(self.max_retries),
+            'RETRY_BACKOFF': float(self.retry_backoff),
+            'INCREMENTAL_RECOMMEND': bool(self.incremental_recommend),
+            'SYNC_DIFFS': bool(self.sync_diffs),
+        }
+
+    @property
+    def config_hash(self):
+        config = json.dumps([self.engine, self.driver_settings], sort_keys=True)
+        return hashlib.sha1(config.encode('utf-8')).hexdigest()
+
+    def build_driver(self):
+        driver = _load_engine_driver_cls(self.engine)
+        return driver(**self.driver_settings)
+
     @property
     def engine_driver(self):
-        if not self.DRIVER:
-            driver = _load_cls_from_applicable_module('module.engines', self.engine, class_startswith='Engine')
-            # NOTE(idegtiarov) Currently, statement coves existent engines modules. Improve in case new engine will be
-            # added to the engines package.
-            if self.engine.endswith('mock'):
-                engine_driver = driver()
-            else:
-                engine_driver = driver(**{'HOST': self.host, 'TOKEN': self.token})
-            self.DRIVER = engine_driver
-        return self.DRIVER
+        """
+        Return engine driver instance shared within the process, see `module.engines.registry`.
+        """
+        return engine_drivers.get(self)
+
+    @property
+    def breaker(self):
+        """
+        Return circuit breaker of the engine, see `module.engines.circuit_breaker`.
+        """
+        return CircuitBreaker(self.id)
 
     @property
     def lti_params(self):
         return (param.strip() for param in self.lti_parameters.split(','))
 
 
+@receiver([post_save, post_delete], sender=Engine)
+def invalidate_engine_driver(sender, instance, **kwargs):
+    """
+    Post save and post delete signal handler for Engine model.
+
+    Drop registered engine driver, it is rebuilt with the updated configuration on the next usage.
+    """
+    engine_drivers.invalidate(instance.id)
+
+
+class EngineCollectionManifest(models.Model):
+    """
+    Content hashes of the Collection's Activities synchronized with the Engine.
+
+    Manifest is used to send only added, changed and removed activities to the engine, the whole collection is
+    synchronized if there is no manifest yet, engine configuration is changed or the engine rejects the diff.
+    """
+
+    engine = models.ForeignKey('Engine', related_name='collection_manifests', on_delete=models.CASCADE)
+    collection = models.ForeignKey('Collection', related_name='engine_manifests', on_delete=models.CASCADE)
+    hashes = JSONField(default=dict, blank=True)
+    manifest_hash = models.CharField(max_length=40)
+    config_hash = models.CharField(max_length=40)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('engine', 'collection')
+
+    def __str__(self):
+        return '<EngineCollectionManifest[{}]: {} - {}>'.format(self.id, self.engine_id, self.collection_id)
+
+    def diff(self, activities, hashes):
+        """
+        Return tuple of the added or changed activities' payloads and the removed activities' source_launch_urls.
+        """
+        changed = [
+            activity for activity in activities
+            if self.hashes.get(activity['source_launch_url']) != hashes[activity['source_launch_url']]
+        ]
+        removed = sorted(set(self.hashes) - set(hashes))
+        return changed, removed
+
+    @classmethod
+    def sync(cls, engine, collection, force=False):
+        """
+        Synchronize the Collection's Activities with the Engine and store the synchronized manifest.
+
+        :param engine: Engine instance
+        :param collection: Collection instance
+        :param force: boolean flag to send the whole collection even if the stored manifest is up to date, default is
+            False
+        :return: boolean flag, whether the collection is synchronized
+        """
+        activities, hashes = manifest.collection_manifest(collection)
+        new_hash = manifest.manifest_hash(hashes)
+        config_hash = engine.config_hash
+        driver = engine.engine_driver
+        synced = False
+        current = None if force else cls.objects.filter(engine=engine, collection=collection).first()
+        if current is not None and current.config_hash == config_hash:
+            if current.manifest_hash == new_hash:
+                log.debug("Collection {} is up to date on the {}.".format(collection, engine))
+                return True
+            changed, removed = current.diff(activities, hashes)
+            synced = driver.sync_collection_diff(collection, changed, removed, current.manifest_hash, new_hash)
+            if not synced:
+                log.info("Diff of the collection {} is not applied by the {}, collection is resynchronized.".format(
+                    collection, engine
+                ))
+        if not synced:
+            synced = driver.sync_collection_activities(collection)
+        if synced:
+            cls.objects.update_or_create(
+                engine=engine,
+                collection=collection,
+                defaults={'hashes': hashes, 'manifest_hash': new_hash, 'config_hash': config_hash},
+            )
+        else:
+            # NOTE(idegtiarov) state of the collection on the engine is unknown, it is fully synchronized next time
+            cls.objects.filter(engine=engine, collection=collection).delete()
+        return bool(synced)
+
+
 class CollectionOrder(HasLinkedSequenceMixin, OrderedModel):
 
     OPTIONS = (
@@ -343,6 +1025,10 @@ class CollectionOrder(HasLinkedSequenceMixin, OrderedModel):
         default=False, help_text="Add an optional NEXT button under the embedded unit."
     )
     congratulation_message = fields.BooleanField(default=False)
+    speculative_recommendation = fields.BooleanField(
+        default=False,
+        help_text=_("Request the next activity from the engine in background when student's answer is received."),
+    )
 
     order_with_respect_to = 'group'
 
@@ -487,7 +1173,7 @@ class Activity(OrderedModel):
                 data=self.get_research_data()
             )
         super().save(*args, **kwargs)
-        self.collection.save()
+        self.collection.activities_changed()
 
     def delete(self, *args, **kwargs):
         """Extension which sends notification to the Adaptive engine that Activity is deleted."""
@@ -496,7 +1182,7 @@ class Activity(OrderedModel):
             data=self.get_research_data()
         )
         super().delete(*args, **kwargs)
-        self.collection.save()
+        self.collection.activities_changed()
 
     @property
     def last_pre(self):
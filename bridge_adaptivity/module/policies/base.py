@@ -1,9 +1,5 @@
 from abc import ABCMeta, abstractmethod
 
-from django.db.models.aggregates import Count, Sum
-
-from bridge_lti.outcomes import update_lms_grades
-
 
 class BaseGradingPolicy(object, metaclass=ABCMeta):
     """
@@ -54,27 +50,19 @@ class BaseGradingPolicy(object, metaclass=ABCMeta):
 
         :return tuple([trials_count, points_earned])
         """
-        items_result = self.sequence.items.aggregate(
-            points_earned=Sum('score'), trials_count=Count('score')
-        )
-        return items_result['trials_count'], items_result['points_earned']
+        return self.sequence.trials_count, self.sequence.points_earned
 
     @property
     def grade(self):
         return self._calculate()
 
-    def _send_grade(self, with_request=False):
-        """Send grade to LMS system.
+    def send_grade(self):
+        """Schedule sending of the grade to LMS system.
 
-        Call update_lms_grades(self.context['request'], sequence=self.sequence)
+        Grade is sent by the celery task out of the request, see `GradePassback.defer`.
         """
-        if with_request:
-            update_lms_grades(self.context.get('request'), sequence=self.sequence)
-        else:
-            update_lms_grades(sequence=self.sequence)
-
-    def send_grade(self):
-        return self._send_grade()
+        from module.models import GradePassback
+        GradePassback.defer(self.sequence.id)
 
     def __str__(self):
         return self.public_name
@@ -0,0 +1,61 @@
+"""
+Memoization of the grades calculated during the request or the celery task.
+
+Grade of the sequence is requested several times while a single request is processed: for the web socket message,
+for the ui details and for the LMS update. Within the `grade_memoization` context the grade is calculated by the
+grading policy once and is reused until the sequence's score is changed.
+"""
+from contextlib import ContextDecorator
+import threading
+
+_local = threading.local()
+
+
+class grade_memoization(ContextDecorator):
+    """
+    Context manager and decorator which enables grades memoization in the current thread.
+
+    Nested contexts share the memo of the outermost one, memo is dropped when the outermost context is exited.
+    """
+
+    def __enter__(self):
+        _local.depth = getattr(_local, 'depth', 0) + 1
+        if _local.depth == 1:
+            _local.grades = {}
+        return self
+
+    def __exit__(self, *exc):
+        _local.depth -= 1
+        if not _local.depth:
+            _local.grades = None
+        return False
+
+
+def memoize_grade(sequence_id, policy_id, calculate):
+    """
+    Return memoized grade or calculate and memoize it if memoization is enabled.
+
+    :param sequence_id: id of the graded Sequence
+    :param policy_id: id of the GradingPolicy the grade is calculated with
+    :param calculate: callable without arguments which calculates the grade
+    :return: grade
+    """
+    grades = getattr(_local, 'grades', None)
+    if grades is None or sequence_id is None:
+        return calculate()
+    key = (sequence_id, policy_id)
+    if key not in grades:
+        grades[key] = calculate()
+    return grades[key]
+
+
+def invalidate_grade(sequence_id):
+    """
+    Drop memoized grades of the sequence, should be called when the sequence's score is changed.
+
+    :param sequence_id: id of the Sequence
+    """
+    grades = getattr(_local, 'grades', None)
+    if grades:
+        for key in [key for key in grades if key[0] == sequence_id]:
+            del grades[key]
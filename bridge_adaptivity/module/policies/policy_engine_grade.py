@@ -24,18 +24,15 @@ class EngineGradedGradingPolicy(BaseGradingPolicy):
         """
         Send request to engine and get response with grade.
 
+        Sequence's scores queued for the engine are sent first, so the grade accounts the latest answer.
+
         :return: received grade from engine.
         """
+        from module.models import EngineSubmission
+        EngineSubmission.flush_sequence(self.sequence)
         return self.sequence.collection_order.engine.engine_driver.get_grade(self.sequence)
 
     @classmethod
     def get_form_class(cls):
         from module.forms import BaseGradingPolicyForm
         return BaseGradingPolicyForm
-
-    def send_grade(self):
-        """Send grade to LMS system.
-
-        :return: nothing.
-        """
-        self._send_grade(with_request=True)
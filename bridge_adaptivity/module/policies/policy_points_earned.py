@@ -1,6 +1,3 @@
-from django.db.models.aggregates import Count, Sum
-from django.db.models.functions import Coalesce, Greatest
-
 from .base import BaseGradingPolicy
 
 
@@ -30,12 +27,9 @@ class PointsEarnedGradingPolicy(BaseGradingPolicy):
         :return tuple([trials_count, points_earned])
         """
         # Note(idegtiarov) With the first non-problem activity in the sequence and default value of the threshold
-        # item_result returns None, 0 which are not appropriate for the grade calculation method, valid default values
-        # are provided to fix this issue.
-        items_result = self.sequence.items.exclude(is_problem=False).aggregate(
-            points_earned=Coalesce(Sum('score'), 0), trials_count=Greatest(Count('score'), 1)
-        )
-        return items_result['trials_count'], items_result['points_earned']
+        # trials count is 0 which is not appropriate for the grade calculation method, valid default value is provided
+        # to fix this issue.
+        return max(self.sequence.problem_trials_count, 1), self.sequence.problem_points_earned
 
     def _calculate(self):
         trials_count, points_earned = self._get_points_earned_trials_count()
@@ -45,10 +39,3 @@ class PointsEarnedGradingPolicy(BaseGradingPolicy):
     def get_form_class(cls):
         from module.forms import ThresholdGradingPolicyForm
         return ThresholdGradingPolicyForm
-
-    def send_grade(self):
-        """Send grade to LMS system.
-
-        :return: nothing.
-        """
-        self._send_grade(with_request=True)
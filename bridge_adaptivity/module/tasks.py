@@ -1,6 +1,17 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import datetime
 from logging import getLogger
 
 from celery.task import task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+
+from bridge_lti.outcomes import update_lms_grades
+from module.policies.memoization import grade_memoization
 
 
 log = getLogger(__name__)
@@ -8,15 +19,28 @@ log = getLogger(__name__)
 
 @task()
 def sync_collection_engines(collection_slug=None, created_at=None):
-    from module.models import Collection, CollectionOrder
-    collection = Collection.objects.filter(slug=collection_slug, updated_at=created_at).first()
+    """
+    Synchronize the collection's activities with the engines.
+
+    Scheduled sync is postponed while the collection is being changed, see `Collection.schedule_sync`. Immediate sync
+    of the collection's version updated at `created_at` is done if the collection isn't changed since, it sends the
+    whole collection to the engines regardless of the stored manifests.
+    """
+    from module.models import Collection, CollectionOrder, EngineCollectionManifest
+    if created_at is None:
+        if Collection.postpone_sync(collection_slug):
+            return
+        collection = Collection.objects.filter(slug=collection_slug).first()
+    else:
+        collection = Collection.objects.filter(slug=collection_slug, updated_at=created_at).first()
     if not collection:
         return
     sync_result = {}
     for coll_collection_order in CollectionOrder.objects.filter(collection=collection).select_related('engine'):
         try:
-            coll_collection_order.engine.engine_driver.sync_collection_activities(collection)
-            result = {'success': True}
+            result = {'success': EngineCollectionManifest.sync(
+                coll_collection_order.engine, collection, force=created_at is not None
+            )}
         except Exception as err:
             result = {'success': False, 'message': str(err)}
         sync_result[coll_collection_order.engine.engine_name] = result
@@ -25,9 +49,207 @@ def sync_collection_engines(collection_slug=None, created_at=None):
 
 @task()
 def update_students_grades(collection_order_slug=None):
+    """
+    Send students' grades of the collection order to the LMS.
+
+    Sequences are grouped by the LMS and split into chunks, every chunk is sent by the separate task.
+    """
     from module.models import CollectionOrder
+    from module.utils import start_grades_update_progress
     collection_order = CollectionOrder.objects.get(slug=collection_order_slug)
-    for sequence in collection_order.sequence_set.all():
-        if sequence.lis_result_sourcedid:
-            collection_order.grading_policy.policy_instance(sequence=sequence).send_grade()
-            log.debug(f"Grade update is sent for the user {sequence.lti_user}")
+    sequences = collection_order.sequence_set.filter(
+        lis_result_sourcedid__isnull=False, outcome_service__isnull=False,
+    ).exclude(lis_result_sourcedid='').order_by('id').values_list('id', 'outcome_service__lms_lti_connection_id')
+    lms_sequences = defaultdict(list)
+    for sequence_id, lms_id in sequences:
+        lms_sequences[lms_id].append(sequence_id)
+    start_grades_update_progress(collection_order_slug, sum(len(ids) for ids in lms_sequences.values()))
+
+    chunk_size = settings.GRADE_PASSBACK_CHUNK_SIZE
+    for sequence_ids in lms_sequences.values():
+        for start in range(0, len(sequence_ids), chunk_size):
+            update_sequences_grades.delay(
+                collection_order_slug=collection_order_slug, sequence_ids=sequence_ids[start:start + chunk_size]
+            )
+    log.debug(f"Grades update of the {collection_order} is split between {len(lms_sequences)} LMS.")
+
+
+def _send_sequence_grade(sequence, grade, lms_platform):
+    """
+    Send the grade to the LMS, it is called in the pool's thread and should not touch the database.
+
+    Sequence's related objects and the LMS platform are prefetched, thread's DB connection is closed anyway, so it isn't
+    left open if the database is touched.
+
+    :return: tuple with the boolean flag shows if LMS accepted the grade, the error description and LMS status
+    """
+    try:
+        lms_response = update_lms_grades(
+            sequence=sequence, score=grade, use_ledger=False, lms_platform=lms_platform
+        )
+    except Exception as err:
+        log.exception(f"Cannot send grade of the {sequence} to the LMS.")
+        return False, str(err), ''
+    finally:
+        connection.close()
+    if lms_response is None:
+        return False, 'Outcome service is not found.', ''
+    if lms_response.is_success():
+        return True, '', lms_response.code_major
+    return False, lms_response.description or 'LMS declined the grade.', lms_response.code_major or ''
+
+
+@task()
+@grade_memoization()
+def update_sequences_grades(collection_order_slug=None, sequence_ids=None):
+    """
+    Send grades of the chunk of the sequences to the LMS.
+
+    Grades which are already accepted by the LMS are skipped, others are sent concurrently by the bounded pool.
+    """
+    from module.models import GradePassback, Sequence
+    from module.utils import update_grades_update_progress
+    sequences = Sequence.objects.filter(id__in=sequence_ids or []).select_related(
+        'collection_order__grading_policy', 'collection_order__engine', 'collection_order__collection',
+        'outcome_service__lms_lti_connection', 'lti_user__lti_lms_platform', 'grade_passback',
+    )
+    grades = []
+    sent_count = skipped = failed = 0
+    for sequence in sequences:
+        try:
+            grade = sequence.collection_order.grading_policy.calculate_grade(sequence)
+        except Exception as err:
+            log.exception(f"Cannot calculate grade of the {sequence}.")
+            GradePassback.record(sequence, None, sent=False, error=str(err))
+            failed += 1
+            continue
+        if GradePassback.is_sent(sequence, grade):
+            skipped += 1
+        else:
+            grades.append((sequence, grade, sequence.outcome_service.lms_lti_connection))
+
+    with ThreadPoolExecutor(max_workers=settings.GRADE_PASSBACK_CONCURRENCY) as executor:
+        results = list(executor.map(lambda sequence_grade: _send_sequence_grade(*sequence_grade), grades))
+    for (sequence, grade, _), (sent, error, lms_status) in zip(grades, results):
+        GradePassback.record(sequence, grade, sent=sent, error=error, lms_status=lms_status)
+        if sent:
+            sent_count += 1
+        else:
+            failed += 1
+    update_grades_update_progress(collection_order_slug, sent=sent_count, skipped=skipped, failed=failed)
+    log.debug(f"Grades update chunk is processed: sent {sent_count}, skipped {skipped}, failed {failed}.")
+
+
+@task()
+@grade_memoization()
+def send_sequence_grade(sequence_id=None, attempt=1):
+    """
+    Send the latest grade of the sequence to the LMS.
+
+    Grade which is not accepted by the LMS (failed or still processing) is resent with the exponential backoff, after
+    the last attempt it is moved to the dead letters.
+    """
+    from module.models import GradeDeadLetter, GradePassback, Sequence
+    cache.delete(GradePassback.DEFERRED_KEY.format(sequence_id))
+    sequence = Sequence.objects.filter(id=sequence_id).select_related(
+        'collection_order__grading_policy', 'outcome_service__lms_lti_connection', 'lti_user',
+    ).first()
+    if not sequence or not sequence.lis_result_sourcedid:
+        return
+    grade = sequence.collection_order.grading_policy.calculate_grade(sequence)
+    try:
+        lms_response = update_lms_grades(sequence=sequence, score=grade)
+    except Exception as err:
+        log.exception(f"Cannot send grade of the {sequence} to the LMS.")
+        GradePassback.record(sequence, grade, sent=False, error=str(err))
+        error, lms_status = str(err), ''
+    else:
+        if lms_response is None or lms_response.is_success():
+            return
+        error, lms_status = lms_response.description or '', lms_response.code_major or ''
+
+    if attempt < settings.GRADE_PASSBACK_MAX_ATTEMPTS:
+        countdown = settings.GRADE_PASSBACK_RETRY_DELAY * 2 ** (attempt - 1)
+        log.warning(f"Grade of the {sequence} is not accepted by the LMS ({lms_status}), retry in {countdown}s.")
+        GradePassback.defer(sequence_id, countdown=countdown, attempt=attempt + 1)
+    else:
+        log.error(f"Grade of the {sequence} is not accepted by the LMS after {attempt} attempts.")
+        GradeDeadLetter.objects.create(
+            sequence=sequence, grade=grade, attempts=attempt, lms_status=lms_status, error=error,
+        )
+
+
+@task()
+def flush_engine_submissions(engine_id=None):
+    """
+    Send pending scores to the adaptive engine in batches.
+
+    Sequences which have postponed failed submission are skipped until its next attempt, to keep the order of scores.
+    """
+    from module.models import Engine, EngineSubmission
+    cache.delete(EngineSubmission.FLUSH_SCHEDULED_KEY.format(engine_id))
+    lock_key = 'engine_submission:{}:flush_lock'.format(engine_id)
+    if not cache.add(lock_key, True, settings.ENGINE_SUBMISSION_FLUSH_LOCK_TIMEOUT):
+        # NOTE(idegtiarov) Queue is being flushed by another worker, try again in the next batch window.
+        EngineSubmission.schedule_flush(engine_id)
+        return
+    try:
+        engine = Engine.objects.filter(id=engine_id).first()
+        if not engine:
+            return
+        engine_driver = engine.engine_driver
+        pending = EngineSubmission.objects.filter(engine=engine, status=EngineSubmission.PENDING)
+        postponed_sequences = pending.filter(next_attempt_at__gt=timezone.now()).values('sequence_id')
+        submissions = list(
+            pending.exclude(sequence_id__in=postponed_sequences).select_related(
+                'sequence_item__activity', 'sequence_item__sequence__lti_user__lti_lms_platform',
+            ).order_by('id')
+        )
+        batch_size = settings.ENGINE_SUBMISSION_BATCH_SIZE
+        blocked_sequences = set()
+        for start in range(0, len(submissions), batch_size):
+            EngineSubmission.submit_batch(engine_driver, submissions[start:start + batch_size], blocked_sequences)
+
+        next_attempt = pending.filter(next_attempt_at__gt=timezone.now()).aggregate(
+            next_attempt=Min('next_attempt_at')
+        )['next_attempt']
+    finally:
+        cache.delete(lock_key)
+    if next_attempt:
+        countdown = max((next_attempt - timezone.now()).total_seconds(), 0)
+        EngineSubmission.schedule_flush(engine_id, countdown=countdown)
+
+
+@task()
+def sweep_engine_submissions():
+    """
+    Flush engines' queues which have overdue pending scores, e.g. if the scheduled flush task is lost.
+
+    Task is run periodically by the celery beat, see `CELERY_BEAT_SCHEDULE`.
+    """
+    from module.models import EngineSubmission
+    overdue = timezone.now() - datetime.timedelta(seconds=settings.ENGINE_SUBMISSION_SWEEP_INTERVAL)
+    engine_ids = EngineSubmission.objects.filter(
+        status=EngineSubmission.PENDING, next_attempt_at__lt=overdue
+    ).order_by().values_list('engine_id', flat=True).distinct()
+    for engine_id in engine_ids:
+        log.warning("Engine {} has overdue pending scores, its queue is flushed.".format(engine_id))
+        flush_engine_submissions.delay(engine_id=engine_id)
+
+
+@task()
+def prefetch_recommendation(sequence_id=None):
+    """
+    Compute the next activity recommendation for the sequence while student works on the current one.
+    """
+    from module.models import Sequence
+    from module.utils import stash_recommendation
+    sequence = Sequence.objects.filter(id=sequence_id, completed=False).select_related(
+        'collection_order__engine', 'collection_order__collection', 'lti_user__lti_lms_platform'
+    ).first()
+    if not sequence or not sequence.collection_order.speculative_recommendation:
+        return
+    try:
+        stash_recommendation(sequence)
+    except Exception:
+        log.exception("[Engine] Cannot prefetch activity recommendation for the sequence {}".format(sequence_id))
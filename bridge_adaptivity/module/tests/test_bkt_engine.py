@@ -0,0 +1,139 @@
+from django.core.cache import cache
+from django.test import TestCase
+from mock import patch
+
+from bridge_lti.models import LtiLmsPlatform, LtiUser
+from module.engines.engine_bkt import EngineBKT, parse_skills
+from module.models import (
+    Activity, BridgeUser, Collection, CollectionOrder, Engine, GradingPolicy, ModuleGroup, Sequence, SequenceItem
+)
+
+
+class TestBKTEngine(TestCase):
+    fixtures = ['gradingpolicy.json']
+
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    def setUp(self, mock_apply_async):
+        cache.clear()
+        self.user = BridgeUser.objects.create_user(username='test', password='test', email='test@me.com')
+        lms_platform = LtiLmsPlatform.objects.create(consumer_name='name', consumer_key='key', consumer_secret='secret')
+        lti_user = LtiUser.objects.create(
+            user_id='some_user', course_id='some_course', email=self.user.email, lti_lms_platform=lms_platform,
+            bridge_user=self.user
+        )
+        self.collection = Collection.objects.create(name='col1', owner=self.user)
+        self.engine = Engine.objects.create(engine='engine_bkt', engine_name='BKT')
+        self.collection_order = CollectionOrder.objects.create(
+            group=ModuleGroup.objects.create(name='TestColGroup', owner=self.user),
+            collection=self.collection,
+            engine=self.engine,
+            grading_policy=GradingPolicy.objects.get(name='points_earned'),
+        )
+        self.sequence = Sequence.objects.create(lti_user=lti_user, collection_order=self.collection_order)
+        self.activities = {}
+        for name, atype, tags, repetition in (
+            ('pre', 'A', '', 1),
+            ('add', 'G', 'Addition', 3),
+            ('mul', 'G', 'multiplication, addition', 3),
+            ('untagged', 'G', '', 1),
+            ('post', 'Z', '', 1),
+        ):
+            self.activities[name] = Activity.objects.create(
+                name=name, collection=self.collection, atype=atype, tags=tags, stype='problem', repetition=repetition,
+                source_launch_url='http://source.url/{}'.format(name),
+            )
+        self.collection.refresh_from_db()
+        self.driver = self.engine.engine_driver
+
+    def select(self):
+        sequence = Sequence.objects.select_related('collection_order__collection').get(id=self.sequence.id)
+        return self.driver.select_activity(sequence).get('source_launch_url')
+
+    def answer(self, name, score, submit=True):
+        item = SequenceItem.objects.create(sequence=self.sequence, activity=self.activities[name], score=score)
+        item = SequenceItem.objects.get(id=item.id)
+        if submit:
+            self.assertTrue(self.driver.submit_activity_answer(item))
+        return item
+
+    def get_mastery(self):
+        sequence = Sequence.objects.get(id=self.sequence.id)
+        index = self.driver.get_skills_index(self.collection)
+        return dict(zip(index['skills'], self.driver.get_mastery(sequence, index)))
+
+    def test_parse_skills(self):
+        self.assertEqual(parse_skills(' Addition, multiplication,,addition '), ['addition', 'multiplication'])
+        self.assertEqual(parse_skills(None), [])
+
+    def test_skills_index(self):
+        self.assertTrue(self.driver.sync_collection_activities(self.collection))
+        index = self.driver.get_skills_index(self.collection)
+        self.assertEqual(index['skills'], ['addition', 'multiplication'])
+        self.assertEqual(index['skill_activities'], [
+            [self.activities['add'].id, self.activities['mul'].id], [self.activities['mul'].id]
+        ])
+        self.assertEqual(index['A'], [self.activities['pre'].id])
+
+    def test_select_activity(self):
+        self.assertEqual(self.engine.driver_settings, {})
+        self.assertIsInstance(self.driver, EngineBKT)
+        self.assertEqual(self.select(), self.activities['pre'].source_launch_url)
+        self.answer('pre', 1)
+        self.assertEqual(self.select(), self.activities['add'].source_launch_url)
+        self.answer('add', 1)
+        self.answer('add', 1)
+        mastery = self.get_mastery()
+        self.assertGreater(mastery['addition'], mastery['multiplication'])
+        self.assertEqual(self.select(), self.activities['mul'].source_launch_url)
+        for _ in range(3):
+            self.answer('mul', 1)
+        mastery = self.get_mastery()
+        self.assertGreater(mastery['addition'], 0.95)
+        self.assertGreater(mastery['multiplication'], 0.95)
+        # NOTE(idegtiarov) all skills are mastered, untagged activity is not selected
+        self.assertEqual(self.select(), self.activities['post'].source_launch_url)
+
+    def test_mastery_is_traced_from_answers(self):
+        self.answer('add', 0)
+        self.assertEqual(bytes(Sequence.objects.get(id=self.sequence.id).skill_mastery), b'')
+        mastery = self.get_mastery()
+        item = self.answer('mul', 1)
+        traced = self.get_mastery()
+        self.assertLess(mastery['addition'], 0.2)
+        self.assertGreater(traced['addition'], mastery['addition'])
+        # NOTE(idegtiarov) already traced answer submitted again doesn't change mastery
+        self.driver.submit_activity_answers([item])
+        self.assertEqual(self.get_mastery(), traced)
+
+    def test_rescored_answer_is_retraced(self):
+        item = self.answer('add', 0)
+        self.answer('mul', 1)
+        failed = self.get_mastery()
+        SequenceItem.objects.filter(id=item.id).update(score=1)
+        item.refresh_from_db()
+        self.assertTrue(self.driver.submit_activity_answer(item))
+        rescored = self.get_mastery()
+        self.assertGreater(rescored['addition'], failed['addition'])
+        # NOTE(idegtiarov) re-scored answer is found by the checksum even if it is not submitted yet
+        SequenceItem.objects.filter(id=item.id).update(score=0)
+        self.assertEqual(self.get_mastery(), failed)
+
+    def test_unsubmitted_answers_are_traced_on_selection(self):
+        self.answer('pre', 1)
+        self.assertEqual(self.select(), self.activities['add'].source_launch_url)
+        for _ in range(3):
+            self.answer('add', 1, submit=False)
+        self.assertGreater(self.get_mastery()['addition'], 0.95)
+        self.assertEqual(self.select(), self.activities['mul'].source_launch_url)
+        # NOTE(idegtiarov) answers traced on the selection are skipped by the submission
+        traced = self.get_mastery()
+        self.driver.submit_activity_answers(list(SequenceItem.objects.filter(sequence=self.sequence)))
+        self.assertEqual(self.get_mastery(), traced)
+
+    def test_mastery_is_kept_by_sequence_save(self):
+        self.get_mastery()
+        sequence = Sequence.objects.get(id=self.sequence.id)
+        packed = bytes(sequence.skill_mastery)
+        self.sequence.completed = True
+        self.sequence.save()
+        self.assertEqual(bytes(Sequence.objects.get(id=self.sequence.id).skill_mastery), packed)
@@ -0,0 +1,99 @@
+import io
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+import mock
+
+from bridge_lti.models import LtiLmsPlatform, LtiUser
+from module.engines.engine_mock import AVAILABILITY_KEY
+from module.management.commands.replay_engine_sequences import replay_sequence
+from module.models import (
+    Activity, BridgeUser, Collection, CollectionOrder, Engine, GradingPolicy, Log, ModuleGroup, Sequence, SequenceItem
+)
+
+
+class TestLoadTestLearnerFlow(TestCase):
+    @mock.patch('module.views.CallbackSequenceConsumer.send_message_to_channel')
+    def test_learner_flow_is_measured_and_rolled_back(self, mock_send_message):
+        stdout = io.StringIO()
+        call_command('load_test_learner_flow', learners=3, answers=2, activities=5, seed=1, stdout=stdout)
+        report = stdout.getvalue()
+        for step in ('launch', 'item', 'callback', 'next'):
+            self.assertRegex(report, r'\n{}\s+\d+'.format(step))
+        self.assertRegex(report, r'launch\s+3\s')
+        self.assertRegex(report, r'callback\s+6\s')
+        self.assertFalse(Sequence.objects.exists())
+        self.assertFalse(SequenceItem.objects.exists())
+
+
+class TestReplayEngineSequences(TestCase):
+    fixtures = ['gradingpolicy.json']
+
+    def setUp(self):
+        user = BridgeUser.objects.create_user(username='test', password='test')
+        lms_platform = LtiLmsPlatform.objects.create(consumer_name='name', consumer_key='key', consumer_secret='secret')
+        collection, = Collection.objects.bulk_create([Collection(name='col1', owner=user)])
+        activities = Activity.objects.bulk_create([
+            Activity(
+                name='activity {}'.format(number), collection=collection, stype='problem', order=number,
+                source_launch_url='http://source.url/{}'.format(number),
+            ) for number in range(3)
+        ])
+        collection_order = CollectionOrder.objects.create(
+            group=ModuleGroup.objects.create(name='group', owner=user),
+            collection=collection,
+            engine=Engine.objects.create(engine='engine_mock', engine_name='Mock'),
+            grading_policy=GradingPolicy.objects.get(name='points_earned'),
+        )
+        for number in range(2):
+            sequence = Sequence.objects.create(
+                lti_user=LtiUser.objects.create(user_id='user {}'.format(number), lti_lms_platform=lms_platform),
+                collection_order=collection_order,
+            )
+            for position, activity in enumerate(activities, start=1):
+                item = SequenceItem.objects.create(sequence=sequence, activity=activity, position=position, score=1)
+                Log.objects.create(sequence_item=item, log_type=Log.SUBMITTED, answer=True)
+
+    def test_sequences_are_replayed_and_rolled_back(self):
+        sequences, items, engines = Sequence.objects.count(), SequenceItem.objects.count(), Engine.objects.count()
+        stdout = io.StringIO()
+        call_command('replay_engine_sequences', engine='engine_irt', stdout=stdout)
+        report = stdout.getvalue()
+        self.assertRegex(report, r'select\s+8\s')
+        self.assertRegex(report, r'submit\s+6\s')
+        self.assertIn('Sequences: 2, steps: 6, skipped items: 0, engine errors: 0.', report)
+        self.assertIn('after its end in 100.0% of sequences', report)
+        self.assertEqual(
+            (Sequence.objects.count(), SequenceItem.objects.count(), Engine.objects.count()),
+            (sequences, items, engines),
+        )
+
+    def test_replayed_sequences_state_is_dropped(self):
+        cache.clear()
+        with mock.patch(
+            'module.management.commands.replay_engine_sequences.replay_sequence', wraps=replay_sequence
+        ) as mock_replay:
+            call_command('replay_engine_sequences', engine='engine_mock', stdout=io.StringIO())
+        self.assertEqual(mock_replay.call_count, 2)
+        for (_, shadow, *_), _ in mock_replay.call_args_list:
+            self.assertIsNone(cache.get(AVAILABILITY_KEY.format(shadow.id)))
+
+    def test_replay_with_configured_engine(self):
+        stdout = io.StringIO()
+        call_command('replay_engine_sequences', engine_id=Engine.objects.get().id, limit=1, stdout=stdout)
+        self.assertIn('Sequences: 1, steps: 3', stdout.getvalue())
+
+    def test_remote_engine_is_replayed_against_host(self):
+        engine = Engine.objects.create(engine='engine_vpal', engine_name='VPAL', host='https://vpal.example.com/')
+        with self.assertRaisesRegex(CommandError, 'vpal.example.com'):
+            call_command('replay_engine_sequences', engine_id=engine.id, stdout=io.StringIO())
+        stdout = io.StringIO()
+        with mock.patch('module.management.commands.replay_engine_sequences.replay_sequence') as mock_replay:
+            call_command(
+                'replay_engine_sequences', engine_id=engine.id, host='http://127.0.0.1:8010/', stdout=stdout
+            )
+        driver = mock_replay.call_args[0][0]
+        self.assertEqual(driver.host, 'http://127.0.0.1:8010/')
+        self.assertEqual(mock_replay.call_count, 2)
@@ -1,14 +1,21 @@
 from ddt import data, ddt, unpack
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings, TestCase
 from django.test.client import RequestFactory
+from django.urls import reverse
+from lti import OutcomeRequest
 import mock
 import pytest
 
 from bridge_lti.models import LtiLmsPlatform, OutcomeService
+from bridge_lti.outcomes import update_lms_grades
+from module import tasks
 from module.models import (
-    Activity, BridgeUser, Collection, CollectionOrder, Engine, GRADING_POLICY_NAME_TO_CLS, GradingPolicy, LtiUser,
-    ModuleGroup, Sequence, SequenceItem
+    Activity, BridgeUser, Collection, CollectionOrder, Engine, GradeDeadLetter, GradePassback,
+    GRADING_POLICY_NAME_TO_CLS, GradingPolicy, LtiUser, ModuleGroup, Sequence, SequenceItem
 )
+from module.policies.memoization import grade_memoization
 from module.policies.policy_full_credit import FullCreditOnCompleteGradingPolicy
 from module.policies.policy_points_earned import PointsEarnedGradingPolicy
 from module.policies.policy_trials_count import TrialsCountGradingPolicy
@@ -295,8 +302,8 @@ class TestPolicySendGradeMethod(TestCase):
             outcome_service=self.outcome_service
         )
 
-    @mock.patch('module.policies.base.update_lms_grades')
-    def test_send_grade_method_policy_points_earned(self, mock_update_lms_grades):
+    @mock.patch('module.models.GradePassback.defer')
+    def test_send_grade_method_policy_points_earned(self, mock_defer):
         """Test policy.send_grade method for policy PointsEarned."""
         request = self.rf.get('/')
         policy_model = GradingPolicy.objects.get(name='points_earned')
@@ -305,25 +312,19 @@ class TestPolicySendGradeMethod(TestCase):
             request=request,
             user_id=self.lti_user.user_id
         )
-        default_kw = {
-            'sequence': self.sequence,
-        }
         policy.send_grade()
-        mock_update_lms_grades.assert_called_with(*(request,), **default_kw)
+        mock_defer.assert_called_with(self.sequence.id)
 
-    @mock.patch('module.policies.base.update_lms_grades')
-    def test_send_grade_method_policies_trials_count_full_credit(self, mock_update_lms_grades):
+    @mock.patch('module.models.GradePassback.defer')
+    def test_send_grade_method_policies_trials_count_full_credit(self, mock_defer):
         """Test policy.send_grade method for policies TrialsCount and FullCreditOnComplete."""
         for policy_model in GradingPolicy.objects.filter(name__in=['trials_count', 'full_credit']):
             policy = policy_model.policy_instance(
                 sequence=self.sequence,
                 user_id=self.lti_user.user_id
             )
-            default_kw = {
-                'sequence': self.sequence,
-            }
             policy.send_grade()
-            mock_update_lms_grades.assert_called_with(**default_kw)
+            mock_defer.assert_called_with(self.sequence.id)
 
 
 class TestPolicyCalculateMethod(TestPolicySendGradeMethod):
@@ -361,3 +362,110 @@ class TestPolicyCalculateMethod(TestPolicySendGradeMethod):
         SequenceItem.objects.create(sequence=self.sequence, activity=self.activity2, position=3, score=0)
         grade = policy._calculate()
         self.assertEqual(.5, grade)
+
+
+class TestGradeMemoization(TestPolicySendGradeMethod):
+
+    def setUp(self):
+        super().setUp()
+        self.sequence_item = SequenceItem.objects.create(sequence=self.sequence, activity=self.activity2)
+
+    @mock.patch.object(TrialsCountGradingPolicy, '_calculate', return_value=0.5)
+    def test_grade_is_memoized_until_score_is_changed(self, mock_calculate):
+        with grade_memoization():
+            self.grading_policy.calculate_grade(self.sequence)
+            self.grading_policy.calculate_grade(self.sequence)
+            self.assertEqual(mock_calculate.call_count, 1)
+            self.sequence_item.score = 1
+            self.sequence_item.save()
+            self.grading_policy.calculate_grade(self.sequence)
+            self.assertEqual(mock_calculate.call_count, 2)
+        self.grading_policy.calculate_grade(self.sequence)
+        self.assertEqual(mock_calculate.call_count, 3)
+
+    @mock.patch('module.models.GradePassback.defer')
+    @mock.patch('module.views.CallbackSequenceConsumer.send_message_to_channel')
+    @mock.patch.object(TrialsCountGradingPolicy, '_calculate', return_value=0.5)
+    def test_callback_calculates_grade_once(self, mock_calculate, mock_send_message, mock_defer):
+        self.collection_order.ui_option = ['EP']
+        self.collection_order.save()
+        self.sequence.lis_result_sourcedid = 'test_sourcedid'
+        self.sequence.save()
+        xml = OutcomeRequest({
+            'operation': 'replaceResult',
+            'score': 1,
+            'lis_result_sourcedid': f'{self.sequence_item.id}:test_user_id:activity:suffix',
+            'message_identifier': 'test_message',
+        }).generate_request_xml()
+
+        response = self.client.post(reverse('module:sequence-item-grade'), xml, content_type='application/xml')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_calculate.call_count, 1)
+        mock_send_message.assert_called_once()
+        # Grade is sent to the LMS out of the request
+        mock_defer.assert_called_once_with(self.sequence.id)
+
+
+class TestGradePassbackLedger(TestPolicySendGradeMethod):
+
+    def setUp(self):
+        super().setUp()
+        self.sequence.lis_result_sourcedid = 'test_sourcedid'
+        self.sequence.save()
+        cache.delete(GradePassback.DEFERRED_KEY.format(self.sequence.id))
+
+    @mock.patch('bridge_lti.outcomes.OutcomeRequest')
+    def test_accepted_grade_is_not_posted(self, mock_outcome_request):
+        outcome_request = mock_outcome_request.return_value
+        outcome_request.outcome_response.is_success.return_value = True
+        outcome_request.outcome_response.code_major = 'success'
+
+        update_lms_grades(sequence=self.sequence, score=0.5)
+        outcome_request.post_replace_result.assert_called_once_with(0.5)
+        passback = GradePassback.objects.get(sequence=self.sequence)
+        self.assertEqual((passback.grade, passback.status, passback.lms_status), (0.5, GradePassback.SENT, 'success'))
+
+        self.assertIsNone(update_lms_grades(sequence=self.sequence, score=0.5))
+        self.assertEqual(outcome_request.post_replace_result.call_count, 1)
+
+    @override_settings(GRADE_PASSBACK_MAX_ATTEMPTS=2)
+    @mock.patch('module.tasks.send_sequence_grade.apply_async')
+    @mock.patch('bridge_lti.outcomes.OutcomeRequest')
+    def test_not_accepted_grade_is_retried(self, mock_outcome_request, mock_apply_async):
+        outcome_response = mock_outcome_request.return_value.outcome_response
+        outcome_response.is_success.return_value = False
+        outcome_response.code_major = 'processing'
+        outcome_response.description = 'Grade is being processed'
+
+        with mock.patch('module.models.transaction.on_commit', side_effect=lambda func: func()):
+            # Burst of the grade changes is sent by the single task
+            GradePassback.defer(self.sequence.id)
+            GradePassback.defer(self.sequence.id)
+            mock_apply_async.assert_called_once_with(
+                kwargs={'sequence_id': self.sequence.id, 'attempt': 1},
+                countdown=settings.GRADE_PASSBACK_DEBOUNCE_WINDOW,
+            )
+            tasks.send_sequence_grade(sequence_id=self.sequence.id)
+            mock_apply_async.assert_called_with(
+                kwargs={'sequence_id': self.sequence.id, 'attempt': 2}, countdown=settings.GRADE_PASSBACK_RETRY_DELAY
+            )
+            self.assertEqual(GradePassback.objects.get(sequence=self.sequence).status, GradePassback.FAILED)
+
+            tasks.send_sequence_grade(sequence_id=self.sequence.id, attempt=2)
+        self.assertEqual(mock_apply_async.call_count, 2)
+        dead_letter = GradeDeadLetter.objects.get(sequence=self.sequence)
+        self.assertEqual((dead_letter.grade, dead_letter.attempts, dead_letter.lms_status), (0.0, 2, 'processing'))
+
+    @mock.patch('module.tasks.send_sequence_grade.apply_async')
+    def test_rolled_back_grade_change_is_not_deferred(self, mock_apply_async):
+        with mock.patch('module.models.transaction.on_commit') as mock_on_commit:
+            GradePassback.defer(self.sequence.id)
+        # NOTE(idegtiarov) transaction is rolled back, so the registered callback is never called
+        mock_on_commit.assert_called_once()
+        mock_apply_async.assert_not_called()
+        self.assertIsNone(cache.get(GradePassback.DEFERRED_KEY.format(self.sequence.id)))
+
+        with mock.patch('module.models.transaction.on_commit', side_effect=lambda func: func()):
+            GradePassback.defer(self.sequence.id)
+        mock_apply_async.assert_called_once()
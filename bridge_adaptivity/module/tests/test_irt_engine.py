@@ -0,0 +1,119 @@
+from django.core.cache import cache
+from django.test import TestCase
+from mock import patch
+
+from bridge_lti.models import LtiLmsPlatform, LtiUser
+from module.engines import engine_irt
+from module.engines.engine_irt import CollectionItems, EngineIRT
+from module.models import (
+    Activity, BridgeUser, Collection, CollectionOrder, Engine, GradingPolicy, ModuleGroup, Sequence, SequenceItem
+)
+
+
+class TestIRTEngine(TestCase):
+    fixtures = ['gradingpolicy.json']
+
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    def setUp(self, mock_apply_async):
+        cache.clear()
+        self.user = BridgeUser.objects.create_user(username='test', password='test', email='test@me.com')
+        lms_platform = LtiLmsPlatform.objects.create(consumer_name='name', consumer_key='key', consumer_secret='secret')
+        lti_user = LtiUser.objects.create(
+            user_id='some_user', course_id='some_course', email=self.user.email, lti_lms_platform=lms_platform,
+            bridge_user=self.user
+        )
+        self.collection = Collection.objects.create(name='col1', owner=self.user)
+        self.engine = Engine.objects.create(engine='engine_irt', engine_name='IRT')
+        self.collection_order = CollectionOrder.objects.create(
+            group=ModuleGroup.objects.create(name='TestColGroup', owner=self.user),
+            collection=self.collection,
+            engine=self.engine,
+            grading_policy=GradingPolicy.objects.get(name='points_earned'),
+        )
+        self.sequence = Sequence.objects.create(lti_user=lti_user, collection_order=self.collection_order)
+        self.activities = {}
+        for name, atype, difficulty in (
+            ('pre', 'A', 0.5), ('easy', 'G', 0.1), ('medium', 'G', 0.5), ('hard', 'G', 0.9), ('post', 'Z', 0.5)
+        ):
+            self.activities[name] = Activity.objects.create(
+                name=name, collection=self.collection, atype=atype, difficulty=difficulty, stype='problem',
+                source_launch_url='http://source.url/{}'.format(name),
+            )
+        self.collection.refresh_from_db()
+        self.driver = self.engine.engine_driver
+
+    def select(self):
+        sequence = Sequence.objects.select_related('collection_order__collection').get(id=self.sequence.id)
+        return self.driver.select_activity(sequence).get('source_launch_url')
+
+    def answer(self, name, score, submit=False):
+        item = SequenceItem.objects.create(sequence=self.sequence, activity=self.activities[name], score=score)
+        if submit:
+            self.driver.submit_activity_answer(item)
+        return item
+
+    def get_ability(self):
+        items = self.driver.get_collection_items(self.collection)
+        return self.driver.get_ability(
+            self.sequence, items, list(self.sequence.items.values_list('id', 'activity_id', 'score', 'is_problem'))
+        )
+
+    def test_engine_driver(self):
+        self.assertIsInstance(self.driver, EngineIRT)
+        self.assertEqual(self.engine.driver_settings, {})
+
+    def test_select_activity(self):
+        # NOTE(idegtiarov) answers are submitted to the engine asynchronously, selection uses not submitted answers
+        self.assertEqual(self.select(), self.activities['pre'].source_launch_url)
+        self.answer('pre', 1)
+        self.assertEqual(self.select(), self.activities['medium'].source_launch_url)
+        self.answer('medium', 1)
+        # NOTE(idegtiarov) ability is above average after the correct answers, the hard activity is more informative
+        self.assertEqual(self.select(), self.activities['hard'].source_launch_url)
+        self.answer('hard', 0)
+        self.assertEqual(self.select(), self.activities['easy'].source_launch_url)
+        self.answer('easy', 1)
+        self.assertEqual(self.select(), self.activities['post'].source_launch_url)
+        self.answer('post', 1)
+        self.assertIsNone(self.select())
+
+    def test_ability_is_updated_incrementally(self):
+        pre = self.answer('pre', 1)
+        hard = self.answer('hard', 0)
+        ability = self.get_ability()
+        self.assertEqual(set(ability['scores']), {pre.id, hard.id})
+        self.assertGreater(ability['information'], 1)
+
+        # Submitted answer updates the stored estimate, it is equal to the estimate traced from all the answers
+        self.answer('easy', 1, submit=True)
+        submitted = cache.get(engine_irt.ABILITY_KEY.format(self.sequence.id))
+        self.assertEqual(len(submitted['scores']), 3)
+        cache.clear()
+        self.assertAlmostEqual(self.get_ability()['theta'], submitted['theta'], places=5)
+
+        # Re-scored answer is traced again with all the answers
+        hard.score = 1
+        hard.save()
+        rescored = self.get_ability()
+        self.assertEqual(rescored['scores'][hard.id], 1)
+        self.assertGreater(rescored['theta'], submitted['theta'])
+        self.driver.submit_activity_answer(hard)
+        self.assertEqual(cache.get(engine_irt.ABILITY_KEY.format(self.sequence.id)), rescored)
+
+    def test_collection_items(self):
+        items = CollectionItems(None, [
+            (7, 'G', 'url7', 0.5, 1.0, 2, True),
+            (3, 'G', 'url3', 0.9, 1.0, 1, True),
+            (5, 'A', 'url5', 0.5, 1.0, 1, False),
+        ])
+        self.assertEqual(items.taken_counts([7, 3, 7, 100]).tolist(), [2, 1, 0])
+        self.assertEqual(items.positions([5, 100, 7]).tolist(), [2, -1, 0])
+        information = items.information(0)
+        self.assertEqual(information[2], 0)
+        self.assertGreater(information[0], information[1])
+
+    def test_sync_collection_activities(self):
+        self.driver.get_collection_items(self.collection)
+        self.assertIn(self.collection.id, self.driver._collections)
+        self.assertTrue(self.driver.sync_collection_activities(self.collection))
+        self.assertNotIn(self.collection.id, self.driver._collections)
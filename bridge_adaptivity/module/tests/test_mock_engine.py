@@ -1,5 +1,6 @@
 # coding: utf-8
 from ddt import data, ddt, unpack
+from django.core.cache import cache
 from django.test import TestCase
 from mock.mock import patch
 
@@ -7,6 +8,7 @@ from bridge_lti.models import LtiLmsPlatform, LtiUser
 from module.models import (
     Activity, BridgeUser, Collection, CollectionOrder, Engine, GradingPolicy, ModuleGroup, Sequence, SequenceItem
 )
+from module.utils import select_next_sequence_item
 
 
 @ddt
@@ -94,3 +96,60 @@ class TestMockEngine(TestCase):
             self.assertTrue(selected_activity_url in source_launch_urls)
         else:
             self.assertEqual(selected_activity_url, er)
+
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    def test_availability_index(self, mock_apply_async):
+        cache.clear()
+        pre, generic, post = (
+            Activity.objects.create(
+                name='test_{}'.format(atype), collection=self.collection1, atype=atype, stype='problem',
+                source_launch_url='http://source.url/{}'.format(atype), repetition=2 if atype == 'G' else 1,
+            ) for atype in ('A', 'G', 'Z')
+        )
+        sequence = Sequence.objects.select_related('collection_order__collection', 'collection_order__engine').get(
+            id=self.sequence.id
+        )
+        driver = self.engine.engine_driver
+        with self.assertNumQueries(1):
+            self.assertEqual(driver.select_activity(sequence), {'source_launch_url': pre.source_launch_url})
+        with self.assertNumQueries(0):
+            self.assertEqual(driver.select_activity(sequence), {'source_launch_url': pre.source_launch_url})
+
+        for activity, expected in ((pre, generic), (generic, generic), (generic, post), (post, None)):
+            # NOTE(idegtiarov) engine hook is called on the transaction commit which doesn't happen in the TestCase
+            with patch('module.models.transaction.on_commit', side_effect=lambda func: func()):
+                SequenceItem.objects.create(sequence=self.sequence, activity=activity)
+            with self.assertNumQueries(0):
+                selected = driver.select_activity(sequence)
+            self.assertEqual(selected.get('source_launch_url'), expected and expected.source_launch_url)
+        self.assertEqual(selected, {'complete': True})
+
+    @patch('module.models.transaction.on_commit', side_effect=lambda func: func())
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    def test_availability_index_of_changed_items(self, mock_apply_async, mock_on_commit):
+        cache.clear()
+        pre, generic, post = (
+            Activity.objects.create(
+                name='test_{}'.format(atype), collection=self.collection1, atype=atype, stype='problem',
+                source_launch_url='http://source.url/{}'.format(atype),
+            ) for atype in ('A', 'G', 'Z')
+        )
+        sequence = Sequence.objects.select_related('collection_order__collection', 'collection_order__engine').get(
+            id=self.sequence.id
+        )
+        driver = self.engine.engine_driver
+        first_item = SequenceItem.objects.create(sequence=sequence, activity=pre, position=1)
+        second_item = SequenceItem.objects.create(sequence=sequence, activity=generic, position=2)
+        self.assertEqual(driver.select_activity(sequence), {'source_launch_url': post.source_launch_url})
+
+        # Activity of the un-submitted item is updated with the post-assessment one
+        next_item, _, _ = select_next_sequence_item(first_item, update_activity=True, last_item=2, position=2)
+        self.assertEqual(next_item, second_item)
+        second_item.refresh_from_db()
+        self.assertEqual(second_item.activity, post)
+        self.assertEqual(driver.select_activity(sequence), {'source_launch_url': generic.source_launch_url})
+
+        second_item.delete()
+        self.assertEqual(driver.select_activity(sequence), {'source_launch_url': generic.source_launch_url})
+        first_item.delete()
+        self.assertEqual(driver.select_activity(sequence), {'source_launch_url': pre.source_launch_url})
@@ -1,6 +1,11 @@
+import io
+
 from ddt import data, ddt, unpack
-from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils.translation import ugettext_lazy as _
 from mock.mock import patch
 from multiselectfield.db.fields import MSFList
@@ -10,7 +15,7 @@ from module import models
 from module.engines.engine_mock import EngineMock
 from module.engines.engine_vpal import EngineVPAL
 from module.models import (
-    Activity, BridgeUser, Collection, CollectionOrder, ContributorPermission, Engine, GradingPolicy, ModuleGroup,
+    Activity, BridgeUser, Collection, CollectionOrder, ContributorPermission, Engine, GradingPolicy, Log, ModuleGroup,
     Sequence, SequenceItem
 )
 from module.policies.policy_full_credit import FullCreditOnCompleteGradingPolicy
@@ -28,8 +33,11 @@ class TestEngineUtilityFunction(TestCase):
     def test__discover_engines(self):
         """Test _discover_engines function."""
         found_engines = models._discover_applicable_modules(folder_name='engines', file_startswith='engine_')
-        self.assertEqual(len(found_engines), 2)
-        self.assertCountEqual([('engine_mock', 'mock'), ('engine_vpal', 'vpal')], found_engines)
+        self.assertEqual(len(found_engines), 4)
+        self.assertCountEqual(
+            [('engine_bkt', 'bkt'), ('engine_irt', 'irt'), ('engine_mock', 'mock'), ('engine_vpal', 'vpal')],
+            found_engines
+        )
 
     def test__get_engine_driver(self):
         """Test _get_engine_driver function."""
@@ -74,6 +82,33 @@ class TestEngineModel(TestCase):
         self.assertEqual(vpal_driver.host, host)
         self.assertEqual(vpal_driver.headers, {'Authorization': 'Token {}'.format(token)})
 
+    def test_engine_driver_connection_settings(self):
+        """Test VPAL driver is configured with the Engine's connection settings and shares the connection pool."""
+        engine_vpal = Engine.objects.create(
+            engine='engine_vpal', engine_name='VPAL', host='http://fake_host', token='fake_token', pool_size=3,
+            connect_timeout=1.5, read_timeout=7, max_retries=4,
+        )
+        vpal_driver = engine_vpal.engine_driver
+        self.assertEqual(vpal_driver.timeout, (1.5, 7))
+        adapter = vpal_driver.session.get_adapter(vpal_driver.base_url)
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertEqual(adapter.max_retries.total, 4)
+        self.assertIs(Engine.objects.get(id=engine_vpal.id).engine_driver.session, vpal_driver.session)
+
+    @patch('module.models._load_engine_driver_cls', wraps=models._load_engine_driver_cls)
+    def test_engine_driver_registry(self, mock_load_engine_driver_cls):
+        """Test engine driver is shared by Engine instances and rebuilt when Engine is changed."""
+        engine = Engine.objects.create(engine='engine_vpal', engine_name='VPAL', host='http://fake_host')
+        driver = engine.engine_driver
+        self.assertIs(Engine.objects.get(id=engine.id).engine_driver, driver)
+        mock_load_engine_driver_cls.assert_called_once_with('engine_vpal')
+
+        engine.host = 'http://new_fake_host'
+        engine.save()
+        new_driver = Engine.objects.get(id=engine.id).engine_driver
+        self.assertIsNot(new_driver, driver)
+        self.assertEqual(new_driver.host, 'http://new_fake_host')
+
 
 @ddt
 class TestDiscoverGradingPolicies(TestCase):
@@ -137,6 +172,7 @@ class TestActivityModel(TestCase):
 
     @patch('module.tasks.sync_collection_engines.apply_async')
     def setUp(self, mock_apply_async):
+        cache.clear()
         self.user = BridgeUser.objects.create_user(
             username='test',
             password='test',
@@ -217,13 +253,14 @@ class TestActivityModel(TestCase):
 
     @patch('module.tasks.sync_collection_engines.apply_async')
     def test_update_sequence_item_with_grade(self, mock_apply_async):
+        deadline_key = Collection.SYNC_DEADLINE_KEY.format(self.collection1.slug)
+        deadline = cache.get(deadline_key)
         activity = Activity.objects.create(
             name='test', collection=self.collection1, tags='test', atype='G', stype='problem'
         )
-        mock_apply_async.assert_called_once_with(
-            kwargs={'collection_slug': self.collection1.slug, 'created_at': self.collection1.updated_at},
-            countdown=settings.CELERY_DELAY_SYNC_TASK,
-        )
+        # NOTE(idegtiarov) sync of the collection is scheduled when the collection is created, its deadline is extended
+        mock_apply_async.assert_not_called()
+        self.assertGreaterEqual(cache.get(deadline_key), deadline)
         sequence_item = SequenceItem.objects.create(
             sequence=self.sequence,
             activity=activity,
@@ -233,6 +270,21 @@ class TestActivityModel(TestCase):
         # save() method is overloaded in the models, and we test that it works correctly
         self.assertEqual(sequence_item.score, 0.5)
 
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    def test_activity_change_bumps_collection_version(self, mock_apply_async):
+        activity = Activity.objects.create(name='test', collection=self.collection1, stype='problem')
+        version = Collection.objects.get(id=self.collection1.id).updated_at
+        logs = Log.objects.count()
+        activity.name = 'changed'
+        activity.save()
+        self.assertGreater(Collection.objects.get(id=self.collection1.id).updated_at, version)
+        # NOTE(idegtiarov) only the activity's change is logged
+        actions = Log.objects.order_by('id')[logs:].values_list('action', flat=True)
+        self.assertEqual(list(actions), [Log.ACTIVITY_UPDATED])
+        activity.delete()
+        self.assertEqual(Log.objects.order_by('-id').first().action, Log.ACTIVITY_DELETED)
+        mock_apply_async.assert_not_called()
+
 
 class TestCollectionGroupModel(TestCase):
     fixtures = ['gradingpolicy.json', 'engine.json']
@@ -380,6 +432,71 @@ class TestSequence(TestCase):
         details = self.sequence.sequence_ui_details()
         self.assertEqual(expected_result, details)
 
+    def assertAggregates(self, sequence, expected):
+        self.assertEqual({field: getattr(sequence, field) for field in Sequence.AGGREGATE_FIELDS}, expected)
+
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    def test_score_aggregates(self, mock_apply_async):
+        expected = {
+            'points_earned': 1.0,
+            'trials_count': 3,
+            'problem_points_earned': 0.6,
+            'problem_trials_count': 2,
+            'correct_count': 2,
+            'incorrect_count': 1,
+        }
+        self.assertAggregates(self.sequence, expected)
+        stale_sequence = Sequence.objects.get(id=self.sequence.id)
+        self.assertAggregates(stale_sequence, expected)
+
+        self.sequence_item_3.score = 1
+        self.sequence_item_3.save()
+        self.sequence_item_4.score = 0.5
+        self.sequence_item_4.save()
+        self.sequence_item_2.delete()
+        expected = {
+            'points_earned': 1.9,
+            'trials_count': 3,
+            'problem_points_earned': 0.5,
+            'problem_trials_count': 1,
+            'correct_count': 3,
+            'incorrect_count': 0,
+        }
+        self.assertAggregates(self.sequence, expected)
+        # Saving of the stale instance does not overwrite aggregates
+        stale_sequence.completed = True
+        stale_sequence.save()
+        self.assertAggregates(Sequence.objects.get(id=self.sequence.id), expected)
+
+        Sequence.objects.filter(id=self.sequence.id).update(points_earned=0, trials_count=0, correct_count=0)
+        call_command('rebuild_sequence_aggregates', stdout=io.StringIO())
+        self.assertAggregates(Sequence.objects.get(id=self.sequence.id), expected)
+
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    def test_score_aggregates_of_stale_item(self, mock_apply_async):
+        stale_item = SequenceItem.objects.get(id=self.sequence_item_1.id)
+        self.sequence_item_1.score = 1
+        self.sequence_item_1.save()
+        # Difference is counted from the stored score, not from the score the stale item is loaded with
+        stale_item.score = 0.7
+        stale_item.save()
+        for step in range(3):
+            self.sequence_item_4.score += 0.1
+            self.sequence_item_4.save()
+        sequence = Sequence.objects.get(id=self.sequence.id)
+        self.assertEqual((sequence.points_earned, sequence.problem_points_earned), (1.6, 0.9))
+        self.assertEqual((sequence.correct_count, sequence.incorrect_count), (3, 0))
+
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    def test_deleted_sequence_aggregates_are_not_updated(self, mock_apply_async):
+        sequence_id = self.sequence.id
+        with CaptureQueriesContext(connection) as queries:
+            self.sequence.delete()
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "module_sequence"')])
+        self.assertFalse(SequenceItem.objects.filter(id=self.sequence_item_1.id).exists())
+        # Mark of the deleted sequence doesn't outlive its deletion
+        self.assertNotIn(sequence_id, getattr(models._deleted_sequences, 'ids', ()))
+
 
 class TestContributorPermission(TestCase):
 
@@ -1,11 +1,20 @@
+import datetime
+
 from django.conf import settings
-from django.test import TestCase
-from mock import patch
+from django.core.cache import cache
+from django.test import override_settings, TestCase
+from django.utils import timezone
+from mock import Mock, patch
 
-from bridge_lti.models import BridgeUser, LtiLmsPlatform, LtiUser
+from bridge_lti.models import BridgeUser, LtiLmsPlatform, LtiUser, OutcomeService
 from module import tasks
-from module.models import Activity, Collection, CollectionOrder, Engine, GradingPolicy, ModuleGroup, Sequence
+from module.engines.interface import EngineInterface
+from module.models import (
+    Activity, Collection, CollectionOrder, Engine, EngineCollectionManifest, EngineSubmission, GradePassback,
+    GradingPolicy, ModuleGroup, Sequence, SequenceItem
+)
 from module.tasks import sync_collection_engines
+from module.utils import get_grades_update_progress, start_grades_update_progress
 
 
 class TestTask(TestCase):
@@ -32,14 +41,14 @@ class TestTask(TestCase):
         self.collection_group = ModuleGroup.objects.create(
             name='col_group', owner=self.user,
         )
+        cache.clear()
 
     @patch('module.tasks.sync_collection_engines.apply_async')
     @patch('module.engines.engine_mock.EngineMock.sync_collection_activities')
     def test_collection_engine_sync(self, mock_sync_collection_activities, mock_apply_async):
         collection = Collection.objects.create(name='test_col', owner=self.user)
         mock_apply_async.assert_called_once_with(
-            kwargs={'collection_slug': collection.slug, 'created_at': collection.updated_at},
-            countdown=settings.CELERY_DELAY_SYNC_TASK,
+            kwargs={'collection_slug': collection.slug}, countdown=settings.CELERY_DELAY_SYNC_TASK,
         )
 
         CollectionOrder.objects.create(
@@ -50,30 +59,316 @@ class TestTask(TestCase):
         )
 
         self.activity = Activity.objects.create(name='testA1', collection=collection)
-        mock_apply_async.assert_called_with(
-            kwargs={'collection_slug': collection.slug, 'created_at': collection.updated_at},
-            countdown=settings.CELERY_DELAY_SYNC_TASK,
-        )
+        # Sync is already pending
+        mock_apply_async.assert_called_once()
         sync_collection_engines(collection_slug=collection.slug, created_at=collection.updated_at)
         mock_sync_collection_activities.assert_called_once_with(collection)
 
+    @patch('module.models.time')
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    @patch('module.engines.engine_mock.EngineMock.sync_collection_activities')
+    def test_collection_engine_sync_debounce(self, mock_sync_collection_activities, mock_apply_async, mock_time):
+        delay = settings.CELERY_DELAY_SYNC_TASK
+        mock_time.time.return_value = 1000
+        collection = Collection.objects.create(name='test_col', owner=self.user)
+        CollectionOrder.objects.create(
+            group=self.collection_group,
+            collection=collection,
+            engine=self.engine,
+            grading_policy=self.grading_policy
+        )
+        mock_time.time.return_value = 1100
+        for index in range(3):
+            Activity.objects.create(name='testA{}'.format(index), collection=collection)
+        mock_apply_async.assert_called_once_with(kwargs={'collection_slug': collection.slug}, countdown=delay)
+
+        # Pending task is postponed to the deadline extended by the last change
+        mock_time.time.return_value = 1000 + delay
+        sync_collection_engines(collection_slug=collection.slug)
+        mock_sync_collection_activities.assert_not_called()
+        mock_apply_async.assert_called_with(kwargs={'collection_slug': collection.slug}, countdown=100)
+        self.assertEqual(mock_apply_async.call_count, 2)
+
+        # Collection isn't changed for the sync delay
+        mock_time.time.return_value = 1100 + delay
+        sync_collection_engines(collection_slug=collection.slug)
+        mock_sync_collection_activities.assert_called_once_with(collection)
+        self.assertEqual(mock_apply_async.call_count, 2)
+
+        # Change after the sync schedules the new task
+        Activity.objects.create(name='testA3', collection=collection)
+        self.assertEqual(mock_apply_async.call_count, 3)
+
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    @patch('module.engines.engine_mock.EngineMock.sync_collection_diff')
+    @patch('module.engines.engine_mock.EngineMock.sync_collection_activities')
+    def test_collection_engine_sync_manifest(self, mock_sync_collection_activities, mock_sync_diff, mock_apply_async):
+        collection = Collection.objects.create(name='test_col', owner=self.user)
+        a1 = Activity.objects.create(name='testA1', collection=collection, source_launch_url='test_url_1')
+        a2 = Activity.objects.create(name='testA2', collection=collection, source_launch_url='test_url_2')
+        mock_sync_collection_activities.return_value = True
+
+        # First synchronization sends the whole collection
+        self.assertTrue(EngineCollectionManifest.sync(self.engine, collection))
+        mock_sync_collection_activities.assert_called_once_with(collection)
+        manifest = EngineCollectionManifest.objects.get(engine=self.engine, collection=collection)
+        self.assertEqual(set(manifest.hashes), {'test_url_1', 'test_url_2'})
+
+        # Not changed collection isn't sent
+        self.assertTrue(EngineCollectionManifest.sync(self.engine, collection))
+        self.assertEqual(mock_sync_collection_activities.call_count, 1)
+        mock_sync_diff.assert_not_called()
+
+        # Only changed and removed activities are sent
+        a1.name = 'testA1 changed'
+        a1.save()
+        a2.delete()
+        a3 = Activity.objects.create(name='testA3', collection=collection, source_launch_url='test_url_3')
+        mock_sync_diff.return_value = True
+        self.assertTrue(EngineCollectionManifest.sync(self.engine, collection))
+        self.assertEqual(mock_sync_collection_activities.call_count, 1)
+        (_, activities, removed, base_hash, new_hash), _ = mock_sync_diff.call_args
+        self.assertEqual([activity['source_launch_url'] for activity in activities], ['test_url_1', 'test_url_3'])
+        self.assertEqual(removed, ['test_url_2'])
+        self.assertEqual(base_hash, manifest.manifest_hash)
+        manifest.refresh_from_db()
+        self.assertEqual(manifest.manifest_hash, new_hash)
+        self.assertEqual(set(manifest.hashes), {'test_url_1', 'test_url_3'})
+
+        # Rejected diff falls back to the full synchronization
+        a3.delete()
+        mock_sync_diff.return_value = False
+        self.assertTrue(EngineCollectionManifest.sync(self.engine, collection))
+        self.assertEqual(mock_sync_collection_activities.call_count, 2)
+        manifest.refresh_from_db()
+        self.assertEqual(set(manifest.hashes), {'test_url_1'})
+
+        # Manifest of the failed synchronization is dropped
+        Activity.objects.create(name='testA4', collection=collection, source_launch_url='test_url_4')
+        mock_sync_collection_activities.return_value = False
+        self.assertFalse(EngineCollectionManifest.sync(self.engine, collection))
+        self.assertFalse(EngineCollectionManifest.objects.filter(engine=self.engine, collection=collection).exists())
+
     @patch('module.tasks.sync_collection_engines.apply_async')
-    @patch('module.policies.base.BaseGradingPolicy.send_grade')
-    def test_update_students_grades(self, mock_send_grade, mock_apply_async):
+    @patch('module.engines.engine_mock.EngineMock.sync_collection_diff')
+    @patch('module.engines.engine_mock.EngineMock.sync_collection_activities')
+    def test_immediate_sync_of_unchanged_collection(
+        self, mock_sync_collection_activities, mock_sync_diff, mock_apply_async
+    ):
         collection = Collection.objects.create(name='test_col', owner=self.user)
+        CollectionOrder.objects.create(
+            group=self.collection_group, collection=collection, engine=self.engine, grading_policy=self.grading_policy
+        )
+        Activity.objects.create(name='testA1', collection=collection, source_launch_url='test_url_1')
+        mock_sync_collection_activities.return_value = True
+        self.assertTrue(EngineCollectionManifest.sync(self.engine, collection))
+        manifest = EngineCollectionManifest.objects.get(engine=self.engine, collection=collection)
+        EngineCollectionManifest.objects.filter(id=manifest.id).update(hashes={})
+
+        # Manual sync resends the collection which manifest is up to date
+        collection.refresh_from_db()
+        result = sync_collection_engines(collection_slug=collection.slug, created_at=collection.updated_at)
+        self.assertEqual(result, {self.engine.engine_name: {'success': True}})
+        self.assertEqual(mock_sync_collection_activities.call_count, 2)
+        mock_sync_diff.assert_not_called()
+        manifest.refresh_from_db()
+        self.assertEqual(set(manifest.hashes), {'test_url_1'})
 
+    def create_graded_sequences(self, count):
+        collection = Collection.objects.create(name='test_col', owner=self.user)
         collection_order = CollectionOrder.objects.create(
             group=self.collection_group,
             collection=collection,
             engine=self.engine,
             grading_policy=self.grading_policy
         )
-
-        Sequence.objects.create(
-            lti_user=self.lti_user,
-            collection_order=collection_order,
-            suffix='12345',
-            lis_result_sourcedid='fake_lis_result_sourcedid',
+        outcome_service = OutcomeService.objects.create(
+            lis_outcome_service_url='http://test.outcome_service.net', lms_lti_connection=self.consumer,
         )
+        sequences = [
+            Sequence.objects.create(
+                lti_user=self.lti_user,
+                collection_order=collection_order,
+                suffix=str(i),
+                lis_result_sourcedid='fake_lis_result_sourcedid',
+                outcome_service=outcome_service,
+            ) for i in range(count)
+        ]
+        return collection_order, sequences
+
+    @override_settings(GRADE_PASSBACK_CHUNK_SIZE=2)
+    @patch('module.tasks.update_sequences_grades.delay')
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    def test_update_students_grades(self, mock_apply_async, mock_delay):
+        collection_order, sequences = self.create_graded_sequences(3)
+        Sequence.objects.create(lti_user=self.lti_user, collection_order=collection_order, suffix='no_outcome')
+
         tasks.update_students_grades(collection_order.slug)
-        mock_send_grade.assert_called_once_with()
+        self.assertEqual(mock_delay.call_count, 2)
+        mock_delay.assert_any_call(
+            collection_order_slug=collection_order.slug, sequence_ids=[sequences[0].id, sequences[1].id]
+        )
+        mock_delay.assert_called_with(collection_order_slug=collection_order.slug, sequence_ids=[sequences[2].id])
+        progress = get_grades_update_progress(collection_order.slug)
+        self.assertEqual((progress['total'], progress['processed'], progress['finished']), (3, 0, False))
+
+    @patch('module.tasks.update_lms_grades')
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    def test_update_sequences_grades(self, mock_apply_async, mock_update_lms_grades):
+        collection_order, sequences = self.create_graded_sequences(3)
+        sequence_ids = [sequence.id for sequence in sequences]
+        start_grades_update_progress(collection_order.slug, 6)
+        accepted = Mock(code_major='success', **{'is_success.return_value': True})
+        mock_update_lms_grades.side_effect = [accepted, accepted, Exception('LMS is not available')]
+
+        tasks.update_sequences_grades(collection_order_slug=collection_order.slug, sequence_ids=sequence_ids)
+        self.assertEqual(mock_update_lms_grades.call_count, 3)
+        self.assertEqual(GradePassback.objects.filter(status=GradePassback.SENT, grade=0).count(), 2)
+        failed = GradePassback.objects.get(status=GradePassback.FAILED)
+        self.assertEqual(failed.error, 'LMS is not available')
+
+        # Only the failed grade is resent
+        mock_update_lms_grades.side_effect = None
+        mock_update_lms_grades.return_value = accepted
+        tasks.update_sequences_grades(collection_order_slug=collection_order.slug, sequence_ids=sequence_ids)
+        self.assertEqual(mock_update_lms_grades.call_count, 4)
+        mock_update_lms_grades.assert_called_with(
+            sequence=failed.sequence, score=0, use_ledger=False,
+            lms_platform=failed.sequence.outcome_service.lms_lti_connection,
+        )
+        progress = get_grades_update_progress(collection_order.slug)
+        self.assertEqual(
+            {key: progress[key] for key in ('sent', 'skipped', 'failed', 'processed', 'finished')},
+            {'sent': 3, 'skipped': 2, 'failed': 1, 'processed': 6, 'finished': True},
+        )
+
+
+class TestEngineScoreSubmission(TestCase):
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    def setUp(self, mock_apply_async):
+        self.user = BridgeUser.objects.create_user(username='test_instructor', password='testtest')
+        consumer = LtiLmsPlatform.objects.create(consumer_name='name', consumer_key='key', consumer_secret='secret')
+        lti_user = LtiUser.objects.create(user_id='some_user', lti_lms_platform=consumer)
+        engine = Engine.objects.create(engine='engine_mock', engine_name='mock_eng')
+        grading_policy = GradingPolicy.objects.create(name='full_credit', public_name='test_sequence_policy')
+        collection_group = ModuleGroup.objects.create(name='col_group', owner=self.user)
+        collection = Collection.objects.create(name='test_col', owner=self.user)
+        self.activity = Activity.objects.create(name='testA1', collection=collection, stype='problem')
+        collection_order = CollectionOrder.objects.create(
+            group=collection_group, collection=collection, engine=engine, grading_policy=grading_policy
+        )
+        self.sequence = Sequence.objects.create(lti_user=lti_user, collection_order=collection_order)
+        self.sequence_item = SequenceItem.objects.create(sequence=self.sequence, activity=self.activity)
+
+    @patch('module.engines.engine_mock.EngineMock.submit_activity_answer')
+    def test_score_change_is_queued(self, mock_submit_activity_answer):
+        self.sequence_item.score = 0.5
+        self.sequence_item.save()
+        self.sequence_item.save()
+
+        mock_submit_activity_answer.assert_not_called()
+        submissions = EngineSubmission.objects.filter(sequence_item=self.sequence_item)
+        self.assertEqual(submissions.count(), 1)
+        self.assertEqual(submissions.first().status, EngineSubmission.PENDING)
+
+    @patch('module.models.EngineSubmission.schedule_flush')
+    def test_scores_are_submitted_in_order(self, mock_schedule_flush):
+        for score in (0, 0.5, 1):
+            self.sequence_item.score = score
+            self.sequence_item.save()
+        submitted_scores = []
+
+        def submit_activity_answers(sequence_items):
+            submitted_scores.extend(sequence_item.score for sequence_item in sequence_items)
+            return [True] * len(sequence_items)
+
+        with patch(
+            'module.engines.engine_mock.EngineMock.submit_activity_answers', side_effect=submit_activity_answers
+        ) as mock_submit_activity_answers:
+            tasks.flush_engine_submissions(engine_id=self.sequence.collection_order.engine_id)
+
+        mock_submit_activity_answers.assert_called_once()
+        self.assertEqual(submitted_scores, [0, 0.5, 1])
+        self.assertFalse(EngineSubmission.objects.exclude(status=EngineSubmission.SENT).exists())
+        mock_schedule_flush.assert_not_called()
+
+    @patch('module.models.EngineSubmission.schedule_flush')
+    @patch('module.engines.engine_mock.EngineMock.submit_activity_answers', EngineInterface.submit_activity_answers)
+    @patch('module.engines.engine_mock.EngineMock.submit_activity_answer', return_value=False)
+    def test_failed_submission_is_postponed(self, mock_submit_activity_answer, mock_schedule_flush):
+        for score in (0, 1):
+            self.sequence_item.score = score
+            self.sequence_item.save()
+
+        tasks.flush_engine_submissions(engine_id=self.sequence.collection_order.engine_id)
+
+        first, second = EngineSubmission.objects.filter(sequence=self.sequence)
+        self.assertEqual((first.status, first.attempts), (EngineSubmission.PENDING, 1))
+        self.assertGreater(first.next_attempt_at, first.created_at)
+        # NOTE(idegtiarov) Second score isn't sent before the first one to keep the order.
+        mock_submit_activity_answer.assert_called_once()
+        self.assertEqual((second.status, second.attempts), (EngineSubmission.PENDING, 0))
+        mock_schedule_flush.assert_called_once()
+
+        # Sequence with postponed submission is skipped until the next attempt.
+        tasks.flush_engine_submissions(engine_id=self.sequence.collection_order.engine_id)
+        mock_submit_activity_answer.assert_called_once()
+
+    @override_settings(ENGINE_SUBMISSION_BATCH_SIZE=1)
+    @patch('module.models.EngineSubmission.schedule_flush')
+    @patch('module.engines.engine_mock.EngineMock.submit_activity_answers', return_value=[False])
+    def test_failed_submission_blocks_next_batches(self, mock_submit_activity_answers, mock_schedule_flush):
+        for score in (0, 1):
+            self.sequence_item.score = score
+            self.sequence_item.save()
+
+        tasks.flush_engine_submissions(engine_id=self.sequence.collection_order.engine_id)
+
+        mock_submit_activity_answers.assert_called_once()
+        first, second = EngineSubmission.objects.filter(sequence=self.sequence)
+        self.assertEqual((first.status, first.attempts), (EngineSubmission.PENDING, 1))
+        self.assertEqual((second.status, second.attempts), (EngineSubmission.PENDING, 0))
+
+    @patch('module.models.EngineSubmission.schedule_flush')
+    def test_engine_grade_accounts_queued_score(self, mock_schedule_flush):
+        collection_order = self.sequence.collection_order
+        collection_order.grading_policy = GradingPolicy.objects.create(name='engine_grade', public_name='test_policy')
+        collection_order.save()
+        self.sequence_item.score = 1
+        self.sequence_item.save()
+
+        def get_grade(sequence):
+            # Score is sent before the engine is asked for the grade
+            self.assertFalse(EngineSubmission.objects.filter(status=EngineSubmission.PENDING).exists())
+            return 1
+
+        with patch(
+            'module.engines.engine_mock.EngineMock.submit_activity_answers', return_value=[True]
+        ) as mock_submit_activity_answers, patch(
+            'module.engines.engine_mock.EngineMock.get_grade', side_effect=get_grade, create=True
+        ) as mock_get_grade:
+            self.assertEqual(collection_order.grading_policy.calculate_grade(self.sequence), 1)
+        mock_submit_activity_answers.assert_called_once_with([self.sequence_item])
+        mock_get_grade.assert_called_once_with(self.sequence)
+
+    @patch('module.models.EngineSubmission.schedule_flush')
+    def test_score_is_not_queued_without_engine(self, mock_schedule_flush):
+        CollectionOrder.objects.filter(id=self.sequence.collection_order_id).update(engine=None)
+        sequence_item = SequenceItem.objects.get(id=self.sequence_item.id)
+        sequence_item.score = 1
+        sequence_item.save()
+        self.assertFalse(EngineSubmission.objects.exists())
+        mock_schedule_flush.assert_not_called()
+
+    @patch('module.tasks.flush_engine_submissions.delay')
+    def test_overdue_submissions_are_swept(self, mock_delay):
+        self.sequence_item.score = 1
+        self.sequence_item.save()
+        tasks.sweep_engine_submissions()
+        mock_delay.assert_not_called()
+
+        EngineSubmission.objects.update(
+            next_attempt_at=timezone.now() - datetime.timedelta(seconds=settings.ENGINE_SUBMISSION_SWEEP_INTERVAL + 1)
+        )
+        tasks.sweep_engine_submissions()
+        mock_delay.assert_called_once_with(engine_id=self.sequence.collection_order.engine_id)
@@ -1,15 +1,18 @@
 import logging
 
 import ddt
+from django.core.cache import cache
 from django.core.exceptions import MultipleObjectsReturned
-from django.test import TestCase
+from django.test import override_settings, TestCase
 from mock import patch
+from requests import RequestException
 
 from bridge_lti.models import BridgeUser, LtiLmsPlatform, LtiUser, OutcomeService
+from module.engines import circuit_breaker
 from module.models import (
     Activity, Collection, CollectionOrder, Engine, GradingPolicy, ModuleGroup, Sequence, SequenceItem
 )
-from module.utils import choose_activity, select_next_sequence_item
+from module.utils import choose_activity, select_next_sequence_item, stash_recommendation
 
 log = logging.getLogger(__name__)
 
@@ -110,6 +113,7 @@ class TestUtilities(TestCase):
         )
         self.assertEqual(chosen_activity, expected_activity)
 
+    @override_settings(ENGINE_FALLBACK_DRIVER=None)
     @patch('module.engines.engine_vpal.EngineVPAL.select_activity', return_value=None)
     def test_choose_activity_with_unconfigured_engine(self, mock_choose_activity_by_engine):
         """
@@ -119,6 +123,50 @@ class TestUtilities(TestCase):
         sequence_is_exists = Sequence.objects.filter(collection_order=self.collection_order2)
         self.assertFalse(sequence_is_exists)
 
+    @patch('module.engines.engine_vpal.EngineVPAL.select_activity', side_effect=RequestException)
+    def test_choose_activity_by_fallback_driver(self, mock_choose_activity_by_engine):
+        """
+        Test activity is chosen by the fallback driver if engine fails.
+        """
+        cache.clear()
+        self.assertIn(choose_activity(sequence=self.vpal_sequence), self.collection.activities.all())
+        self.assertTrue(Sequence.objects.filter(id=self.vpal_sequence.id).exists())
+
+    @patch('module.engines.engine_mock.EngineMock.select_activity', return_value={'complete': True})
+    @patch('module.engines.engine_vpal.EngineVPAL.select_activity', side_effect=RequestException)
+    def test_fallback_driver_does_not_complete_sequence(self, mock_choose_activity_by_engine, mock_fallback_choose):
+        """
+        Test sequence isn't completed by the fallback driver.
+        """
+        cache.clear()
+        sequence_item = SequenceItem.objects.create(sequence=self.vpal_sequence, activity=self.activity)
+        self.assertIsNone(choose_activity(sequence_item=sequence_item))
+        mock_fallback_choose.assert_called_once_with(self.vpal_sequence)
+        self.assertFalse(Sequence.objects.get(id=self.vpal_sequence.id).completed)
+
+    @override_settings(ENGINE_BREAKER_MIN_CALLS=2, ENGINE_BREAKER_FAILURE_RATE=0.5)
+    def test_choose_activity_with_open_breaker(self):
+        """
+        Test engine is not called while its breaker is open and is probed once the reset timeout is expired.
+        """
+        cache.clear()
+        sequence_item = SequenceItem.objects.create(sequence=self.vpal_sequence, activity=self.activity)
+        breaker = self.vpal_engine.breaker
+        with patch('module.engines.engine_vpal.EngineVPAL.select_activity', return_value=None) as mock_select:
+            choose_activity(sequence_item=sequence_item)
+            choose_activity(sequence_item=sequence_item)
+            self.assertEqual(breaker.state, circuit_breaker.OPEN)
+            self.assertIsNotNone(choose_activity(sequence_item=sequence_item))
+            self.assertEqual(mock_select.call_count, 2)
+
+        # Reset timeout is expired
+        cache.set('{}:opened_at'.format(breaker.key), breaker.opened_at - breaker.reset_timeout)
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+        recommendation = {'source_launch_url': self.activity3.source_launch_url}
+        with patch('module.engines.engine_vpal.EngineVPAL.select_activity', return_value=recommendation):
+            self.assertEqual(choose_activity(sequence_item=sequence_item), self.activity3)
+            self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+
     @patch('module.engines.engine_vpal.EngineVPAL.select_activity', return_value={'complete': True})
     def test_choose_activity_from_completed_collection(self, mock_choose_activity_by_engine):
         """
@@ -130,6 +178,25 @@ class TestUtilities(TestCase):
         self.assertEqual(completed_sequence, self.vpal_sequence)
         self.assertTrue(completed_sequence.completed)
 
+    def test_choose_activity_from_speculative_recommendation(self):
+        """
+        Test stored recommendation is used once and only for the sequence state it was computed for.
+        """
+        self.collection_order2.speculative_recommendation = True
+        self.collection_order2.save()
+        sequence_item = SequenceItem.objects.create(sequence=self.vpal_sequence, activity=self.activity)
+        recommendation = {'source_launch_url': self.activity3.source_launch_url}
+        with patch('module.engines.engine_vpal.EngineVPAL.select_activity', return_value=recommendation) as mock_select:
+            stash_recommendation(self.vpal_sequence)
+            self.assertEqual(choose_activity(sequence_item=sequence_item), self.activity3)
+            mock_select.assert_called_once_with(self.vpal_sequence)
+
+            stash_recommendation(self.vpal_sequence)
+            sequence_item.score = 1
+            sequence_item.save()
+            self.assertEqual(choose_activity(sequence_item=sequence_item), self.activity3)
+            self.assertEqual(mock_select.call_count, 3)
+
     @ddt.unpack
     @ddt.data(
         {
@@ -1,5 +1,6 @@
 import datetime
 
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls.base import reverse
 from mock import patch
@@ -10,6 +11,7 @@ from module.mixins.views import GroupEditFormMixin
 from module.models import (
     Activity, BridgeUser, Collection, CollectionOrder, ContributorPermission, Engine, GradingPolicy, ModuleGroup
 )
+from module.utils import GRADES_UPDATE_PROGRESS_KEY, start_grades_update_progress, update_grades_update_progress
 
 GRADING_POLICIES = (
     # value, display_name
@@ -420,6 +422,46 @@ class TestManualGradeUpdate(BridgeTestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 404)
 
+    def test_students_grade_update_status(self):
+        url = reverse('module:update_grades_status', kwargs={'collection_order_slug': self.collection_order1.slug})
+        cache.delete(GRADES_UPDATE_PROGRESS_KEY.format(self.collection_order1.slug))
+        self.assertEqual(self.client.get(url).json(), {'started': False})
+
+        start_grades_update_progress(self.collection_order1.slug, 2)
+        update_grades_update_progress(self.collection_order1.slug, sent=1, failed=1)
+        response = self.client.get(url).json()
+        self.assertTrue(response['finished'])
+        self.assertEqual((response['sent'], response['failed'], response['failures']), (1, 1, []))
+
+        # Progress is available to the module group's owner and contributors only
+        BridgeUser.objects.create_user(username='other', password='other')
+        self.client.login(username='other', password='other')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_engines_state(self):
+        cache.clear()
+        self.engine.breaker.open()
+        response = self.client.get(reverse('module:engines-state')).json()
+        engine_state, = [state for state in response['engines'] if state['engine_id'] == self.engine.id]
+        self.assertEqual(engine_state['state'], 'open')
+        self.assertEqual(engine_state['engine_name'], self.engine.engine_name)
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.get(reverse('module:group-list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", total;dur=[\d.]+$')
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics/').status_code, 200)
+        with self.settings(METRICS_TOKEN='token'):
+            self.assertEqual(self.client.get('/metrics/').status_code, 403)
+            metrics = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer token')
+        self.assertEqual(metrics.status_code, 200)
+        self.assertIn(
+            'bridge_view_db_queries_count{method="GET",view="module:group-list"}', metrics.content.decode()
+        )
+
 
 class TestCreateUpdateActivity(BridgeTestCase):
     fixtures = BridgeTestCase.fixtures + ['api.json', 'bridge.json']
@@ -1,11 +1,13 @@
 import urllib.parse
 
-from ddt import data, ddt
+from ddt import data, ddt, unpack
+from django.core.cache import cache
 from django.test import TestCase
 from mock import Mock, patch
 
 from bridge_lti.models import BridgeUser, LtiLmsPlatform, LtiUser, OutcomeService
-from module.engines import engine_vpal
+from module.engines import engine_vpal, manifest, vpal_payload
+from module.engines.fake_vpal import FakeVPALServer
 from module.models import (
     Activity, Collection, CollectionOrder, Engine, GradingPolicy, ModuleGroup, Sequence, SequenceItem
 )
@@ -71,14 +73,14 @@ class TestVPALEngine(TestCase):
         self.sequence_item_1 = SequenceItem.objects.create(sequence=self.sequence, activity=self.a1, score=0.4)
         self.sequence_item_2 = SequenceItem.objects.create(sequence=self.sequence, activity=self.a2, score=0.6)
 
-    def test_fulfill_sequenceitem_payload(self):
+    def test_sequence_item_payload(self):
         expected = {'activity': self.a1.source_launch_url, 'score': self.sequence_item_1.score, 'is_problem': False}
-        payload = self.engine.engine_driver.fulfill_payload(instance_to_parse=self.sequence_item_1)
+        payload = vpal_payload.sequence_item_payload(self.sequence_item_1)
         self.assertEqual(payload, expected)
 
-    def test_fulfill_activity_payload(self):
+    def test_sync_activity_payload(self):
         expected = {
-            'difficulty': '0.5',
+            'difficulty': 0.5,
             'name': 'act1',
             'repetition': 2,
             'source_launch_url': 'test_url_act1',
@@ -86,8 +88,8 @@ class TestVPALEngine(TestCase):
             'type': 'generic',
         }
 
-        payload = self.engine.engine_driver.fulfill_payload(payload={}, instance_to_parse=self.a1)
-        self.assertEqual(payload, expected)
+        payload = vpal_payload.sync_payload(self.collection)
+        self.assertIn(expected, payload)
 
     @data(200, 201)
     def test_select_activity(self, mock_status):
@@ -120,12 +122,15 @@ class TestVPALEngine(TestCase):
                 },
             ]
         }
-        with patch('requests.post', return_value=Mock(status_code=mock_status)) as mock_post:
+        with patch('requests.Session.post', return_value=Mock(status_code=mock_status)) as mock_post:
             response = mock_post.return_value
             response.json.return_value = {'source_launch_url': expected_source_url}
             result = self.engine.engine_driver.select_activity(self.sequence)
             mock_post.assert_called_once_with(
-                test_url, headers=self.engine.engine_driver.headers, json=expected_payload
+                test_url,
+                headers=self.engine.engine_driver.headers,
+                json=expected_payload,
+                timeout=self.engine.engine_driver.timeout,
             )
             self.assertEqual(result.get('source_launch_url'), expected_source_url)
 
@@ -166,12 +171,15 @@ class TestVPALEngine(TestCase):
                 },
             ]
         }
-        with patch('requests.post', return_value=Mock(status_code=mock_status)) as mock_post:
+        with patch('requests.Session.post', return_value=Mock(status_code=mock_status)) as mock_post:
             response = mock_post.return_value
             response.json.return_value = {'source_launch_url': expected_source_url}
             result = self.engine.engine_driver.select_activity(self.sequence)
             mock_post.assert_called_once_with(
-                test_url, headers=self.engine.engine_driver.headers, json=expected_payload
+                test_url,
+                headers=self.engine.engine_driver.headers,
+                json=expected_payload,
+                timeout=self.engine.engine_driver.timeout,
             )
             self.assertEqual(result.get('source_launch_url'), expected_source_url)
 
@@ -206,11 +214,192 @@ class TestVPALEngine(TestCase):
                 },
             ]
         }
-        with patch('requests.post', return_value=Mock(status_code=mock_status)) as mock_post:
+        with patch('requests.Session.post', return_value=Mock(status_code=mock_status)) as mock_post:
             response = mock_post.return_value
             response.json.return_value = {'source_launch_url': expected_source_url}
             result = self.engine.engine_driver.select_activity(self.sequence)
             mock_post.assert_called_once_with(
-                test_url, headers=self.engine.engine_driver.headers, json=expected_payload
+                test_url,
+                headers=self.engine.engine_driver.headers,
+                json=expected_payload,
+                timeout=self.engine.engine_driver.timeout,
             )
             self.assertEqual(result.get('source_launch_url'), expected_source_url)
+
+    @data((200, True), (500, False))
+    @unpack
+    def test_submit_activity_answers(self, mock_status, expected_result):
+        test_url = urllib.parse.urljoin(self.engine.engine_driver.base_url, 'score')
+        learner = {
+            'user_id': self.sequence.lti_user.user_id,
+            'tool_consumer_instance_guid': self.lti_content_source.consumer_name,
+        }
+        expected_payload = [
+            {'activity': self.a1.source_launch_url, 'score': self.sequence_item_1.score, 'learner': learner},
+            {'activity': self.a2.source_launch_url, 'score': self.sequence_item_2.score, 'learner': learner},
+        ]
+        with patch('requests.Session.post', return_value=Mock(status_code=mock_status)) as mock_post:
+            result = self.engine.engine_driver.submit_activity_answers([self.sequence_item_1, self.sequence_item_2])
+            mock_post.assert_called_once_with(
+                test_url,
+                headers=self.engine.engine_driver.headers,
+                json=expected_payload,
+                timeout=self.engine.engine_driver.timeout,
+            )
+        self.assertEqual(result, [expected_result] * 2)
+
+    def test_select_activity_incremental(self):
+        driver = engine_vpal.EngineVPAL(HOST='test_host/', TOKEN='test-token', INCREMENTAL_RECOMMEND=True)
+        cache.delete(driver._get_sequence_cursor_key(self.sequence.id))
+        item_1 = {'activity': self.a1.source_launch_url, 'score': 0.4, 'is_problem': False, 'position': 1}
+        item_2 = {'activity': self.a2.source_launch_url, 'score': 0.6, 'is_problem': True, 'position': 1}
+        responses = [
+            Mock(status_code=200, **{'json.return_value': {'source_launch_url': 'url_1', 'sequence_cursor': 'c1'}}),
+            Mock(status_code=200, **{'json.return_value': {'source_launch_url': 'url_2', 'sequence_cursor': 'c2'}}),
+            Mock(status_code=409),
+            Mock(status_code=200, **{'json.return_value': {'source_launch_url': 'url_3', 'sequence_cursor': 'c3'}}),
+            Mock(status_code=200, **{'json.return_value': {'resync': True}}),
+            Mock(status_code=200, **{'json.return_value': {'source_launch_url': 'url_4', 'resync': True}}),
+        ]
+        with patch('requests.Session.post', side_effect=responses) as mock_post:
+            self.assertEqual(driver.select_activity(self.sequence)['source_launch_url'], 'url_1')
+            payload = mock_post.call_args[1]['json']
+            self.assertTrue(payload['resync'])
+            self.assertEqual(payload['sequence'], [item_1, item_2])
+
+            self.sequence_item_2.score = 1
+            self.sequence_item_2.save()
+            self.assertEqual(driver.select_activity(self.sequence)['source_launch_url'], 'url_2')
+            payload = mock_post.call_args[1]['json']
+            self.assertEqual(payload['sequence_cursor'], 'c1')
+            self.assertEqual(payload['sequence'], [dict(item_2, score=1)])
+
+            # Engine asks to resynchronize the sequence
+            self.assertEqual(driver.select_activity(self.sequence)['source_launch_url'], 'url_3')
+            payload = mock_post.call_args[1]['json']
+            self.assertEqual(mock_post.call_count, 4)
+            self.assertNotIn('sequence_cursor', payload)
+            self.assertEqual(payload['sequence'], [item_1, dict(item_2, score=1)])
+
+            # Answer to the full sequence is returned even if it has the resync flag
+            self.assertEqual(driver.select_activity(self.sequence), {'source_launch_url': 'url_4'})
+            self.assertTrue(mock_post.call_args[1]['json']['resync'])
+
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    def test_payloads_number_of_queries(self, mock_apply_async):
+        for i in range(10):
+            activity = Activity.objects.create(
+                name='act{}'.format(i + 3), collection=self.collection, source_launch_url='test_url_{}'.format(i + 3)
+            )
+            SequenceItem.objects.create(sequence=self.sequence, activity=activity, score=0.5)
+        sequence = Sequence.objects.select_related(*vpal_payload.SEQUENCE_RELATED).get(id=self.sequence.id)
+        sequence_items = list(self.sequence.items.select_related(*vpal_payload.SEQUENCE_ITEM_RELATED))
+
+        with self.assertNumQueries(1):
+            payload = vpal_payload.recommend_payload(sequence)
+        self.assertEqual(len(payload['sequence']), 12)
+        with self.assertNumQueries(1):
+            payload = vpal_payload.sync_payload(self.collection)
+        self.assertEqual(len(payload), 12)
+        self.assertEqual(payload[0]['type'], 'generic')
+        with self.assertNumQueries(0):
+            payload = vpal_payload.score_payload(sequence_items)
+            vpal_payload.grade_payload(sequence)
+        self.assertEqual(len(payload), 12)
+
+
+class TestFakeVPALServer(TestCase):
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    def setUp(self, mock_apply_async):
+        self.server = FakeVPALServer(token='test-token').start()
+        self.addCleanup(self.server.stop)
+        self.driver = engine_vpal.EngineVPAL(HOST=self.server.url, TOKEN='test-token', MAX_RETRIES=0)
+        user = BridgeUser.objects.create_user(username='test', password='test', email='test@me.com')
+        self.collection = Collection.objects.create(name='test_col', owner=user)
+        self.a1 = Activity.objects.create(
+            name='act1', collection=self.collection, source_launch_url='test_url_act1', stype='problem',
+        )
+        self.a2 = Activity.objects.create(
+            name='act2', collection=self.collection, source_launch_url='test_url_act2', stype='problem',
+        )
+        lti_lms_platform = LtiLmsPlatform.objects.create(consumer_name='test_consumer_name')
+        lti_user = LtiUser.objects.create(user_id='test_ltiuser_id', lti_lms_platform=lti_lms_platform)
+        collection_order = CollectionOrder.objects.create(
+            group=ModuleGroup.objects.create(name='test-group', owner=user),
+            collection=self.collection,
+            engine=Engine.objects.create(engine='engine_vpal'),
+            grading_policy=GradingPolicy.objects.create(name='engine_grade', public_name='test_policy'),
+        )
+        self.sequence = Sequence.objects.create(lti_user=lti_user, collection_order=collection_order)
+
+    def test_learner_flow(self):
+        self.assertTrue(self.driver.sync_collection_activities(self.collection))
+        self.assertEqual(self.driver.select_activity(self.sequence)['source_launch_url'], self.a1.source_launch_url)
+        sequence_item = SequenceItem.objects.create(sequence=self.sequence, activity=self.a1, score=1)
+        self.assertEqual(self.driver.submit_activity_answers([sequence_item]), [True])
+        self.assertEqual(self.driver.select_activity(self.sequence)['source_launch_url'], self.a2.source_launch_url)
+        SequenceItem.objects.create(sequence=self.sequence, activity=self.a2, score=0)
+        self.assertTrue(self.driver.select_activity(self.sequence)['complete'])
+        self.assertEqual(self.driver.get_grade(self.sequence), 0.5)
+        self.assertEqual(self.server.stats(), {'activities': 1, 'recommend': 3, 'score': 1, 'grade': 1})
+
+    def test_incremental_recommend(self):
+        driver = engine_vpal.EngineVPAL(HOST=self.server.url, TOKEN='test-token', INCREMENTAL_RECOMMEND=True)
+        driver.sync_collection_activities(self.collection)
+        self.assertEqual(driver.select_activity(self.sequence)['source_launch_url'], self.a1.source_launch_url)
+        SequenceItem.objects.create(sequence=self.sequence, activity=self.a1, score=1)
+        self.assertEqual(driver.select_activity(self.sequence)['source_launch_url'], self.a2.source_launch_url)
+        self.assertEqual(self.server.stats()['recommend'], 2)
+
+    @patch('module.tasks.sync_collection_engines.apply_async')
+    def test_sync_collection_diff(self, mock_apply_async):
+        self.driver.sync_diffs = True
+        _, hashes = manifest.collection_manifest(self.collection)
+        base_hash = manifest.manifest_hash(hashes)
+        # Diff isn't applied before the collection is synchronized
+        self.assertFalse(self.driver.sync_collection_diff(self.collection, [], [], base_hash, base_hash))
+        self.assertTrue(self.driver.sync_collection_activities(self.collection))
+
+        a3 = Activity.objects.create(
+            name='act3', collection=self.collection, source_launch_url='test_url_act3', stype='problem',
+        )
+        self.a1.delete()
+        activities, hashes = manifest.collection_manifest(self.collection)
+        new_hash = manifest.manifest_hash(hashes)
+        self.assertTrue(self.driver.sync_collection_diff(
+            self.collection, activities[-1:], [self.a1.source_launch_url], base_hash, new_hash
+        ))
+        self.assertEqual(
+            [activity['source_launch_url'] for activity in self.server.state.activities[self.collection.slug]],
+            [self.a2.source_launch_url, a3.source_launch_url],
+        )
+        # Diff based on the outdated collection is rejected
+        self.assertFalse(self.driver.sync_collection_diff(self.collection, [], [], base_hash, new_hash))
+        self.assertEqual(self.server.stats()['activities'], 4)
+        # Diff isn't sent to the engine which doesn't support the diffs
+        self.driver.sync_diffs = False
+        self.assertFalse(self.driver.sync_collection_diff(self.collection, [], [], new_hash, new_hash))
+        self.assertEqual(self.server.stats()['activities'], 4)
+
+    def test_errors_and_throttling(self):
+        self.server.error_rate = 1
+        self.assertFalse(self.driver.sync_collection_activities(self.collection))
+        self.server.error_rate = 0
+        self.server.max_rps = 1
+        # NOTE(idegtiarov) three requests are sent within two one second windows at most, one of them is throttled
+        synced = [self.driver.sync_collection_activities(self.collection) for _ in range(3)]
+        self.assertIn(False, synced)
+        self.assertEqual(self.server.stats()['errors'], 1)
+        self.assertGreaterEqual(self.server.stats()['throttled'], 1)
+
+    def test_post_is_not_retried_on_error_status(self):
+        driver = engine_vpal.EngineVPAL(HOST=self.server.url, TOKEN='test-token', MAX_RETRIES=2, RETRY_BACKOFF=0)
+        self.server.error_rate = 1
+        sequence_item = SequenceItem.objects.create(sequence=self.sequence, activity=self.a1, score=1)
+        self.assertEqual(driver.submit_activity_answers([sequence_item]), [False])
+        self.assertEqual(self.server.stats()['errors'], 1)
+
+    def test_unauthorized(self):
+        driver = engine_vpal.EngineVPAL(HOST=self.server.url, TOKEN='wrong-token', MAX_RETRIES=0)
+        self.assertFalse(driver.sync_collection_activities(self.collection))
+        self.assertEqual(self.server.stats()['unauthorized'], 1)
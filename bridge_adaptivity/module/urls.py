@@ -5,10 +5,10 @@ from django.views.generic import RedirectView
 from module.views import (
     ActivityCreate, ActivityDelete, ActivityUpdate, AddCollectionInGroup, callback_sequence_item_grade,
     CollectionCreate, CollectionDelete, CollectionDetail, CollectionGroupDelete, CollectionList, CollectionOrderAdd,
-    CollectionOrderUpdate, CollectionUpdate, ContributorPermissionDelete, demo_collection, GetCollectionForm,
-    GetGradingPolicyForm, ModuleGroupCreate, ModuleGroupDelete, ModuleGroupDetail, ModuleGroupList, ModuleGroupShare,
-    ModuleGroupUpdate, preview_collection, sequence_item_next, SequenceComplete, SequenceDelete, SequenceItemDetail,
-    sync_collection, update_students_grades
+    CollectionOrderUpdate, CollectionUpdate, ContributorPermissionDelete, demo_collection, engines_state,
+    GetCollectionForm, GetGradingPolicyForm, ModuleGroupCreate, ModuleGroupDelete, ModuleGroupDetail, ModuleGroupList,
+    ModuleGroupShare, ModuleGroupUpdate, preview_collection, sequence_item_next, SequenceComplete, SequenceDelete,
+    SequenceItemDetail, students_grades_update_status, sync_collection, update_students_grades
 )
 
 urlpatterns = ([
@@ -100,6 +100,14 @@ urlpatterns = ([
         update_students_grades,
         name='update_grades'
     ),
+    url(
+        r'collection_order/(?P<collection_order_slug>[\w-]+)/update_grades_status/',
+        students_grades_update_status,
+        name='update_grades_status'
+    ),
+
+    # Engines' circuit breakers state for the monitoring
+    path('engines/state/', engines_state, name='engines-state'),
 
     path('collection/<slug:slug>/preview/', preview_collection, name='collection-preview'),
 ], 'module')
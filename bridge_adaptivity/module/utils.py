@@ -1,17 +1,117 @@
 from logging import getLogger
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from requests import RequestException
 from requests.packages.urllib3.exceptions import MaxRetryError
 
-from module.models import Activity, SequenceItem
+from module.engines.circuit_breaker import CircuitBreakerOpen, get_fallback_driver
+from module.models import Activity, RECOMMENDATION_STASH_KEY, SequenceItem
 
 log = getLogger(__name__)
 
+GRADES_UPDATE_PROGRESS_KEY = 'collection_order:{}:grades_update'
+GRADES_UPDATE_COUNTERS = ('sent', 'skipped', 'failed')
+
+
+def _get_sequence_state(sequence):
+    """
+    Return fingerprint of the sequence items, recommendation is valid only for the state it was computed for.
+    """
+    state = sequence.items.aggregate(
+        items_count=Count('id'), last_item=Max('id'), trials_count=Count('score'), points_earned=Sum('score')
+    )
+    return [state['items_count'], state['last_item'], state['trials_count'], state['points_earned']]
+
+
+def stash_recommendation(sequence):
+    """
+    Request the next activity from the engine in advance and store it until the student asks for it.
+
+    :param sequence: Sequence instance
+    """
+    state = _get_sequence_state(sequence)
+    engine = sequence.collection_order.engine
+    try:
+        engine_choose = engine.breaker.call(engine.engine_driver.select_activity, sequence)
+    except CircuitBreakerOpen:
+        log.debug("Speculative recommendation for the sequence {} is skipped, engine is unavailable.".format(
+            sequence.id
+        ))
+        return
+    if engine_choose is None:
+        return
+    cache.set(
+        RECOMMENDATION_STASH_KEY.format(sequence.id),
+        {'state': state, 'engine_choose': engine_choose},
+        settings.SPECULATIVE_RECOMMENDATION_TIMEOUT,
+    )
+    log.debug("Speculative recommendation is stored for the sequence {}: {}".format(sequence.id, engine_choose))
+
+
+def pop_stashed_recommendation(sequence):
+    """
+    Return stored recommendation if it was computed for the current state of the sequence.
+
+    :param sequence: Sequence instance
+    :return: engine's choice dict or None on a miss
+    """
+    key = RECOMMENDATION_STASH_KEY.format(sequence.id)
+    stash = cache.get(key)
+    if not stash:
+        return None
+    cache.delete(key)
+    if stash['state'] != _get_sequence_state(sequence):
+        log.debug("Speculative recommendation for the sequence {} is outdated.".format(sequence.id))
+        return None
+    return stash['engine_choose']
+
+
+def _engine_select_activity(sequence):
+    """
+    Request activity from the engine through its circuit breaker, fallback strategy is used if the engine fails.
+
+    Sequence is never completed by the fallback strategy, its `complete` answer is considered as no activity.
+    """
+    engine = sequence.collection_order.engine
+    engine_choose = None
+    try:
+        engine_choose = engine.breaker.call(engine.engine_driver.select_activity, sequence)
+    except CircuitBreakerOpen as err:
+        log.warning("[Engine] {}".format(err))
+    except (MaxRetryError, RequestException):
+        log.exception("[Engine] Cannot get activity from the engine")
+    if engine_choose is None:
+        fallback_driver = get_fallback_driver()
+        if fallback_driver is not None:
+            log.warning("[Engine] Activity for the sequence {} is selected by the fallback strategy.".format(
+                sequence.id
+            ))
+            engine_choose = fallback_driver.select_activity(sequence)
+            if engine_choose and engine_choose.get('complete'):
+                # NOTE(idegtiarov) only the sequence's engine completes the sequence, fallback driver's order could
+                # have no activities left while the engine would still recommend them
+                log.warning("[Engine] Fallback strategy has no activity for the sequence {}.".format(sequence.id))
+                engine_choose = None
+    return engine_choose
+
+
+def _select_activity(sequence):
+    engine_choose = None
+    if sequence.collection_order.speculative_recommendation:
+        engine_choose = pop_stashed_recommendation(sequence)
+    if engine_choose is None:
+        engine_choose = _engine_select_activity(sequence)
+    return engine_choose
+
 
 def choose_activity(sequence_item=None, sequence=None):
     sequence = sequence or sequence_item.sequence
 
     try:
-        engine_choose = sequence.collection_order.engine.engine_driver.select_activity(sequence)
+        engine_choose = _select_activity(sequence)
         activity_source_launch_url = engine_choose.get('source_launch_url')
         if engine_choose.get('complete'):
             sequence.completed = True
@@ -21,7 +121,7 @@ def choose_activity(sequence_item=None, sequence=None):
             return Activity.objects.filter(
                 collection=sequence.collection_order.collection, source_launch_url=activity_source_launch_url
             ).first()
-    except (AttributeError, MaxRetryError):
+    except (AttributeError, MaxRetryError, RequestException):
         log.exception("[Engine] Cannot get activity from the engine")
 
     # If all checks passed and sequence_item is not set. We are on the step sequence is created but activity is
@@ -72,3 +172,55 @@ def select_next_sequence_item(sequence_item, update_activity, last_item, positio
                 next_sequence_item.activity = activity
                 next_sequence_item.save()
     return next_sequence_item, sequence_complete, stub
+
+
+def start_grades_update_progress(collection_order_slug, total):
+    """
+    Reset progress of the students' grades update for the collection order.
+
+    :param collection_order_slug: CollectionOrder's slug
+    :param total: number of the sequences which grades are going to be sent
+    """
+    key = GRADES_UPDATE_PROGRESS_KEY.format(collection_order_slug)
+    timeout = settings.GRADE_PASSBACK_PROGRESS_TIMEOUT
+    cache.set_many({'{}:{}'.format(key, counter): 0 for counter in GRADES_UPDATE_COUNTERS}, timeout)
+    cache.set(key, {'total': total, 'started_at': timezone.now().isoformat()}, timeout)
+
+
+def update_grades_update_progress(collection_order_slug, **counters):
+    """
+    Increment progress counters of the students' grades update.
+
+    :param collection_order_slug: CollectionOrder's slug
+    :param counters: values to add to the `sent`, `skipped` and `failed` counters
+    """
+    key = GRADES_UPDATE_PROGRESS_KEY.format(collection_order_slug)
+    for counter, value in counters.items():
+        if not value:
+            continue
+        try:
+            cache.incr('{}:{}'.format(key, counter), value)
+        except ValueError:
+            # NOTE(idegtiarov) Progress is expired or was not started, counters are not tracked.
+            log.debug("Grades update progress of the collection order {} is not found.".format(collection_order_slug))
+            return
+
+
+def get_grades_update_progress(collection_order_slug):
+    """
+    Return progress of the students' grades update for the collection order.
+
+    :param collection_order_slug: CollectionOrder's slug
+    :return: dict with the total, processed and finished values and the counters, or None if update was not started
+    """
+    key = GRADES_UPDATE_PROGRESS_KEY.format(collection_order_slug)
+    progress = cache.get(key)
+    if progress is None:
+        return None
+    counter_keys = {'{}:{}'.format(key, counter): counter for counter in GRADES_UPDATE_COUNTERS}
+    counters = cache.get_many(list(counter_keys))
+    for counter_key, counter in counter_keys.items():
+        progress[counter] = counters.get(counter_key, 0)
+    progress['processed'] = sum(progress[counter] for counter in GRADES_UPDATE_COUNTERS)
+    progress['finished'] = progress['processed'] >= progress['total']
+    return progress
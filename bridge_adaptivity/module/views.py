@@ -36,9 +36,10 @@ from module.mixins.views import (
     JsonResponseMixin, LinkObjectsMixin, LtiSessionMixin, ModalFormMixin, SetUserInFormMixin
 )
 from module.models import (
-    Activity, Collection, CollectionOrder, ContributorPermission, GRADING_POLICY_NAME_TO_CLS, Log, ModuleGroup,
-    Sequence, SequenceItem
+    Activity, Collection, CollectionOrder, ContributorPermission, Engine, GradePassback, GRADING_POLICY_NAME_TO_CLS,
+    Log, ModuleGroup, Sequence, SequenceItem
 )
+from module.policies.memoization import grade_memoization
 
 
 log = logging.getLogger(__name__)
@@ -595,7 +596,7 @@ def _check_next_forbidden(pk):
              last_item (integer) is index of the last SequenceItem,
              sequence_item (SequenceItem inctance) of the currently open sequence item
     """
-    sequence_item = SequenceItem.objects.get(pk=pk)
+    sequence_item = SequenceItem.objects.select_related('sequence__collection_order__engine').get(pk=pk)
 
     last_item = SequenceItem.objects.filter(
         sequence=sequence_item.sequence
@@ -610,6 +611,7 @@ def _check_next_forbidden(pk):
     return next_forbidden, last_item, sequence_item
 
 
+@grade_memoization()
 def sequence_item_next(request, pk):
     try:
         next_forbidden, last_item, sequence_item = _check_next_forbidden(pk)
@@ -693,6 +695,7 @@ def _check_and_build_web_socket_message(sequence):
 
 
 @csrf_exempt
+@grade_memoization()
 def callback_sequence_item_grade(request):
     outcome_response = OutcomeResponse(
         message_identifier='unknown', code_major=CODE_MAJOR_CODES[2], severity=SEVERITY_CODES[0]
@@ -747,6 +750,10 @@ def callback_sequence_item_grade(request):
         attempt, correct, sequence_item.sequence.completed
     ))
     sequence = sequence_item.sequence
+    if sequence.collection_order.speculative_recommendation:
+        transaction.on_commit(
+            lambda: tasks.prefetch_recommendation.apply_async(kwargs={'sequence_id': sequence.id})
+        )
     web_socket_message_dict = _check_and_build_web_socket_message(sequence)
     CallbackSequenceConsumer.send_message_to_channel(
         f'{sequence_item.id}_{sequence_item.position}', web_socket_message_dict
@@ -793,6 +800,38 @@ def update_students_grades(request, collection_order_slug):
     ) + '?back_url={}'.format(back_url))
 
 
+@login_required
+def students_grades_update_status(request, collection_order_slug):
+    """
+    Return progress of the students grade update related to the collection-group of the user's module group.
+    """
+    get_object_or_404(
+        CollectionOrder.objects.filter(Q(group__owner=request.user) | Q(group__contributors=request.user)).distinct(),
+        slug=collection_order_slug,
+    )
+    progress = utils.get_grades_update_progress(collection_order_slug)
+    if progress is None:
+        return JsonResponse({'started': False})
+    progress['started'] = True
+    progress['failures'] = list(GradePassback.objects.filter(
+        sequence__collection_order__slug=collection_order_slug, status=GradePassback.FAILED,
+    ).values('sequence_id', 'error', 'updated_at'))
+    return JsonResponse(progress)
+
+
+@login_required
+def engines_state(request):
+    """
+    Return circuit breakers' state of the engines.
+    """
+    engines = []
+    for engine in Engine.objects.order_by('id'):
+        state = engine.breaker.get_stats()
+        state['engine_name'] = engine.engine_name
+        engines.append(state)
+    return JsonResponse({'engines': engines})
+
+
 def preview_collection(request, slug):
     acitvities = [
         {
@@ -829,7 +868,7 @@ def demo_collection(request, collection_order_slug):
         lti_lms_platform=lti_lms_platform,
     )
 
-    test_sequence, created = Sequence.objects.get_or_create(
+    test_sequence, created = Sequence.objects.select_related('collection_order__engine').get_or_create(
         lti_user=test_lti_user,
         collection_order=collection_order
     )
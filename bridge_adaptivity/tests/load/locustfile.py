@@ -0,0 +1,90 @@
+"""
+Locust scenario of the learner flow against the running Bridge instance.
+
+Every simulated learner is launched by the signed LTI request and then repeatedly opens the sequence item, submits the
+signed grade callback and asks for the next sequence item. This scenario is the load test: learners are concurrent and
+the on-commit work (engine submissions, grades passback) is done by the deployed workers. See `load_test_learner_flow`
+management command for the serial in-process run with the queries per request report.
+
+Usage::
+
+    export BRIDGE_CONSUMER_KEY=<key> BRIDGE_CONSUMER_SECRET=<secret> BRIDGE_COLLECTION_ORDER=<slug>
+    locust -f tests/load/locustfile.py --host https://bridge.example.com
+"""
+import os
+import random
+import re
+import uuid
+
+from locust import between, HttpUser, task
+from lti import OutcomeRequest, ToolConsumer
+from oauthlib import oauth1
+
+CONSUMER_KEY = os.environ.get('BRIDGE_CONSUMER_KEY')
+CONSUMER_SECRET = os.environ.get('BRIDGE_CONSUMER_SECRET')
+COLLECTION_ORDER = os.environ.get('BRIDGE_COLLECTION_ORDER')
+UNIQUE_MARKER = os.environ.get('BRIDGE_UNIQUE_MARKER', 'load_test')
+
+SEQUENCE_ITEM_PATH = re.compile(r'/module/sequence_item/(?P<pk>\d+)/$')
+
+
+def get_sequence_item_id(response):
+    """
+    Return id of the sequence item the response is redirected to or None for the other responses.
+    """
+    match = SEQUENCE_ITEM_PATH.search(response.headers.get('Location', ''))
+    return int(match.group('pk')) if response.status_code == 302 and match else None
+
+
+class Learner(HttpUser):
+    wait_time = between(1, 5)
+
+    def on_start(self):
+        self.user_id = 'load_test_learner_{}'.format(uuid.uuid4().hex)
+        self.sequence_item_id = self.launch()
+
+    def launch(self):
+        url = '{}/lti/launch/collection_order/{}/unique_marker/{}'.format(self.host, COLLECTION_ORDER, UNIQUE_MARKER)
+        consumer = ToolConsumer(
+            consumer_key=CONSUMER_KEY,
+            consumer_secret=CONSUMER_SECRET,
+            launch_url=url,
+            params={
+                'lti_message_type': 'basic-lti-launch-request',
+                'lti_version': 'LTI-1p0',
+                'resource_link_id': COLLECTION_ORDER,
+                'user_id': self.user_id,
+                'roles': 'Learner',
+                'context_id': 'load_test',
+                'lis_outcome_service_url': '{}/load_test/outcomes/'.format(self.host),
+                'lis_result_sourcedid': '{}:{}'.format(COLLECTION_ORDER, self.user_id),
+            },
+        )
+        response = self.client.post(url, data=consumer.generate_launch_data(), allow_redirects=False, name='launch')
+        return get_sequence_item_id(response)
+
+    def submit_answer(self):
+        url = '{}/module/callback_grade/'.format(self.host)
+        xml = OutcomeRequest({
+            'operation': 'replaceResult',
+            'score': random.choice([0, 1]),
+            'message_identifier': 'load_test_{}'.format(self.sequence_item_id),
+            # NOTE(idegtiarov) activity part of the sourcedid is not used by the callback
+            'lis_result_sourcedid': '{}:{}::'.format(self.sequence_item_id, self.user_id),
+        }).generate_request_xml()
+        _, headers, _ = oauth1.Client(
+            CONSUMER_KEY, client_secret=CONSUMER_SECRET, signature_type=oauth1.SIGNATURE_TYPE_AUTH_HEADER,
+        ).sign(url, 'POST', body=xml, headers={'Content-Type': 'application/xml'})
+        self.client.post(url, data=xml, headers=headers, name='callback')
+
+    @task
+    def answer(self):
+        if self.sequence_item_id is None:
+            self.sequence_item_id = self.launch()
+            return
+        self.client.get('/module/sequence_item/{}/'.format(self.sequence_item_id), name='item')
+        self.submit_answer()
+        response = self.client.get(
+            '/module/sequence_item/{}/next/'.format(self.sequence_item_id), allow_redirects=False, name='next'
+        )
+        self.sequence_item_id = get_sequence_item_id(response)